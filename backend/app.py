@@ -1,13 +1,34 @@
 # app.py - Fixed version with guaranteed database storage
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, stream_with_context
 from flask_cors import CORS
-from services.aiservice import AIService
-from services.database import DatabaseService
+from werkzeug.middleware.proxy_fix import ProxyFix
+from config import Config
+from services.aiservice import AIService, generation_source
+from services.database import ITEM_FIELDS, ITINERARY_FIELDS, TRIP_FIELDS, DatabaseService
+from services.idempotency import IdempotencyStore
+from services.pregeneration import PregenerationScheduler
+from services.profiling import get_memory_tracker, get_profiling_hooks
+from services.projection import parse_fields
+from services.rate_limiter import AdmissionController, AdmissionRejected, RateLimiter
+from services.shared_store import get_shared_store
+from services.tracing import current_span, get_tracer
+from services.traffic_capture import capture_enabled, get_traffic_recorder
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from datetime import datetime, timedelta, timezone
+import functools
+import json
 import traceback
 import uuid
+import zlib
 import re
+import math
+import time
 
 app = Flask(__name__)
+if Config.TRUSTED_PROXY_HOPS:
+    # Take the client address from the hop our own proxy appended, not from what the client sent
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.TRUSTED_PROXY_HOPS)
 CORS(app, resources={
     r"/api/*": {
         "origins": [
@@ -17,7 +38,8 @@ CORS(app, resources={
             "https://aiitenary.netlify.app"  
         ],
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "X-User-ID"]
+        "allow_headers": ["Content-Type", "X-User-ID", "X-Profile-Token", "X-Profile-Mode", "traceparent", "Idempotency-Key"],
+        "expose_headers": ["Retry-After", "X-Generation-Source", "X-Profile-Id", "X-Trace-Id", "Idempotent-Replayed"]
     }
 })
 
@@ -26,13 +48,291 @@ print("🚀 Initializing services...")
 ai_service = AIService()
 db_service = DatabaseService()
 
+# Rate limits and admission control are shared across gunicorn workers
+shared_store = get_shared_store()
+user_rate_limiter = RateLimiter(
+    shared_store, 'user', Config.RATE_LIMIT_USER_CAPACITY, Config.RATE_LIMIT_USER_PER_MINUTE / 60
+)
+ip_rate_limiter = RateLimiter(
+    shared_store, 'ip', Config.RATE_LIMIT_IP_CAPACITY, Config.RATE_LIMIT_IP_PER_MINUTE / 60
+)
+generation_admission = AdmissionController(
+    shared_store,
+    max_in_flight=Config.GENERATION_MAX_IN_FLIGHT,
+    max_queue_seconds=Config.GENERATION_MAX_QUEUE_SECONDS,
+    slot_ttl=Config.GENERATION_SLOT_TTL_SECONDS
+)
+idempotency = IdempotencyStore(
+    shared_store,
+    ttl=Config.IDEMPOTENCY_TTL_SECONDS,
+    in_progress_ttl=Config.IDEMPOTENCY_IN_PROGRESS_TTL_SECONDS,
+    wait_seconds=Config.IDEMPOTENCY_WAIT_SECONDS
+)
+
+# Overnight pre-generation of popular trips into the generation cache
+pregeneration = None
+if Config.PREGEN_ENABLED and ai_service.cache:
+    pregeneration = PregenerationScheduler(
+        ai_service,
+        db_service,
+        shared_store,
+        off_peak_hours=Config.PREGEN_OFF_PEAK_HOURS,
+        timezone=Config.PREGEN_TIMEZONE,
+        token_budget=Config.PREGEN_TOKEN_BUDGET,
+        top_n=Config.PREGEN_TOP_N,
+        min_requests=Config.PREGEN_MIN_REQUESTS,
+        lookback_days=Config.PREGEN_LOOKBACK_DAYS,
+        check_interval=Config.PREGEN_CHECK_INTERVAL_SECONDS,
+        pace_seconds=Config.PREGEN_PACE_SECONDS
+    )
+    pregeneration.start()
+
+# Track allocations from startup so /api/debug/memory sees worker growth
+if Config.TRACEMALLOC_AT_STARTUP:
+    get_memory_tracker().start()
+
 # Test database connection on startup
 if db_service.test_connection():
     print("✅ Database connection verified!")
 else:
     print("❌ Database connection failed!")
 
+@app.before_request
+def _start_request():
+    """Reset per-request context and decide whether this request is captured"""
+    g.request_started = time.time()
+    
+    tracer = get_tracer()
+    g.trace_span = None
+    if tracer and request.path.startswith('/api/'):
+        route = request.url_rule.rule if request.url_rule else request.path
+        g.trace_span = tracer.start_trace(
+            f"{request.method} {route}", request.headers.get('traceparent'),
+            {'http.method': request.method, 'http.route': route, 'http.target': request.path}
+        )
+        if g.trace_span:
+            g.trace_token = current_span.set(g.trace_span)
+    
+    generation_source.set(None)
+    recorder = get_traffic_recorder()
+    g.capture = bool(recorder and request.path.startswith('/api/') and recorder.should_sample())
+    capture_enabled.set(g.capture)
+    
+    hooks = get_profiling_hooks()
+    g.profile = hooks.start(request.method, request.path, request.headers) if hooks and request.path.startswith('/api/') else None
+
+@app.after_request
+def _finish_request(response):
+    if g.get('profile'):
+        try:
+            response.headers['X-Profile-Id'] = g.profile.stop(response.status_code)
+        except Exception as e:
+            print(f"⚠️ Failed to write request profile: {str(e)}")
+    
+    source = generation_source.get()
+    if source:
+        response.headers['X-Generation-Source'] = source
+    
+    if g.get('trace_span'):
+        g.trace_span.set_attribute('http.status_code', response.status_code)
+        if source:
+            g.trace_span.set_attribute('generation_source', source)
+        response.headers['X-Trace-Id'] = g.trace_span.trace_id
+    
+    if g.get('capture'):
+        try:
+            get_traffic_recorder().record_request(
+                request.method,
+                request.path,
+                request.args.to_dict(),
+                request.headers,
+                request.get_json(silent=True),
+                response.status_code,
+                time.time() - g.request_started,
+                generation_source=source
+            )
+        except Exception as e:
+            print(f"⚠️ Failed to capture request: {str(e)}")
+    
+    return response
+
+@app.teardown_request
+def _end_trace(error=None):
+    """Close the request span even when the view raised"""
+    if g.get('trace_span'):
+        get_tracer().finish(g.trace_span, error=error)
+        current_span.reset(g.trace_token)
+        g.trace_span = None
+
+def _client_ip():
+    """Caller IP; ProxyFix has already resolved it from the trusted X-Forwarded-For hops"""
+    return request.remote_addr or 'unknown'
+
+def _too_many_requests(message, retry_after):
+    retry_after = max(1, math.ceil(retry_after))
+    response = jsonify({'error': message, 'retry_after': retry_after})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+def _check_rate_limits(user_id, generations=1):
+    """Return a 429 response if the user or IP can't afford `generations` more itineraries"""
+    if not Config.RATE_LIMIT_ENABLED:
+        return None
+    
+    checks = [(ip_rate_limiter, _client_ip(), 'this IP address')]
+    if user_id:
+        checks.insert(0, (user_rate_limiter, str(user_id), 'this user'))
+    
+    # Even a full bucket could not cover this, so reject it without draining the bucket
+    for limiter, key, label in checks:
+        if generations > limiter.capacity:
+            print(f"🚦 {generations} generations exceed the allowance for {label}: {key}")
+            refill_time = limiter.capacity / limiter.refill_per_second if limiter.refill_per_second else 60
+            return _too_many_requests(f'At most {limiter.capacity} itineraries can be generated at once from {label}.', refill_time)
+    
+    for limiter, key, label in checks:
+        allowed, retry_after = limiter.consume(key, generations)
+        if not allowed:
+            print(f"🚦 Rate limit hit for {label}: {key}")
+            return _too_many_requests(f'Too many itinerary requests from {label}. Please try again later.', retry_after)
+    
+    return None
+
+def _idempotent(view):
+    """Answer a repeated Idempotency-Key with the first response instead of running the view again"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({'error': 'Idempotency-Key must be at most 255 characters'}), 400
+        
+        # Keys are per caller and per endpoint, so two users can't collide on one
+        body = request.get_json(silent=True)
+        body = body if isinstance(body, dict) else {}
+        caller = request.headers.get('X-User-ID') or body.get('user_id') or _client_ip()
+        scope = f"{request.method} {request.path} {caller} {key}"
+        fingerprint = idempotency.fingerprint(request.get_data())
+        
+        state, record = idempotency.begin(scope, fingerprint)
+        if state == 'replay':
+            print(f"🔁 Replaying stored response for Idempotency-Key {key}")
+            response = app.response_class(record['body'], status=record['status'], mimetype='application/json')
+            response.headers.update(record['headers'])
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        if state == 'mismatch':
+            print(f"❌ Idempotency-Key {key} reused with a different request body")
+            return jsonify({'error': 'Idempotency-Key was already used with a different request'}), 422
+        if state == 'in_progress':
+            print(f"⏳ Idempotency-Key {key} is still being processed")
+            response = jsonify({'error': 'A request with this Idempotency-Key is still in progress', 'retry_after': 5})
+            response.headers['Retry-After'] = '5'
+            return response, 409
+        
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except Exception:
+            idempotency.release(scope)
+            raise
+        
+        if response.status_code >= 500 or response.status_code == 429:
+            # Nothing was decided; let the retry run for real
+            idempotency.release(scope)
+        else:
+            source = generation_source.get()
+            idempotency.complete(
+                scope, fingerprint, response.status_code, response.get_data(as_text=True),
+                {'X-Generation-Source': source} if source else None
+            )
+        return response
+    return wrapper
+
+def _generate_with_admission(request_data):
+    """Run a generation inside a global in-flight slot; raises AdmissionRejected when shedding"""
+    slot_id = generation_admission.acquire()
+    started = time.time()
+    try:
+        return ai_service.generate_itinerary(request_data)
+    finally:
+        generation_admission.release(slot_id, time.time() - started)
+
+def _validate_trip_request(data):
+    """Apply the generation request rules; returns (request_data, budget, None) or (None, None, error)"""
+    # Validate required fields
+    required_fields = ['destination', 'start_date', 'end_date', 'budget']
+    missing_fields = []
+    
+    for field in required_fields:
+        if field not in data or not data[field]:
+            missing_fields.append(field)
+    
+    if missing_fields:
+        error_msg = f"Missing required field{'s' if len(missing_fields) > 1 else ''}: {', '.join(missing_fields)}"
+        print(f"❌ Validation failed: {error_msg}")
+        return None, None, error_msg
+    
+    if not isinstance(data['destination'], str):
+        print("❌ Destination validation failed: not a string")
+        return None, None, 'Destination must be a string'
+    
+    # Validate budget
+    try:
+        budget = int(data['budget'])
+        if budget <= 0:
+            print("❌ Budget validation failed: must be positive")
+            return None, None, 'Budget must be a positive number'
+    except (ValueError, TypeError):
+        print("❌ Budget validation failed: invalid number")
+        return None, None, 'Budget must be a valid number'
+    
+    # Validate dates
+    try:
+        start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
+        end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
+        
+        if end_date <= start_date:
+            print("❌ Date validation failed: end date must be after start date")
+            return None, None, 'End date must be after start date'
+            
+    except (ValueError, TypeError):
+        print("❌ Date validation failed: invalid format")
+        return None, None, 'Invalid date format. Use YYYY-MM-DD'
+    
+    print("✅ All validations passed!")
+    
+    # Prepare data for AI service
+    request_data = {
+        'destination': data['destination'].strip(),
+        'start_date': data['start_date'],
+        'end_date': data['end_date'],
+        'budget': str(budget),
+        'isVegetarian': data.get('isVegetarian', False)
+    }
+    return request_data, budget, None
+
+def _itinerary_response_data(saved_itinerary, ai_response):
+    """Client payload for a generated itinerary, with database info when it was saved"""
+    if not saved_itinerary:
+        return {
+            **ai_response,
+            'database_saved': False,
+            'warning': 'Data not saved to database'
+        }
+    
+    # Combine AI response with database info
+    return {
+        'id': saved_itinerary['id'],
+        'user_id': saved_itinerary.get('user_id'),
+        'created_at': saved_itinerary.get('created_at'),
+        'updated_at': saved_itinerary.get('updated_at'),
+        'database_saved': True,
+        **saved_itinerary.get('ai_response', ai_response)  # Include all AI-generated content
+    }
+
 @app.route('/api/generate-itinerary', methods=['POST'])
+@_idempotent
 def generate_itinerary():
     print("\n" + "="*50)
     print("🎯 NEW ITINERARY REQUEST RECEIVED")
@@ -47,58 +347,22 @@ def generate_itinerary():
         
         print(f"📝 Request data: {data}")
         
-        # Validate required fields
-        required_fields = ['destination', 'start_date', 'end_date', 'budget']
-        missing_fields = []
-        
-        for field in required_fields:
-            if field not in data or not data[field]:
-                missing_fields.append(field)
+        rate_limited = _check_rate_limits(data.get('user_id') or request.headers.get('X-User-ID'))
+        if rate_limited:
+            return rate_limited
         
-        if missing_fields:
-            error_msg = f"Missing required field{'s' if len(missing_fields) > 1 else ''}: {', '.join(missing_fields)}"
-            print(f"❌ Validation failed: {error_msg}")
+        request_data, budget, error_msg = _validate_trip_request(data)
+        if error_msg:
             return jsonify({'error': error_msg}), 400
         
-        # Validate budget
-        try:
-            budget = int(data['budget'])
-            if budget <= 0:
-                print("❌ Budget validation failed: must be positive")
-                return jsonify({'error': 'Budget must be a positive number'}), 400
-        except (ValueError, TypeError):
-            print("❌ Budget validation failed: invalid number")
-            return jsonify({'error': 'Budget must be a valid number'}), 400
-        
-        # Validate dates
-        from datetime import datetime
-        try:
-            start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
-            end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
-            
-            if end_date <= start_date:
-                print("❌ Date validation failed: end date must be after start date")
-                return jsonify({'error': 'End date must be after start date'}), 400
-                
-        except ValueError:
-            print("❌ Date validation failed: invalid format")
-            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-        
-        print("✅ All validations passed!")
-        
-        # Prepare data for AI service
-        request_data = {
-            'destination': data['destination'].strip(),
-            'start_date': data['start_date'],
-            'end_date': data['end_date'],
-            'budget': str(budget),
-            'isVegetarian': data.get('isVegetarian', False)
-        }
-        
         print(f"🤖 Sending to AI service: {request_data['destination']}, {request_data['start_date']} to {request_data['end_date']}")
         
         # Generate itinerary using AI service
-        ai_response = ai_service.generate_itinerary(request_data)
+        try:
+            ai_response = _generate_with_admission(request_data)
+        except AdmissionRejected as e:
+            print(f"🚦 Shedding generation request: {str(e)}")
+            return _too_many_requests('Server is busy generating itineraries. Please try again shortly.', e.retry_after)
         
         if not ai_response:
             print("❌ AI service failed to generate itinerary")
@@ -122,7 +386,8 @@ def generate_itinerary():
             'destination': request_data['destination'],
             'start_date': request_data['start_date'],
             'end_date': request_data['end_date'],
-            'budget': budget
+            'budget': budget,
+            'isVegetarian': bool(request_data['isVegetarian'])
         }
         
         print(f"[DEBUG] Calling upsert_itinerary with: db_request_data={db_request_data}, ai_response keys={list(ai_response.keys())}, user_id={user_id}")
@@ -136,25 +401,11 @@ def generate_itinerary():
         if saved_itinerary:
             print(f"🎉 SUCCESS! Itinerary upserted to database with ID: {saved_itinerary.get('id')}")
             
-            # Combine AI response with database info
-            response_data = {
-                'id': saved_itinerary['id'],
-                'user_id': saved_itinerary.get('user_id'),
-                'created_at': saved_itinerary.get('created_at'),
-                'updated_at': saved_itinerary.get('updated_at'),
-                'database_saved': True,
-                **saved_itinerary.get('ai_response', ai_response)  # Include all AI-generated content
-            }
-            
             print("✅ COMPLETE SUCCESS - Data upserted to database!")
-            
         else:
             print("⚠️ Database upsert failed, returning AI response only")
-            response_data = {
-                **ai_response,
-                'database_saved': False,
-                'warning': 'Data not saved to database'
-            }
+        
+        response_data = _itinerary_response_data(saved_itinerary, ai_response)
         
         print("📤 Sending response to client...")
         
@@ -173,6 +424,141 @@ def generate_itinerary():
             'details': str(e)
         }), 500
 
+def _generate_batch_trip(request_data):
+    """Generate one batch trip; returns (ai_response, generation_source, error)"""
+    try:
+        return _generate_with_admission(request_data), generation_source.get(), None
+    except Exception as e:
+        return None, None, e
+
+@app.route('/api/generate-itineraries/batch', methods=['POST'])
+def generate_itinerary_batch():
+    """Generate many itineraries in one call, streaming an NDJSON result line per trip as it completes"""
+    print("\n" + "="*50)
+    print("🎯 NEW BATCH ITINERARY REQUEST RECEIVED")
+    print("="*50)
+    
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('trips'), list) or not data['trips']:
+        print("❌ No trips provided in request")
+        return jsonify({'error': 'A non-empty list of trips is required'}), 400
+    
+    trips = data['trips']
+    if len(trips) > Config.BATCH_MAX_TRIPS:
+        print(f"❌ Batch too large: {len(trips)} trips")
+        return jsonify({'error': f'A batch can contain at most {Config.BATCH_MAX_TRIPS} trips'}), 400
+    
+    # Backend check: user_id must be present and a valid UUID, since every trip is saved
+    user_id = data.get('user_id') or request.headers.get('X-User-ID')
+    uuid_regex = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+    if not user_id or not uuid_regex.match(str(user_id)):
+        print(f"❌ Invalid or missing user_id: {user_id}")
+        return jsonify({'error': 'Invalid or missing user_id. Please log in or register.'}), 400
+    
+    # Validate every trip with the single-request rules and collapse identical ones
+    invalid = []
+    jobs = []  # [request_data, budget, input indexes]
+    job_by_key = {}
+    for index, trip in enumerate(trips):
+        if not isinstance(trip, dict):
+            invalid.append((index, 'Each trip must be an object'))
+            continue
+        request_data, budget, error_msg = _validate_trip_request(trip)
+        if error_msg:
+            invalid.append((index, error_msg))
+            continue
+        request_data['isVegetarian'] = bool(request_data['isVegetarian'])
+        key = json.dumps({**request_data, 'destination': request_data['destination'].lower()}, sort_keys=True)
+        if key in job_by_key:
+            jobs[job_by_key[key]][2].append(index)
+        else:
+            job_by_key[key] = len(jobs)
+            jobs.append([request_data, budget, [index]])
+    
+    print(f"📋 {len(trips)} trips: {len(jobs)} unique, {len(invalid)} invalid")
+    
+    # Every unique trip is a generation, so the batch is charged one token for each
+    rate_limited = _check_rate_limits(user_id, max(1, len(jobs)))
+    if rate_limited:
+        return rate_limited
+    
+    def result_lines(job, ai_response=None, source=None, saved_itinerary=None, error=None):
+        first = job[2][0]
+        for index in job[2]:
+            line = {'type': 'result', 'index': index}
+            if index != first:
+                line['duplicate_of'] = first
+            if error is None:
+                line.update({
+                    'status': 'ok',
+                    'generation_source': source,
+                    'data': _itinerary_response_data(saved_itinerary, ai_response)
+                })
+            elif isinstance(error, AdmissionRejected):
+                line.update({'status': 'rejected', 'error': 'Server is busy generating itineraries', 'retry_after': max(1, math.ceil(error.retry_after))})
+            else:
+                line.update({'status': 'error', 'error': 'Failed to generate itinerary'})
+            yield line
+    
+    def save_and_report(finished):
+        """Write every finished trip with one bulk insert, then emit their result lines"""
+        generated = [(job, ai_response, source) for job, (ai_response, source, error) in finished if ai_response]
+        saved = []
+        if generated:
+            saved = db_service.insert_itineraries_bulk([
+                ({
+                    'destination': job[0]['destination'],
+                    'start_date': job[0]['start_date'],
+                    'end_date': job[0]['end_date'],
+                    'budget': job[1],
+                    'isVegetarian': job[0]['isVegetarian']
+                }, ai_response)
+                for job, ai_response, _ in generated
+            ], user_id) or [None] * len(generated)
+        
+        for (job, ai_response, source), saved_itinerary in zip(generated, saved):
+            yield from result_lines(job, ai_response, source, saved_itinerary)
+        for job, (ai_response, source, error) in finished:
+            if not ai_response:
+                print(f"❌ Batch trip failed: {job[0]['destination']}: {str(error)}")
+                yield from result_lines(job, error=error or Exception('No itinerary generated'))
+    
+    def ndjson_lines():
+        yield {'type': 'batch', 'trips': len(trips), 'unique': len(jobs), 'invalid': len(invalid)}
+        for index, error_msg in invalid:
+            yield {'type': 'result', 'index': index, 'status': 'invalid', 'error': error_msg}
+        
+        counts = {'ok': 0, 'error': 0, 'rejected': 0}
+        if jobs:
+            executor = ThreadPoolExecutor(max_workers=min(Config.BATCH_MAX_PARALLEL, len(jobs)))
+            try:
+                # Each trip runs in its own copy of the request context, so generation_source stays per trip
+                futures = {executor.submit(copy_context().run, _generate_batch_trip, job[0]): job for job in jobs}
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    # Let trips finishing at about the same time share one database write
+                    if pending and Config.BATCH_WRITE_WINDOW_SECONDS > 0:
+                        more, pending = wait(pending, timeout=Config.BATCH_WRITE_WINDOW_SECONDS, return_when=ALL_COMPLETED)
+                        done |= more
+                    for line in save_and_report([(futures[f], f.result()) for f in done]):
+                        counts[line['status']] += 1
+                        yield line
+            finally:
+                # Stop queued trips if the client went away mid-stream
+                executor.shutdown(wait=False, cancel_futures=True)
+        
+        print(f"✅ Batch finished: {counts}")
+        yield {'type': 'summary', **counts, 'invalid': len(invalid)}
+    
+    def body():
+        for record in ndjson_lines():
+            yield (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+    
+    response = Response(stream_with_context(body()), mimetype='application/x-ndjson')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/upsert-user', methods=['POST'])
 def upsert_user():
     """Upsert user data endpoint"""
@@ -201,6 +587,7 @@ def upsert_user():
         return jsonify({'error': 'Failed to upsert user'}), 500
 
 @app.route('/api/itineraries/<itinerary_id>', methods=['PUT'])
+@_idempotent
 def update_itinerary(itinerary_id):
     """Update existing itinerary"""
     try:
@@ -244,9 +631,20 @@ def update_itinerary(itinerary_id):
         print(f"❌ Error updating itinerary: {str(e)}")
         return jsonify({'error': 'Failed to update itinerary'}), 500
 
+def _requested_fields(allowed, nested=None):
+    """Parse ?fields= against the allowed names; returns (fields or None, error_response)"""
+    spec = request.args.get('fields')
+    if not spec:
+        return None, None
+    try:
+        return parse_fields(spec, allowed, nested), None
+    except ValueError as e:
+        print(f"❌ Invalid fields: {spec}")
+        return None, (jsonify({'error': str(e)}), 400)
+
 @app.route('/api/itineraries', methods=['GET'])
 def get_user_itineraries():
-    """Get all itineraries for a user"""
+    """Get all itineraries for a user, or only what changed since ?updated_since=; ?fields= narrows the columns"""
     try:
         print("\n🔍 FETCHING USER ITINERARIES...")
         
@@ -257,29 +655,155 @@ def get_user_itineraries():
             print("❌ No user ID provided")
             return jsonify({'error': 'User ID required'}), 400
         
+        fields, error = _requested_fields(ITINERARY_FIELDS)
+        if error:
+            return error
+        
+        updated_since = request.args.get('updated_since')
+        since = None
+        if updated_since:
+            try:
+                since = datetime.fromisoformat(updated_since.replace('Z', '+00:00'))
+            except ValueError:
+                print(f"❌ Invalid updated_since: {updated_since}")
+                return jsonify({'error': 'updated_since must be an ISO 8601 timestamp'}), 400
+            if since.tzinfo is None:
+                # Timestamps without an offset are UTC, like the sync_token we hand out
+                since = since.replace(tzinfo=timezone.utc)
+        
+        # Taken before querying, so anything written during the query is picked up by the next sync
+        now = datetime.now(timezone.utc)
+        sync_token = (now - timedelta(seconds=Config.SYNC_OVERLAP_SECONDS)).isoformat()
+        
+        retention_start = now - timedelta(days=Config.SYNC_TOMBSTONE_RETENTION_DAYS)
+        if since and since >= retention_start:
+            print(f"👤 Syncing itineraries for user {user_id} since {since.isoformat()}")
+            
+            itineraries, deleted = db_service.get_itinerary_changes(user_id, since.isoformat(), fields)
+            
+            return jsonify({
+                'success': True,
+                'data': itineraries,
+                'count': len(itineraries),
+                'deleted': deleted,
+                'full_sync': False,
+                'sync_token': sync_token
+            }), 200
+        
+        if since:
+            # Deletions that old may already be forgotten; send the whole list to replace the client's copy
+            print(f"⚠️ updated_since {updated_since} is older than tombstone retention, sending a full list")
+        
         print(f"👤 Fetching itineraries for user: {user_id}")
         
-        itineraries = db_service.get_user_itineraries(user_id)
+        itineraries = db_service.get_user_itineraries(user_id, fields)
         
         print(f"✅ Found {len(itineraries)} itineraries")
         
         return jsonify({
             'success': True,
             'data': itineraries,
-            'count': len(itineraries)
+            'count': len(itineraries),
+            'full_sync': True,
+            'sync_token': sync_token
         }), 200
         
     except Exception as e:
         print(f"❌ Error fetching itineraries: {str(e)}")
         return jsonify({'error': 'Failed to fetch itineraries'}), 500
 
+@app.route('/api/itineraries/search', methods=['GET'])
+def search_user_itineraries():
+    """Full-text search over a user's itineraries (?q=), best match first, paginated with ?limit=&offset="""
+    try:
+        user_id = request.args.get('user_id') or request.headers.get('X-User-ID')
+        if not user_id:
+            print("❌ No user ID provided")
+            return jsonify({'error': 'User ID required'}), 400
+        
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({'error': 'Search query (q) required'}), 400
+        if len(query) > 200:
+            return jsonify({'error': 'Search query is too long'}), 400
+        
+        try:
+            limit = int(request.args.get('limit', Config.SEARCH_DEFAULT_LIMIT))
+            offset = int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({'error': 'limit and offset must be integers'}), 400
+        if not 1 <= limit <= Config.SEARCH_MAX_LIMIT or offset < 0:
+            return jsonify({'error': f'limit must be 1-{Config.SEARCH_MAX_LIMIT} and offset non-negative'}), 400
+        
+        # One extra row tells us whether there is another page
+        rows = db_service.search_itineraries(user_id, query, limit + 1, offset)
+        
+        return jsonify({
+            'success': True,
+            'data': rows[:limit],
+            'count': len(rows[:limit]),
+            'limit': limit,
+            'offset': offset,
+            'has_more': len(rows) > limit
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Error searching itineraries: {str(e)}")
+        return jsonify({'error': 'Failed to search itineraries'}), 500
+
+@app.route('/api/itineraries/export', methods=['GET'])
+def export_user_itineraries():
+    """Stream all of a user's itineraries as NDJSON (gzip with ?gzip=1)"""
+    user_id = request.args.get('user_id') or request.headers.get('X-User-ID')
+    if not user_id:
+        print("❌ No user ID provided")
+        return jsonify({'error': 'User ID required'}), 400
+    
+    use_gzip = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    print(f"\n📦 EXPORTING ITINERARIES for user: {user_id} (gzip={use_gzip})")
+    
+    def ndjson_lines():
+        yield {'type': 'export', 'user_id': user_id, 'exported_at': datetime.now().isoformat()}
+        count = 0
+        try:
+            for itinerary in db_service.iter_user_itineraries(user_id, page_size=Config.EXPORT_PAGE_SIZE):
+                count += 1
+                yield {'type': 'itinerary', **itinerary}
+        except Exception as e:
+            # Headers are already sent, so the failure is reported in-band
+            print(f"❌ Export failed after {count} itineraries: {str(e)}")
+            yield {'type': 'error', 'error': 'Export interrupted', 'exported': count}
+            return
+        print(f"✅ Exported {count} itineraries")
+        yield {'type': 'end', 'count': count}
+    
+    def body():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if use_gzip else None
+        for record in ndjson_lines():
+            line = (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+            # Sync-flush each line so clients see data as soon as it is read
+            yield compressor.compress(line) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else line
+        if compressor:
+            yield compressor.flush()
+    
+    response = Response(stream_with_context(body()), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = 'attachment; filename="itineraries.ndjson' + ('.gz"' if use_gzip else '"')
+    response.headers['X-Accel-Buffering'] = 'no'
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
 @app.route('/api/itineraries/<itinerary_id>', methods=['GET'])
 def get_itinerary(itinerary_id):
-    """Get specific itinerary by ID"""
+    """Get specific itinerary by ID, or only ?fields=title,daily_itinerary,items(title,cost)"""
     try:
         print(f"\n🔍 FETCHING SPECIFIC ITINERARY: {itinerary_id}")
         
-        itinerary = db_service.get_itinerary_by_id(itinerary_id)
+        fields, error = _requested_fields(ITINERARY_FIELDS + TRIP_FIELDS, {'items': ITEM_FIELDS})
+        if error:
+            return error
+        
+        itinerary = db_service.get_itinerary_by_id(itinerary_id, fields)
         
         if not itinerary:
             print("❌ Itinerary not found")
@@ -296,6 +820,53 @@ def get_itinerary(itinerary_id):
         print(f"❌ Error fetching itinerary: {str(e)}")
         return jsonify({'error': 'Failed to fetch itinerary'}), 500
 
+@app.route('/api/itineraries/<itinerary_id>/days', methods=['GET'])
+def get_itinerary_day_index(itinerary_id):
+    """Day index of an itinerary: date, theme, counts and cost per day, without the days themselves"""
+    try:
+        print(f"\n🗓️ FETCHING DAY INDEX: {itinerary_id}")
+        
+        itinerary = db_service.get_itinerary_days(itinerary_id)
+        if not itinerary:
+            return jsonify({'error': 'Itinerary not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'data': itinerary
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Error fetching day index: {str(e)}")
+        return jsonify({'error': 'Failed to fetch itinerary days'}), 500
+
+@app.route('/api/itineraries/<itinerary_id>/days/<int:day_number>', methods=['GET'])
+def get_itinerary_day(itinerary_id, day_number):
+    """One day of an itinerary, or days day_number..?to= for a range"""
+    try:
+        print(f"\n🗓️ FETCHING DAY {day_number} OF ITINERARY: {itinerary_id}")
+        
+        try:
+            last = int(request.args.get('to', day_number))
+        except ValueError:
+            return jsonify({'error': 'to must be a day number'}), 400
+        if day_number < 1 or last < day_number:
+            return jsonify({'error': 'Days are numbered from 1 and to must not be before the first day'}), 400
+        
+        itinerary = db_service.get_itinerary_days(itinerary_id, day_number, last)
+        if not itinerary:
+            return jsonify({'error': 'Itinerary not found'}), 404
+        if not itinerary['days']:
+            return jsonify({'error': 'Day not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'data': itinerary
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Error fetching itinerary day: {str(e)}")
+        return jsonify({'error': 'Failed to fetch itinerary days'}), 500
+
 @app.route('/api/itineraries/<itinerary_id>', methods=['DELETE'])
 def delete_itinerary(itinerary_id):
     """Delete specific itinerary"""
@@ -318,6 +889,82 @@ def delete_itinerary(itinerary_id):
         print(f"❌ Error deleting itinerary: {str(e)}")
         return jsonify({'error': 'Failed to delete itinerary'}), 500
 
+def _bulk_request():
+    """Validate a bulk body of {user_id, ids}; returns (user_id, ids, error_response)"""
+    data = request.get_json(silent=True) or {}
+    user_id = data.get('user_id') or request.headers.get('X-User-ID')
+    if not user_id:
+        print("❌ No user ID provided")
+        return None, None, (jsonify({'error': 'User ID required'}), 400)
+    
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids:
+        print("❌ No itinerary ids provided")
+        return None, None, (jsonify({'error': 'A non-empty list of ids is required'}), 400)
+    if len(ids) > Config.BULK_MAX_IDS:
+        print(f"❌ Too many ids: {len(ids)}")
+        return None, None, (jsonify({'error': f'At most {Config.BULK_MAX_IDS} ids per request'}), 400)
+    
+    uuid_regex = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+    invalid = [i for i in ids if not isinstance(i, str) or not uuid_regex.match(i)]
+    if invalid:
+        print(f"❌ Invalid itinerary ids: {invalid[:5]}")
+        return None, None, (jsonify({'error': 'Every id must be a UUID', 'invalid_ids': invalid}), 400)
+    
+    # Keep the caller's order, drop repeats
+    return user_id, list(dict.fromkeys(ids)), None
+
+@app.route('/api/itineraries/bulk-fetch', methods=['POST'])
+def bulk_fetch_itineraries():
+    """Fetch several of a user's itineraries by id"""
+    try:
+        print("\n🔍 BULK FETCHING ITINERARIES...")
+        user_id, ids, error = _bulk_request()
+        if error:
+            return error
+        
+        results = db_service.get_itineraries_bulk(ids, user_id)
+        
+        response = {}
+        for itinerary_id in ids:
+            status, itinerary = results[itinerary_id]
+            response[itinerary_id] = {'status': status, 'data': itinerary} if itinerary else {'status': status}
+        found = sum(1 for r in response.values() if r['status'] == 'ok')
+        
+        return jsonify({
+            'success': True,
+            'results': response,
+            'count': found,
+            'missing': len(ids) - found
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Error bulk fetching itineraries: {str(e)}")
+        return jsonify({'error': 'Failed to fetch itineraries'}), 500
+
+@app.route('/api/itineraries/bulk-delete', methods=['POST'])
+def bulk_delete_itineraries():
+    """Delete several of a user's itineraries by id"""
+    try:
+        print("\n🗑️ BULK DELETING ITINERARIES...")
+        user_id, ids, error = _bulk_request()
+        if error:
+            return error
+        
+        results = db_service.delete_itineraries_bulk(ids, user_id)
+        deleted = sum(1 for status in results.values() if status == 'deleted')
+        
+        return jsonify({
+            'success': True,
+            'results': {i: {'status': results[i]} for i in ids},
+            'deleted': deleted,
+            'failed': len(ids) - deleted
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Error bulk deleting itineraries: {str(e)}")
+        return jsonify({'error': 'Failed to delete itineraries'}), 500
+
 @app.route('/api/test-db', methods=['GET'])
 def test_database():
     """Test database connection endpoint"""
@@ -352,6 +999,53 @@ def health_check():
         'database_connected': db_service.test_connection()
     }), 200
 
+@app.route('/api/ai-status', methods=['GET'])
+def ai_status():
+    """Groq circuit breaker and retry budget state for monitoring"""
+    return jsonify({
+        'success': True,
+        'data': {
+            **ai_service.get_resilience_state(),
+            'admission': generation_admission.get_state(),
+            'pregeneration': pregeneration.get_state() if pregeneration else None,
+            'day_cache': db_service.day_cache.get_state() if db_service.day_cache else None
+        }
+    }), 200
+
+def _require_profiling_admin():
+    """Return an error response unless the caller sent the profiling admin token"""
+    hooks = get_profiling_hooks()
+    if not hooks or not hooks.admin_token:
+        return jsonify({'error': 'Profiling is not enabled'}), 404
+    if not hooks.is_admin(request.headers):
+        return jsonify({'error': 'Admin token required'}), 403
+    return None
+
+@app.route('/api/debug/profiles', methods=['GET'])
+def list_profiles():
+    """List profiles written by this worker's machine, newest first"""
+    denied = _require_profiling_admin()
+    if denied:
+        return denied
+    hooks = get_profiling_hooks()
+    return jsonify({'directory': hooks.directory, 'profiles': hooks.list_profiles()}), 200
+
+@app.route('/api/debug/memory', methods=['GET'])
+def memory_snapshot():
+    """tracemalloc top allocations for the worker serving this request, and growth since the last call"""
+    denied = _require_profiling_admin()
+    if denied:
+        return denied
+    try:
+        snapshot = get_memory_tracker().snapshot(
+            limit=request.args.get('limit', 25, type=int),
+            group_by=request.args.get('group_by', 'lineno'),
+            compare=request.args.get('compare', 'true').lower() != 'false'
+        )
+        return jsonify(snapshot), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/api/generate-itinerary-v2', methods=['POST'])
 def generate_itinerary_v2():
     try:
@@ -366,9 +1060,15 @@ def generate_itinerary_v2():
         data = request.get_json()
         print(f"📝 Request data: {data}")
         
+        rate_limited = _check_rate_limits(user_id)
+        if rate_limited:
+            return rate_limited
+        
         # Generate itinerary using AI service
-        ai_service = AIService()
-        ai_response = ai_service.generate_itinerary(data)
+        try:
+            ai_response = _generate_with_admission(data)
+        except AdmissionRejected as e:
+            return _too_many_requests('Server is busy generating itineraries. Please try again shortly.', e.retry_after)
         print(f"🤖 AI response generated: {type(ai_response)}")
         
         # Save to database
@@ -418,11 +1118,21 @@ if __name__ == '__main__':
     print("📍 Server will run on: http://localhost:5000")
     print("🔗 API endpoints available:")
     print("  - POST /api/generate-itinerary")
+    print("  - POST /api/generate-itineraries/batch")
     print("  - GET  /api/itineraries")
+    print("  - GET  /api/itineraries/search")
+    print("  - GET  /api/itineraries/export")
     print("  - GET  /api/itineraries/<id>")
+    print("  - GET  /api/itineraries/<id>/days")
+    print("  - GET  /api/itineraries/<id>/days/<day>")
     print("  - DELETE /api/itineraries/<id>")
+    print("  - POST /api/itineraries/bulk-fetch")
+    print("  - POST /api/itineraries/bulk-delete")
     print("  - GET  /api/test-db")
     print("  - GET  /api/health")
+    print("  - GET  /api/ai-status")
+    print("  - GET  /api/debug/profiles")
+    print("  - GET  /api/debug/memory")
     print("  - POST /api/generate-itinerary-v2")
     print("  - GET  /api/itineraries-v2")
     print("="*50)
@@ -0,0 +1,208 @@
+"""The dict-based itinerary normalization that models.Trip replaced.
+
+Kept verbatim (from AIService) so benchmarks.model_pipeline can compare the
+typed model against it; nothing in the app uses it.
+"""
+from datetime import timedelta
+
+
+class DictPipeline:
+    def validate_and_enhance(self, data, request_data, duration, start_date):
+        data = self._validate_structure(data, request_data, duration, start_date)
+        return self._enhance_itinerary_data(data, request_data, duration, start_date)
+
+    def _validate_structure(self, data, request_data, duration, start_date):
+        """Validate and fix JSON structure"""
+        # Ensure required top-level fields
+        data['destination'] = data.get('destination', request_data['destination'])
+        data['duration'] = data.get('duration', f"{duration} days")
+
+        # Validate daily_itinerary
+        if 'daily_itinerary' not in data or not isinstance(data['daily_itinerary'], list):
+            data['daily_itinerary'] = []
+
+        # Ensure we have the right number of days
+        while len(data['daily_itinerary']) < duration:
+            day_num = len(data['daily_itinerary']) + 1
+            current_date = start_date + timedelta(days=day_num - 1)
+            data['daily_itinerary'].append(self._create_default_day(day_num, current_date, request_data))
+
+        # Validate each day
+        for i, day in enumerate(data['daily_itinerary']):
+            if not isinstance(day, dict):
+                day = {}
+
+            current_date = start_date + timedelta(days=i)
+            day['day'] = day.get('day', i + 1)
+            day['date'] = current_date.strftime('%Y-%m-%d')
+            day['day_name'] = current_date.strftime('%A')
+            day['theme'] = day.get('theme', f"Day {i + 1} - Explore {request_data['destination']}")
+
+            # Validate activities
+            if 'activities' not in day or not isinstance(day['activities'], list):
+                day['activities'] = self._create_default_activities(request_data['destination'], i + 1)
+
+            # Validate meals
+            if 'meals' not in day or not isinstance(day['meals'], list):
+                day['meals'] = self._create_default_meals(request_data.get('isVegetarian', False))
+
+        return data
+
+    def _create_default_day(self, day_num, date, request_data):
+        """Create a default day structure"""
+        return {
+            "day": day_num,
+            "date": date.strftime('%Y-%m-%d'),
+            "day_name": date.strftime('%A'),
+            "theme": f"Day {day_num} - Discover {request_data['destination']}",
+            "activities": self._create_default_activities(request_data['destination'], day_num),
+            "meals": self._create_default_meals(request_data.get('isVegetarian', False))
+        }
+
+    def _create_default_activities(self, destination, day_num):
+        """Create default activities for a day"""
+        morning_activities = [
+            f"Historic {destination} Walking Tour",
+            f"Visit {destination} Museum",
+            f"Explore {destination} Old Town",
+            f"Temple/Heritage Site Visit in {destination}",
+            f"Local Market Tour in {destination}"
+        ]
+
+        afternoon_activities = [
+            f"Scenic Viewpoint in {destination}",
+            f"Cultural Center Visit",
+            f"Local Craft Workshop",
+            f"Nature Park/Garden Tour",
+            f"Shopping District Exploration"
+        ]
+
+        evening_activities = [
+            f"Sunset Point in {destination}",
+            f"Evening Cultural Show",
+            f"Riverside/Lakeside Walk",
+            f"Local Street Food Tour",
+            f"Photography Walk"
+        ]
+
+        return [
+            {
+                "time": "09:00 AM",
+                "activity": morning_activities[(day_num - 1) % len(morning_activities)],
+                "description": f"Start your day exploring the cultural and historical aspects of {destination}",
+                "location": f"Central {destination}",
+                "duration": "2-3 hours",
+                "estimated_cost": "₹200-400",
+                "type": "sightseeing",
+                "highlights": ["Historical significance", "Photo opportunities", "Local culture"],
+                "tips": ["Start early to avoid crowds", "Carry water", "Wear comfortable shoes"]
+            },
+            {
+                "time": "02:00 PM",
+                "activity": afternoon_activities[(day_num - 1) % len(afternoon_activities)],
+                "description": f"Afternoon exploration of {destination}'s unique attractions",
+                "location": f"{destination} Main Area",
+                "duration": "2 hours",
+                "estimated_cost": "₹150-300",
+                "type": "cultural",
+                "highlights": ["Local crafts", "Authentic experience", "Cultural immersion"],
+                "tips": ["Bargain at markets", "Try local snacks", "Interact with locals"]
+            },
+            {
+                "time": "05:30 PM",
+                "activity": evening_activities[(day_num - 1) % len(evening_activities)],
+                "description": f"End your day with beautiful views and relaxation in {destination}",
+                "location": f"{destination} Scenic Area",
+                "duration": "1.5 hours",
+                "estimated_cost": "₹100-200",
+                "type": "leisure",
+                "highlights": ["Beautiful views", "Relaxation", "Perfect photo spots"],
+                "tips": ["Arrive before sunset", "Carry camera", "Enjoy the moment"]
+            }
+        ]
+
+    def _create_default_meals(self, is_vegetarian):
+        """Create default meal suggestions"""
+        veg_suffix = " (Vegetarian)" if is_vegetarian else ""
+
+        return [
+            {
+                "meal_type": "breakfast",
+                "time": "08:00 AM",
+                "restaurant": f"Local Breakfast Spot{veg_suffix}",
+                "cuisine": f"Traditional breakfast{veg_suffix}",
+                "location": "Near accommodation",
+                "estimated_cost": "₹150-250",
+                "specialties": ["Local breakfast items", "Fresh beverages"],
+                "vegetarian_friendly": is_vegetarian,
+                "ambiance": "casual",
+                "booking_required": False
+            },
+            {
+                "meal_type": "lunch",
+                "time": "01:00 PM",
+                "restaurant": f"Popular Local Restaurant{veg_suffix}",
+                "cuisine": f"Regional specialties{veg_suffix}",
+                "location": "City center",
+                "estimated_cost": "₹300-500",
+                "specialties": ["Regional thali", "Local favorites"],
+                "vegetarian_friendly": is_vegetarian,
+                "ambiance": "traditional",
+                "booking_required": False
+            },
+            {
+                "meal_type": "dinner",
+                "time": "07:30 PM",
+                "restaurant": f"Fine Dining Restaurant{veg_suffix}",
+                "cuisine": f"Multi-cuisine{veg_suffix}",
+                "location": "Premium dining area",
+                "estimated_cost": "₹500-800",
+                "specialties": ["Chef's special", "Fusion cuisine"],
+                "vegetarian_friendly": is_vegetarian,
+                "ambiance": "upscale",
+                "booking_required": True
+            }
+        ]
+
+    def _enhance_itinerary_data(self, data, request_data, duration, start_date):
+        """Add missing fields and enhance data structure"""
+        # Add comprehensive trip information
+        if 'trip_summary' not in data:
+            data['trip_summary'] = f"An amazing {duration}-day journey through {request_data['destination']}, featuring cultural exploration, local cuisine, and memorable experiences."
+
+        if 'accommodation_suggestions' not in data:
+            data['accommodation_suggestions'] = [
+                {
+                    "name": f"Recommended Stay in {request_data['destination']}",
+                    "type": "hotel",
+                    "location": f"Central {request_data['destination']}",
+                    "estimated_cost_per_night": "₹2500-4000",
+                    "amenities": ["WiFi", "Breakfast", "AC", "Room Service"],
+                    "rating": "4.2",
+                    "booking_tips": "Book in advance for better rates"
+                }
+            ]
+
+        if 'transportation' not in data:
+            data['transportation'] = {
+                "to_destination": {
+                    "mode": "flight/train",
+                    "estimated_cost": "₹3000-8000",
+                    "duration": "2-6 hours",
+                    "booking_tips": "Book 2-3 weeks in advance"
+                },
+                "local_transport": [
+                    {"mode": "taxi/auto", "usage": "general transport", "estimated_cost": "₹200-500 per day"}
+                ]
+            }
+
+        if 'local_tips' not in data:
+            data['local_tips'] = [
+                f"Best time to visit {request_data['destination']} is during pleasant weather",
+                "Carry cash for local vendors and street food",
+                "Respect local customs and dress codes",
+                "Try authentic local cuisine",
+                "Keep emergency contacts handy"
+            ]
+
+        return data
@@ -0,0 +1,42 @@
+"""The real Flask app wired to the local Groq and Supabase stand-ins.
+
+Serve it exactly like production, e.g.:
+
+    GUNICORN_PROFILE=gevent gunicorn -c gunicorn.conf.py benchmarks.fake_app:app
+
+FAKE_LLM_LATENCY / FAKE_LLM_JITTER / FAKE_LLM_PADDING and FAKE_DB_LATENCY tune
+the stand-ins (seconds, seconds, extra characters per activity, seconds).
+FAKE_LLM_REPLAY points at a traffic capture file whose recorded completions are
+served instead, at their recorded latency divided by FAKE_LLM_REPLAY_SPEED.
+"""
+import os
+
+from benchmarks.fakes import FakeGroqClient, FakeSupabaseClient, ReplayGroqClient
+from services import aiservice, database
+from services.llm_router import LLMRouter, ModelEndpoint
+from services.resilience import CircuitBreaker, ResilientCaller, RetryBudget
+
+
+def install_fakes(llm_latency=None, llm_jitter=None, llm_padding=None, db_latency=None):
+    """Point AIService and DatabaseService at the stand-ins; returns (groq, supabase) fakes"""
+    if os.getenv('FAKE_LLM_REPLAY'):
+        groq = ReplayGroqClient(os.getenv('FAKE_LLM_REPLAY'), speed=float(os.getenv('FAKE_LLM_REPLAY_SPEED', '1.0')))
+    else:
+        groq = FakeGroqClient(
+            latency=llm_latency if llm_latency is not None else float(os.getenv('FAKE_LLM_LATENCY', '0.5')),
+            jitter=llm_jitter if llm_jitter is not None else float(os.getenv('FAKE_LLM_JITTER', '0.1')),
+            padding=llm_padding if llm_padding is not None else int(os.getenv('FAKE_LLM_PADDING', '0'))
+        )
+    supabase = FakeSupabaseClient(
+        latency=db_latency if db_latency is not None else float(os.getenv('FAKE_DB_LATENCY', '0.02'))
+    )
+
+    caller = ResilientCaller(CircuitBreaker(), RetryBudget(), max_retries=0)
+    aiservice._default_router = LLMRouter([ModelEndpoint('fake', 'llama3-8b-8192', groq, caller)])
+    database.create_client = lambda url, key: supabase
+    return groq, supabase
+
+
+fake_groq, fake_supabase = install_fakes()
+
+from app import app  # noqa: E402  (must import after the fakes are installed)
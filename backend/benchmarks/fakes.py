@@ -0,0 +1,467 @@
+"""Local stand-ins for the Groq client and the Supabase table API.
+
+They let the benchmarks and load tests exercise the real request path without
+network access or credentials. Latency is simulated with time.sleep, which
+gevent patches, so the stand-ins behave like real I/O under every worker class.
+"""
+import copy
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from types import SimpleNamespace
+
+
+class FakeGroqClient:
+    """Replay canned itinerary completions with configurable size and latency.
+
+    Without `completions`, a well-formed itinerary is built to match the prompt's
+    destination and trip length; otherwise the given strings are replayed in turn.
+    Content longer than max_tokens (at ~4 characters per token) is cut off and
+    reported with finish_reason='length', like a real model.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.1, padding=0, finish_reason='stop', completions=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.padding = padding
+        self.finish_reason = finish_reason
+        self.completions = list(completions) if completions else None
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _sleep(self):
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _create(self, messages, model=None, temperature=None, max_tokens=None, timeout=None, **kwargs):
+        with self._lock:
+            call_index = self.calls
+            self.calls += 1
+        if self.completions:
+            content = self.completions[call_index % len(self.completions)]
+        else:
+            prompt = messages[-1]['content'] if messages else ''
+            content = build_completion(prompt, self.padding)
+        self._sleep()
+        finish_reason = self.finish_reason
+        if max_tokens and len(content) > max_tokens * 4:
+            content = content[:max_tokens * 4]
+            finish_reason = 'length'
+        prompt_tokens = sum(len(m.get('content') or '') for m in messages) // 4
+        completion_tokens = len(content) // 4
+        return SimpleNamespace(
+            id=f"fake-{uuid.uuid4()}",
+            model=model,
+            choices=[SimpleNamespace(
+                index=0,
+                finish_reason=finish_reason,
+                message=SimpleNamespace(role='assistant', content=content)
+            )],
+            usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens
+            )
+        )
+
+
+def build_completion(prompt, padding=0):
+    """Build a well-formed itinerary JSON matching the duration and destination in prompt.
+
+    Continuation prompts ("Plan only days N to M") get just those days.
+    """
+    duration_match = re.search(r'(\d+)-day travel itinerary for visiting (.+?)\.\n', prompt)
+    duration = int(duration_match.group(1)) if duration_match else 3
+    destination = duration_match.group(2) if duration_match else 'Goa'
+    range_match = re.search(r'Plan only days (\d+) to (\d+)', prompt)
+    first_day, last_day = (int(range_match.group(1)), int(range_match.group(2))) if range_match else (1, duration)
+    filler = ' Lorem ipsum dolor sit amet.' * (padding // 28) if padding else ''
+
+    def activity(day, slot, time_label):
+        return {
+            'time': time_label,
+            'activity': f"{destination} highlight {day}.{slot}",
+            'description': f"Explore a local landmark on day {day}.{filler}",
+            'location': f"{destination} district {slot}",
+            'duration': '2 hours',
+            'estimated_cost': '₹200-400',
+            'type': 'sightseeing',
+            'difficulty_level': 'easy',
+            'highlights': ['Views', 'History'],
+            'tips': ['Go early', 'Carry water']
+        }
+
+    def meal(meal_type, time_label, cost):
+        return {
+            'meal_type': meal_type,
+            'time': time_label,
+            'restaurant': f"{destination} {meal_type.title()} House",
+            'cuisine': 'Local',
+            'location': f"{destination} market",
+            'estimated_cost': cost,
+            'specialties': ['Thali', 'Chai'],
+            'vegetarian_friendly': True,
+            'ambiance': 'casual',
+            'booking_required': False
+        }
+
+    days = []
+    for day in range(first_day, last_day + 1):
+        days.append({
+            'day': day,
+            'date': '',
+            'day_name': '',
+            'theme': f"Day {day} in {destination}",
+            'weather_note': 'Warm and humid',
+            'activities': [
+                activity(day, 1, '09:00 AM'),
+                activity(day, 2, '02:00 PM'),
+                activity(day, 3, '05:30 PM')
+            ],
+            'meals': [
+                meal('breakfast', '08:00 AM', '₹200'),
+                meal('lunch', '01:00 PM', '₹400'),
+                meal('dinner', '07:30 PM', '₹700')
+            ],
+            'daily_budget_breakdown': {'activities': '₹1000', 'meals': '₹1300'},
+            'evening_suggestions': ['Beach walk', 'Night market']
+        })
+
+    return json.dumps({
+        'destination': destination,
+        'duration': f"{duration} days",
+        'total_estimated_cost': '₹50000',
+        'trip_summary': f"A {duration}-day trip through {destination}.",
+        'daily_itinerary': days,
+        'accommodation_suggestions': [{'name': f"{destination} Stay", 'type': 'hotel'}],
+        'transportation': {'to_destination': {'mode': 'flight'}, 'local_transport': []},
+        'packing_suggestions': ['Sunscreen'],
+        'local_tips': ['Carry cash'],
+        'emergency_contacts': {'local_emergency': '108'}
+    }, ensure_ascii=False)
+
+
+class ReplayGroqClient:
+    """Serve completions recorded by TrafficRecorder, with their original latencies.
+
+    A prompt is answered with the completion recorded for the same prompt when
+    there is one, otherwise recorded completions are served in turn.
+    """
+
+    def __init__(self, capture_path, speed=1.0):
+        from services.traffic_capture import load_capture, prompt_fingerprint
+        _, completions = load_capture(capture_path)
+        if not completions:
+            raise ValueError(f"No completions recorded in {capture_path}")
+        self._fingerprint = prompt_fingerprint
+        self.speed = speed
+        self.completions = completions
+        self.by_prompt = {}
+        for event in completions:
+            self.by_prompt.setdefault(event['prompt_sha256'], []).append(event)
+        self.calls = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages, model=None, timeout=None, **kwargs):
+        matches = self.by_prompt.get(self._fingerprint(messages))
+        with self._lock:
+            call_index = self.calls
+            self.calls += 1
+            if not matches:
+                self.misses += 1
+        event = (matches or self.completions)[call_index % len(matches or self.completions)]
+        if self.speed > 0:
+            time.sleep(event['latency'] / self.speed)
+        usage = event.get('usage') or {}
+        return SimpleNamespace(
+            id=f"replay-{uuid.uuid4()}",
+            model=model,
+            choices=[SimpleNamespace(
+                index=0,
+                finish_reason=event.get('finish_reason') or 'stop',
+                message=SimpleNamespace(role='assistant', content=event['content'])
+            )],
+            usage=SimpleNamespace(
+                prompt_tokens=usage.get('prompt_tokens'),
+                completion_tokens=usage.get('completion_tokens'),
+                total_tokens=usage.get('total_tokens')
+            )
+        )
+
+
+class FakeSupabaseClient:
+    """In-memory implementation of the slice of the supabase-py table API the services use"""
+
+    # (table, embedded table) -> (local column, remote column, 'one' | 'many'), mirroring the schema's foreign keys
+    RELATIONSHIPS = {
+        ('itineraries', 'itinerary_blobs'): ('content_hash', 'content_hash', 'one'),
+        ('itineraries', 'itinerary_items'): ('id', 'itinerary_id', 'many'),
+        ('itinerary_items', 'places'): ('place_key', 'place_key', 'one')
+    }
+
+    def __init__(self, latency=0.02, jitter=0.005):
+        self.latency = latency
+        self.jitter = jitter
+        self.tables = {}
+        self.executes = 0
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def _rows(self, name):
+        return self.tables.setdefault(name, [])
+
+    def _sleep(self):
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def rpc(self, name, params=None):
+        return FakeRpc(self, name, params or {})
+
+
+# Column weights of the search_vector in migrations/006, as ts_rank_cd weighs labels A, B and C
+SEARCH_WEIGHTS = (('title', 1.0), ('destination', 1.0), ('description', 0.4), ('search_text', 0.2))
+SEARCH_COLUMNS = ('id', 'user_id', 'destination', 'title', 'description', 'start_date', 'end_date', 'budget',
+                  'created_at', 'updated_at', 'item_count', 'activity_count', 'meal_count', 'day_count',
+                  'activity_cost_total', 'meal_cost_total', 'cost_total')
+
+
+def _words(text):
+    return re.findall(r'[a-z0-9]+', str(text or '').lower())
+
+
+class FakeRpc:
+    """Stand-in for the SQL functions called through rpc(); matches every query word, no stemming"""
+
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        self.client._sleep()
+        with self.client._lock:
+            self.client.executes += 1
+            if self.name != 'search_itineraries':
+                raise ValueError(f"Unknown function: {self.name}")
+            data = self._search_itineraries(self.client._rows('itineraries'), **self.params)
+        return SimpleNamespace(data=data, count=len(data))
+
+    def _search_itineraries(self, rows, p_user_id, p_query, p_limit=20, p_offset=0):
+        terms = set(_words(p_query))
+        matches = []
+        for row in rows:
+            if row.get('user_id') != p_user_id or not terms:
+                continue
+            counts = {column: Counter(_words(row.get(column))) for column, _ in SEARCH_WEIGHTS}
+            if not all(any(term in words for words in counts.values()) for term in terms):
+                continue
+            rank = sum(weight * counts[column][term] for column, weight in SEARCH_WEIGHTS for term in terms)
+            matches.append({**{column: copy.deepcopy(row.get(column)) for column in SEARCH_COLUMNS}, 'rank': rank})
+        matches.sort(key=lambda r: r['created_at'] or '', reverse=True)
+        matches.sort(key=lambda r: r['rank'], reverse=True)
+        return matches[p_offset:p_offset + p_limit]
+
+
+def _matches(row, filters):
+    for op, column, value in filters:
+        current = row.get(column)
+        if op == 'eq' and current != value:
+            return False
+        if op == 'neq' and current == value:
+            return False
+        if op == 'in' and current not in value:
+            return False
+        if op == 'gt' and not (current is not None and current > value):
+            return False
+        if op == 'gte' and not (current is not None and current >= value):
+            return False
+        if op == 'lt' and not (current is not None and current < value):
+            return False
+        if op == 'lte' and not (current is not None and current <= value):
+            return False
+    return True
+
+
+def _split_columns(columns):
+    """Split a PostgREST select list on top-level commas, keeping embedded "table(cols)" intact"""
+    parts, depth, current = [], 0, ''
+    for char in columns:
+        if char == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+            continue
+        depth += (char == '(') - (char == ')')
+        current += char
+    parts.append(current.strip())
+    return [p for p in parts if p]
+
+
+def _project(client, table, row, columns):
+    if columns in (None, '*'):
+        return copy.deepcopy(row)
+    projected = {}
+    for column in _split_columns(columns):
+        if '(' not in column:
+            if column == '*':
+                projected.update(copy.deepcopy(row))
+            else:
+                projected[column] = copy.deepcopy(row.get(column))
+            continue
+        name, inner = column.split('(', 1)
+        name = name.strip()
+        relation = client.RELATIONSHIPS.get((table, name))
+        if relation is None:
+            continue
+        local, remote, kind = relation
+        related = [_project(client, name, r, inner[:-1]) for r in client._rows(name)
+                   if row.get(local) is not None and r.get(remote) == row.get(local)]
+        projected[name] = related if kind == 'many' else (related[0] if related else None)
+    return projected
+
+
+class FakeQuery:
+    """Chainable query builder mirroring postgrest's select/insert/upsert/delete builders"""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.action = 'select'
+        self.columns = '*'
+        self.payload = None
+        self.on_conflict = 'id'
+        self.filters = []
+        self.orders = []
+        self.limit_count = None
+        self.offset = 0
+
+    def select(self, columns='*', count=None):
+        self.action, self.columns = 'select', columns
+        return self
+
+    def insert(self, payload):
+        self.action, self.payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, on_conflict='id', ignore_duplicates=False, **kwargs):
+        self.action, self.payload, self.on_conflict = 'upsert', payload, on_conflict or 'id'
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload):
+        self.action, self.payload = 'update', payload
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(('eq', column, value))
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(('neq', column, value))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(('in', column, list(values)))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(('gt', column, value))
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(('gte', column, value))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(('lt', column, value))
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(('lte', column, value))
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.limit_count = count
+        return self
+
+    def range(self, start, end):
+        self.offset, self.limit_count = start, end - start + 1
+        return self
+
+    def execute(self):
+        self.client._sleep()
+        with self.client._lock:
+            self.client.executes += 1
+            rows = self.client._rows(self.table)
+            data = getattr(self, f"_{self.action}")(rows)
+        return SimpleNamespace(data=data, count=len(data))
+
+    def _select(self, rows):
+        selected = [r for r in rows if _matches(r, self.filters)]
+        for column, desc in reversed(self.orders):
+            selected.sort(key=lambda r: (r.get(column) is None, r.get(column) or ''), reverse=desc)
+        selected = selected[self.offset:]
+        if self.limit_count is not None:
+            selected = selected[:self.limit_count]
+        return [_project(self.client, self.table, r, self.columns) for r in selected]
+
+    def _insert(self, rows):
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        inserted = []
+        for record in payload:
+            record = copy.deepcopy(record)
+            record.setdefault('id', str(uuid.uuid4()))
+            record.setdefault('created_at', datetime.now().isoformat())
+            rows.append(record)
+            inserted.append(copy.deepcopy(record))
+        return inserted
+
+    def _upsert(self, rows):
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        keys = [k.strip() for k in self.on_conflict.split(',')]
+        result = []
+        for record in payload:
+            existing = next((r for r in rows if all(r.get(k) == record.get(k) for k in keys)), None)
+            if existing is None:
+                record = copy.deepcopy(record)
+                record.setdefault('id', str(uuid.uuid4()))
+                rows.append(record)
+                result.append(copy.deepcopy(record))
+            elif not getattr(self, 'ignore_duplicates', False):
+                existing.update(copy.deepcopy(record))
+                result.append(copy.deepcopy(existing))
+        return result
+
+    def _update(self, rows):
+        updated = []
+        for row in rows:
+            if _matches(row, self.filters):
+                row.update(copy.deepcopy(self.payload))
+                updated.append(copy.deepcopy(row))
+        return updated
+
+    def _delete(self, rows):
+        kept, deleted = [], []
+        for row in rows:
+            (deleted if _matches(row, self.filters) else kept).append(row)
+        rows[:] = kept
+        return deleted
@@ -0,0 +1,147 @@
+"""Compare gunicorn worker profiles under concurrent generation load.
+
+Each profile serves benchmarks.fake_app (the real app on the Groq/Supabase
+stand-ins) with a single worker process, then the same burst of concurrent
+/api/generate-itinerary and /api/itineraries requests is fired at it.
+
+    cd backend
+    python -m benchmarks.load_compare --profiles sync gthread gevent --concurrency 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from benchmarks.timing import summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _request(url, method='GET', body=None, headers=None, timeout=300):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={
+        'Content-Type': 'application/json', **(headers or {})
+    })
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        resp.read()
+        return resp.status
+
+
+def fire(base_url, concurrency, user_ids, kind):
+    """Send `concurrency` simultaneous requests of one kind and time each of them"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    start_gate = threading.Event()
+
+    def worker(i):
+        user_id = user_ids[i % len(user_ids)]
+        if kind == 'generate':
+            args = (f"{base_url}/api/generate-itinerary", 'POST', {
+                'destination': 'Goa', 'start_date': '2026-12-01', 'end_date': '2026-12-05',
+                'budget': 40000, 'isVegetarian': False
+            }, {'X-User-ID': user_id})
+        else:
+            args = (f"{base_url}/api/itineraries", 'GET', None, {'X-User-ID': user_id})
+        start_gate.wait()
+        started = time.perf_counter()
+        try:
+            _request(*args)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+        except (urllib.error.URLError, OSError):
+            with lock:
+                errors[0] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    started = time.perf_counter()
+    start_gate.set()
+    for t in threads:
+        t.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def wait_until_ready(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if _request(f"{base_url}/api/health", timeout=2) == 200:
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+def run_profile(profile, port, args):
+    store_dir = tempfile.mkdtemp(prefix=f"load-{profile}-")
+    env = {
+        **os.environ,
+        'GUNICORN_PROFILE': profile,
+        'WEB_CONCURRENCY': '1',
+        'GUNICORN_THREADS': str(args.concurrency),
+        'GUNICORN_WORKER_CONNECTIONS': str(max(args.concurrency * 2, 100)),
+        'FAKE_LLM_LATENCY': str(args.llm_latency),
+        'FAKE_DB_LATENCY': str(args.db_latency),
+        'RATE_LIMIT_ENABLED': 'false',
+        # Requests repeat a handful of trips; cache hits would hide the generation path
+        'GENERATION_CACHE_ENABLED': 'false',
+        'GENERATION_MAX_IN_FLIGHT': str(args.concurrency * 2),
+        'SHARED_STORE_PATH': os.path.join(store_dir, 'shared.db'),
+        'SUPABASE_URL': os.environ.get('SUPABASE_URL', 'http://fake-supabase'),
+        'SUPABASE_KEY': os.environ.get('SUPABASE_KEY', 'fake-key'),
+        'GROQ_API_KEY': os.environ.get('GROQ_API_KEY', 'fake-key')
+    }
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f"127.0.0.1:{port}",
+         'benchmarks.fake_app:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(base_url)
+        user_ids = [str(uuid.uuid4()) for _ in range(20)]
+        return {
+            'generate': fire(base_url, args.concurrency, user_ids, 'generate'),
+            'list': fire(base_url, args.concurrency, user_ids, 'list')
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--llm-latency', type=float, default=1.0)
+    parser.add_argument('--db-latency', type=float, default=0.02)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    results = {}
+    for offset, profile in enumerate(args.profiles):
+        print(f"▶️ {profile}: {args.concurrency} concurrent requests, LLM latency {args.llm_latency}s")
+        results[profile] = run_profile(profile, args.port + offset, args)
+
+    print(f"\n{'profile':<10}{'route':<10}{'rps':>10}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'errors':>8}")
+    for profile, routes in results.items():
+        for route, stats in routes.items():
+            print(f"{profile:<10}{route:<10}{stats['throughput_rps']!s:>10}{stats['p50_ms']!s:>12}"
+                  f"{stats['p95_ms']!s:>12}{stats['p99_ms']!s:>12}{stats['errors']:>8}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Compare the typed itinerary model with the old dict normalization pipeline.
+
+CPU: time from the raw LLM response text to the normalized itinerary (the
+model alone, and serialized back to a dict or JSON). Both a complete response
+and a short one that has to be padded with template days are measured.
+
+Memory: tracemalloc-measured bytes retained per normalized itinerary while
+holding --hold of them, as the batch endpoint does.
+
+    cd backend
+    python -m benchmarks.model_pipeline --days 3 7 14 30
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.dict_pipeline import DictPipeline
+from benchmarks.fakes import build_completion
+from benchmarks.timing import measure
+from models import Trip
+
+START = datetime(2026, 12, 1)
+REQUEST = {'destination': 'Goa', 'budget': '50000', 'isVegetarian': False}
+
+
+def response_text(days, padding, returned_days=None):
+    data = json.loads(build_completion(f"Create a {days}-day travel itinerary for visiting Goa.\n", padding))
+    if returned_days is not None:
+        data['daily_itinerary'] = data['daily_itinerary'][:returned_days]
+    return json.dumps(data, ensure_ascii=False)
+
+
+def retained_bytes(build, count):
+    """Bytes still allocated per object after building `count` of them and keeping them alive"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build() for _ in range(count)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / count
+
+
+def run(args):
+    pipeline = DictPipeline()
+    results = {}
+    for days in args.days:
+        for label, returned in (('complete', None), ('padded', max(1, days // 3))):
+            text = response_text(days, args.padding, returned)
+
+            # Every variant parses the raw response, as AIService does
+            def dict_pipeline():
+                return pipeline.validate_and_enhance(json.loads(text), REQUEST, days, START)
+
+            def model():
+                return Trip.from_dict(json.loads(text), 'Goa', days, START)
+
+            stats = {
+                'parse_only': measure(lambda: json.loads(text), args.repeat),
+                'dict_pipeline': measure(dict_pipeline, args.repeat),
+                'model': measure(model, args.repeat),
+                'model_to_dict': measure(lambda: model().to_dict(), args.repeat),
+                'model_to_json': measure(lambda: model().to_json(), args.repeat),
+                'dict_to_json': measure(lambda: json.dumps(dict_pipeline(), ensure_ascii=False), args.repeat),
+                'bytes_per_itinerary': {
+                    'dict_pipeline': round(retained_bytes(dict_pipeline, args.hold)),
+                    'model': round(retained_bytes(model, args.hold))
+                }
+            }
+            results.setdefault(str(days), {})[label] = stats
+
+            memory = stats['bytes_per_itinerary']
+            print(f"  {days:>3} days {label:<9}"
+                  f" dict {stats['dict_pipeline']['median_ms']:>7.3f} ms"
+                  f"  model {stats['model']['median_ms']:>7.3f} ms"
+                  f"  model+to_dict {stats['model_to_dict']['median_ms']:>7.3f} ms"
+                  f"  (parse {stats['parse_only']['median_ms']:>7.3f} ms)"
+                  f"  |  {memory['dict_pipeline']:>7} B vs {memory['model']:>7} B retained")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, nargs='+', default=[3, 7, 14, 30])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--hold', type=int, default=200, help='Itineraries kept alive for the memory measurement')
+    parser.add_argument('--padding', type=int, default=0, help='Extra characters per activity description')
+    parser.add_argument('--output', help='Write the results as JSON to this path')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
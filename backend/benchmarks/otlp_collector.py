@@ -0,0 +1,179 @@
+"""Local OTLP/HTTP collector stand-in and trace breakdown report.
+
+Run the collector, then point the backend at it:
+
+    cd backend
+    python -m benchmarks.otlp_collector --port 4318 --output spans.jsonl
+    TRACING_ENABLED=true TRACING_EXPORTER=otlp TRACING_OTLP_ENDPOINT=http://127.0.0.1:4318 python app.py
+
+Every finished request is printed as a span tree with its network time
+(Supabase and LLM calls) separated from time spent in Python. Span files,
+whether written by the collector or by TRACING_EXPORTER=file, can be
+reported on later:
+
+    python -m benchmarks.otlp_collector --report /tmp/ai-itinerary/spans.jsonl [--trace-id ID]
+"""
+import argparse
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NETWORK_PREFIXES = ('supabase.', 'llm.call')
+
+
+def _attribute_value(value):
+    for key in ('stringValue', 'boolValue', 'doubleValue'):
+        if key in value:
+            return value[key]
+    if 'intValue' in value:
+        return int(value['intValue'])
+    return None
+
+
+def from_otlp(payload):
+    """Flatten an OTLP JSON export request into span dicts shaped like FileSpanExporter lines"""
+    spans = []
+    for resource_spans in payload.get('resourceSpans', []):
+        for scope_spans in resource_spans.get('scopeSpans', []):
+            for s in scope_spans.get('spans', []):
+                start, end = int(s['startTimeUnixNano']), int(s['endTimeUnixNano'])
+                status = s.get('status') or {}
+                spans.append({
+                    'trace_id': s['traceId'],
+                    'span_id': s['spanId'],
+                    'parent_id': s.get('parentSpanId') or None,
+                    'name': s['name'],
+                    'kind': s.get('kind'),
+                    'start_ns': start,
+                    'end_ns': end,
+                    'duration_ms': round((end - start) / 1e6, 3),
+                    'attributes': {a['key']: _attribute_value(a['value']) for a in s.get('attributes', [])},
+                    'error': status.get('message') if status.get('code') == 2 else None
+                })
+    return spans
+
+
+def _union_ms(intervals):
+    total, current_start, current_end = 0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total / 1e6
+
+
+def format_trace(spans):
+    """Indented span tree with self time, plus network vs in-process totals"""
+    by_id = {s['span_id']: s for s in spans}
+    children = defaultdict(list)
+    roots = []
+    for s in sorted(spans, key=lambda s: s['start_ns']):
+        if s['parent_id'] in by_id:
+            children[s['parent_id']].append(s)
+        else:
+            roots.append(s)
+
+    lines = []
+
+    def walk(node, depth):
+        child_ms = _union_ms([(c['start_ns'], c['end_ns']) for c in children[node['span_id']]])
+        offset_ms = (node['start_ns'] - roots[0]['start_ns']) / 1e6
+        marker = ' [net]' if node['name'].startswith(NETWORK_PREFIXES) else ''
+        error = f"  !! {node['error']}" if node.get('error') else ''
+        lines.append(f"{'  ' * depth}{node['name']:<{48 - 2 * depth}} +{offset_ms:>8.1f} ms"
+                     f" {node['duration_ms']:>9.1f} ms  self {node['duration_ms'] - child_ms:>8.1f} ms{marker}{error}")
+        for child in children[node['span_id']]:
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+
+    total_ms = sum(r['duration_ms'] for r in roots)
+    network_ms = _union_ms([(s['start_ns'], s['end_ns']) for s in spans if s['name'].startswith(NETWORK_PREFIXES)])
+    lines.append(f"trace {spans[0]['trace_id']}: {total_ms:.1f} ms total, {network_ms:.1f} ms network,"
+                 f" {max(0.0, total_ms - network_ms):.1f} ms in process")
+    return '\n'.join(lines)
+
+
+class Collector:
+    def __init__(self, output=None):
+        self.output = open(output, 'a', encoding='utf-8') if output else None
+        self.pending = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def receive(self, spans):
+        finished = []
+        with self._lock:
+            for s in spans:
+                if self.output:
+                    self.output.write(json.dumps(s) + '\n')
+                self.pending[s['trace_id']].append(s)
+                # Request roots are SERVER spans and end after their children
+                if s.get('kind') == 2:
+                    finished.append(self.pending.pop(s['trace_id']))
+            if self.output:
+                self.output.flush()
+        for trace in finished:
+            print(format_trace(trace) + '\n', flush=True)
+
+
+def serve(port, collector):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/v1/traces':
+                self.send_error(404)
+                return
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            try:
+                collector.receive(from_otlp(json.loads(body)))
+            except (ValueError, KeyError) as e:
+                self.send_error(400, str(e))
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(b'{}')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    print(f"📡 OTLP collector listening on http://127.0.0.1:{port}/v1/traces")
+    server.serve_forever()
+
+
+def report(path, trace_id=None):
+    traces = defaultdict(list)
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                s = json.loads(line)
+                traces[s['trace_id']].append(s)
+    for tid, spans in traces.items():
+        if trace_id and not tid.startswith(trace_id):
+            continue
+        print(format_trace(spans) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=4318)
+    parser.add_argument('--output', help='Append received spans to this JSONL file')
+    parser.add_argument('--report', help='Print breakdowns from a span file instead of collecting')
+    parser.add_argument('--trace-id', help='With --report, only this trace (prefix match)')
+    args = parser.parse_args()
+
+    if args.report:
+        report(args.report, args.trace_id)
+    else:
+        serve(args.port, Collector(args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Replay captured production traffic against a running backend.
+
+Capture traffic by running the backend with TRAFFIC_CAPTURE_PATH set (requests and
+Groq completions are written anonymized to that JSONL file). Then serve the app
+with the recorded completions standing in for Groq and replay the requests:
+
+    cd backend
+    FAKE_LLM_REPLAY=capture.jsonl GUNICORN_PROFILE=gevent gunicorn -c gunicorn.conf.py benchmarks.fake_app:app
+    python -m benchmarks.replay_load capture.jsonl --url http://127.0.0.1:8000 --concurrency 50 --rate 20
+
+--rate 0 sends as fast as the workers allow; --preserve-timing keeps the
+recorded inter-arrival gaps (divided by --speed) instead.
+"""
+import argparse
+import json
+import queue
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+
+from benchmarks.timing import percentile
+from services.traffic_capture import load_capture
+
+ID_PATTERN = re.compile(r'/[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}')
+
+
+def route_of(event):
+    return f"{event['method']} {ID_PATTERN.sub('/<id>', event['path'])}"
+
+
+def send(base_url, event, timeout):
+    url = base_url.rstrip('/') + event['path']
+    if event.get('query'):
+        url += '?' + urllib.parse.urlencode(event['query'])
+    body = json.dumps(event['payload']).encode('utf-8') if event.get('payload') is not None else None
+    headers = {'Content-Type': 'application/json', **(event.get('headers') or {})}
+    req = urllib.request.Request(url, data=body, method=event['method'], headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            return resp.status, resp.headers.get('X-Generation-Source')
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code, e.headers.get('X-Generation-Source')
+
+
+def schedule(events, args):
+    """Yield (send_at_offset_seconds, event) for the whole replay"""
+    if args.preserve_timing:
+        first = events[0]['ts']
+        for loop in range(args.loops):
+            span = (events[-1]['ts'] - first) / args.speed
+            for event in events:
+                yield loop * (span + 1) + (event['ts'] - first) / args.speed, event
+    else:
+        interval = 1.0 / args.rate if args.rate > 0 else 0.0
+        index = 0
+        for _ in range(args.loops):
+            for event in events:
+                yield index * interval, event
+                index += 1
+
+
+def replay(events, args):
+    work = queue.Queue(maxsize=args.concurrency * 2)
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            event = item
+            started = time.perf_counter()
+            try:
+                status, source = send(args.url, event, args.timeout)
+            except (urllib.error.URLError, OSError) as e:
+                status, source = None, None
+                print(f"⚠️ {route_of(event)} failed: {e}")
+            with lock:
+                results.append((route_of(event), status, source, time.perf_counter() - started))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+
+    started = time.perf_counter()
+    for offset, event in schedule(events, args):
+        delay = started + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        work.put(event)
+    for _ in threads:
+        work.put(None)
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - started
+
+
+def report(results, elapsed):
+    by_route = defaultdict(list)
+    for route, status, source, latency in results:
+        by_route[route].append((status, source, latency))
+
+    def stats(rows):
+        latencies = [latency for status, _, latency in rows if status is not None]
+        statuses = Counter(str(status) for status, _, _ in rows)
+        errors = sum(1 for status, _, _ in rows if status is None or status >= 500)
+        generated = [source for _, source, _ in rows if source]
+        return {
+            'requests': len(rows),
+            'throughput_rps': round(len(rows) / elapsed, 2) if elapsed else None,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+            'p90_ms': round(percentile(latencies, 90) * 1000, 1) if latencies else None,
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+            'max_ms': round(max(latencies) * 1000, 1) if latencies else None,
+            'error_rate': round(errors / len(rows), 4) if rows else 0,
+            'throttled_rate': round(statuses.get('429', 0) / len(rows), 4) if rows else 0,
+            'fallback_rate': round(generated.count('fallback') / len(generated), 4) if generated else None,
+            'statuses': dict(statuses)
+        }
+
+    all_rows = [row for rows in by_route.values() for row in rows]
+    return {
+        'elapsed_seconds': round(elapsed, 2),
+        'overall': stats(all_rows),
+        'routes': {route: stats(rows) for route, rows in sorted(by_route.items())}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('capture', help='Capture file written with TRAFFIC_CAPTURE_PATH')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--rate', type=float, default=0.0, help='Requests per second (0 = unthrottled)')
+    parser.add_argument('--preserve-timing', action='store_true', help='Replay recorded inter-arrival gaps')
+    parser.add_argument('--speed', type=float, default=1.0, help='Time compression for --preserve-timing')
+    parser.add_argument('--loops', type=int, default=1, help='Replay the capture this many times')
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--output', help='Write the report as JSON to this path')
+    args = parser.parse_args()
+
+    events, _ = load_capture(args.capture)
+    events.sort(key=lambda e: e['ts'])
+    if not events:
+        raise SystemExit(f"No requests recorded in {args.capture}")
+
+    print(f"▶️ Replaying {len(events) * args.loops} requests against {args.url} with concurrency {args.concurrency}")
+    results, elapsed = replay(events, args)
+    summary = report(results, elapsed)
+
+    print(f"\n{'route':<42}{'reqs':>6}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'err%':>7}{'429%':>7}{'fb%':>7}")
+    for route, s in [('ALL', summary['overall'])] + list(summary['routes'].items()):
+        fallback = f"{s['fallback_rate'] * 100:.1f}" if s['fallback_rate'] is not None else '-'
+        print(f"{route:<42}{s['requests']:>6}{s['throughput_rps']!s:>8}{s['p50_ms']!s:>9}{s['p95_ms']!s:>9}"
+              f"{s['p99_ms']!s:>9}{s['error_rate'] * 100:>7.1f}{s['throttled_rate'] * 100:>7.1f}{fallback:>7}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'report': summary}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
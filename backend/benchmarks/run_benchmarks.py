@@ -0,0 +1,245 @@
+"""Offline benchmark suite for the generation and storage hot paths.
+
+Everything runs in-process against the Groq and Supabase stand-ins, so no
+credentials or network are needed. Each benchmark is measured for a range of
+trip lengths and its median compared against a baseline to catch regressions.
+
+Absolute timings only compare on one machine, so the baseline is local: the
+first run records benchmarks/baselines/local.json (not committed), later runs
+compare against it. Cases faster than --min-ms are too noisy to gate on and
+are skipped. Refresh the baseline with --save after an intended change.
+
+    cd backend
+    python -m benchmarks.run_benchmarks --tolerance 0.25
+    python -m benchmarks.run_benchmarks --save benchmarks/baselines/local.json --compare ''
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DAYS = [1, 2, 3, 5, 7, 10, 14, 21, 30]
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, 'benchmarks', 'baselines', 'local.json')
+
+
+def _configure_environment(args):
+    """Settings read at import time by config.py and benchmarks.fake_app"""
+    os.environ['FAKE_LLM_LATENCY'] = str(args.llm_latency)
+    os.environ['FAKE_LLM_JITTER'] = '0'
+    os.environ['FAKE_LLM_PADDING'] = str(args.padding)
+    os.environ['FAKE_DB_LATENCY'] = str(args.db_latency)
+    os.environ['RATE_LIMIT_ENABLED'] = 'false'
+    # Every repeat posts the same trip, so cache hits would stand in for generation
+    os.environ['GENERATION_CACHE_ENABLED'] = 'false'
+    os.environ.setdefault('SHARED_STORE_PATH', os.path.join(tempfile.mkdtemp(prefix='bench-'), 'shared.db'))
+    for key in ('SUPABASE_URL', 'SUPABASE_KEY', 'GROQ_API_KEY'):
+        os.environ.setdefault(key, 'fake')
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _trip(days):
+    start = datetime(2026, 12, 1)
+    return {
+        'destination': 'Goa',
+        'start_date': start.strftime('%Y-%m-%d'),
+        'end_date': (start + timedelta(days=days - 1)).strftime('%Y-%m-%d'),
+        'budget': str(5000 * days),
+        'isVegetarian': False
+    }, start
+
+
+def run(args):
+    _configure_environment(args)
+    quiet = io.StringIO()
+
+    with contextlib.redirect_stdout(quiet):
+        from benchmarks import fake_app
+        from benchmarks.fakes import build_completion
+        from benchmarks.timing import measure
+        flask_app = fake_app.app
+        import app as app_module
+
+    ai = app_module.ai_service
+    db = app_module.db_service
+    client = flask_app.test_client()
+    user_id = str(uuid.uuid4())
+    results = {}
+
+    def record(name, days, stats):
+        results.setdefault(name, {})[str(days)] = stats
+        print(f"  {name:<24} {days:>3} days  median {stats['median_ms']:>10.3f} ms  p95 {stats['p95_ms']:>10.3f} ms")
+
+    for days in args.days:
+        request_data, start = _trip(days)
+        prompt = ai._create_enhanced_prompt(request_data, days, start)
+        completion = build_completion(prompt, args.padding)
+
+        def quietly(func):
+            def wrapped():
+                quiet.seek(0)
+                quiet.truncate()
+                with contextlib.redirect_stdout(quiet):
+                    func()
+            return wrapped
+
+        record('prompt_build', days, measure(
+            quietly(lambda: ai._create_enhanced_prompt(request_data, days, start)), args.repeat
+        ))
+
+        record('parse_validate', days, measure(
+            quietly(lambda: ai._extract_and_validate_json(completion, request_data, days, start)), args.repeat
+        ))
+
+        with contextlib.redirect_stdout(quiet):
+            ai_response = ai._extract_and_validate_json(completion, request_data, days, start)
+        db_request = {**request_data, 'budget': int(request_data['budget'])}
+        itinerary_id = str(uuid.uuid4())
+        record('upsert_itinerary', days, measure(
+            quietly(lambda: db.upsert_itinerary(db_request, ai_response, user_id, itinerary_id)), args.repeat
+        ))
+
+        list_user = str(uuid.uuid4())
+        with contextlib.redirect_stdout(quiet):
+            for _ in range(args.list_size):
+                db.upsert_itinerary(db_request, ai_response, list_user)
+        record('get_user_itineraries', days, measure(
+            quietly(lambda: db.get_user_itineraries(list_user)), args.repeat
+        ))
+
+        if days < 2:
+            # The route requires end_date after start_date, so single-day trips cannot be posted
+            continue
+
+        def generate_route():
+            response = client.post('/api/generate-itinerary', json=request_data, headers={'X-User-ID': user_id})
+            assert response.status_code == 200, response.get_data(as_text=True)
+        record('route_generate', days, measure(quietly(generate_route), args.repeat))
+
+        def get_route():
+            response = client.get(f"/api/itineraries/{itinerary_id}")
+            assert response.status_code == 200, response.get_data(as_text=True)
+        record('route_get_itinerary', days, measure(quietly(get_route), args.repeat))
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_commit': _git_commit(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'machine': platform.node(),
+            'repeat': args.repeat,
+            'llm_latency': args.llm_latency,
+            'db_latency': args.db_latency,
+            'padding': args.padding,
+            'list_size': args.list_size
+        },
+        'results': results
+    }
+
+
+def _rerun(args):
+    """Results of the same benchmarks from a separate process"""
+    with tempfile.TemporaryDirectory(prefix='bench-rerun-') as directory:
+        path = os.path.join(directory, 'results.json')
+        command = [sys.executable, '-m', 'benchmarks.run_benchmarks', '--save', path, '--compare', '',
+                   '--days', *[str(d) for d in args.days], '--repeat', str(args.repeat),
+                   '--llm-latency', str(args.llm_latency), '--db-latency', str(args.db_latency),
+                   '--padding', str(args.padding), '--list-size', str(args.list_size)]
+        env = {k: v for k, v in os.environ.items() if k != 'SHARED_STORE_PATH'}
+        subprocess.run(command, cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+        with open(path) as f:
+            return json.load(f)
+
+
+def compare(current, baseline, tolerance, min_ms=1.0):
+    """Return the benchmarks whose median regressed by more than tolerance.
+
+    Cases under min_ms in both runs are skipped, and a slowdown must also exceed min_ms in
+    absolute terms; below that, timer, GC and scheduler noise outweigh any real change.
+    """
+    regressions = []
+    for name, by_days in current['results'].items():
+        for days, stats in by_days.items():
+            previous = baseline.get('results', {}).get(name, {}).get(days)
+            if not previous or not previous.get('median_ms'):
+                continue
+            if max(stats['median_ms'], previous['median_ms']) < min_ms:
+                continue
+            ratio = stats['median_ms'] / previous['median_ms']
+            if ratio > 1 + tolerance and stats['median_ms'] - previous['median_ms'] > min_ms:
+                regressions.append((name, days, previous['median_ms'], stats['median_ms'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, nargs='+', default=DEFAULT_DAYS)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--llm-latency', type=float, default=0.0)
+    parser.add_argument('--db-latency', type=float, default=0.0)
+    parser.add_argument('--padding', type=int, default=0, help='Extra characters per activity description')
+    parser.add_argument('--list-size', type=int, default=10, help='Itineraries per user for list benchmarks')
+    parser.add_argument('--save', help='Write results as JSON to this path')
+    parser.add_argument('--compare', default=DEFAULT_BASELINE,
+                        help="Baseline JSON to compare against ('' to skip)")
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed median slowdown, e.g. 0.25 = 25%%')
+    parser.add_argument('--min-ms', type=float, default=1.0, help='Noise floor: ignore cases and slowdowns smaller than this')
+    args = parser.parse_args()
+
+    current = run(args)
+
+    if args.save:
+        directory = os.path.dirname(args.save)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"💾 Saved results to {args.save}")
+
+    if args.compare:
+        if not os.path.exists(args.compare) and args.compare == DEFAULT_BASELINE:
+            os.makedirs(os.path.dirname(DEFAULT_BASELINE), exist_ok=True)
+            with open(DEFAULT_BASELINE, 'w') as f:
+                json.dump(current, f, indent=2)
+            print(f"📏 No baseline on this machine yet, recorded this run as {DEFAULT_BASELINE}")
+            return
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        recorded_on = baseline.get('meta', {}).get('machine')
+        if recorded_on != current['meta']['machine']:
+            print(f"⚠️ {args.compare} was recorded on {recorded_on or 'another machine'}; "
+                  f"record a baseline here with --save before comparing")
+            return
+        regressions = compare(current, baseline, args.tolerance, args.min_ms)
+        if regressions:
+            # A one-off stall on a busy machine should not fail the gate: run the suite again in
+            # a fresh process (state built up here would skew it) and keep only cases slow twice
+            flagged = {(name, days) for name, days, *_ in regressions}
+            print(f"🔁 {len(flagged)} case(s) over tolerance, running the suite again to confirm")
+            regressions = [r for r in compare(_rerun(args), baseline, args.tolerance, args.min_ms) if r[:2] in flagged]
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for name, days, before, after, ratio in regressions:
+                print(f"  {name} ({days} days): {before:.3f} ms -> {after:.3f} ms ({ratio:.2f}x)")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import gc
+import statistics
+import time
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, errors, elapsed):
+    """Throughput and latency percentiles (ms) for a batch of timed requests"""
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else None
+    }
+
+
+def measure(func, repeat=20, warmup=2):
+    """Run func repeatedly and return median/p95/min wall time in milliseconds.
+
+    Like timeit, the garbage collector is paused while sampling, so a collection of
+    objects left by earlier cases is not charged to this one.
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        'repeat': repeat,
+        'median_ms': round(statistics.median(samples) * 1000, 4),
+        'p95_ms': round(percentile(samples, 95) * 1000, 4),
+        'min_ms': round(min(samples) * 1000, 4)
+    }
@@ -11,6 +11,129 @@ class Config:
     # AI service configuration
     GROQ_API_KEY = os.getenv('GROQ_API_KEY')
     
+    # Groq resilience configuration
+    GROQ_TIMEOUT_SECONDS = float(os.getenv('GROQ_TIMEOUT_SECONDS', '30'))
+    GROQ_MAX_RETRIES = int(os.getenv('GROQ_MAX_RETRIES', '2'))
+    GROQ_RETRY_BASE_DELAY = float(os.getenv('GROQ_RETRY_BASE_DELAY', '0.5'))
+    GROQ_RETRY_MAX_DELAY = float(os.getenv('GROQ_RETRY_MAX_DELAY', '4'))
+    GROQ_RETRY_BUDGET_RATIO = float(os.getenv('GROQ_RETRY_BUDGET_RATIO', '0.2'))
+    GROQ_RETRY_BUDGET_MIN_RETRIES = int(os.getenv('GROQ_RETRY_BUDGET_MIN_RETRIES', '3'))
+    GROQ_RETRY_BUDGET_WINDOW_SECONDS = float(os.getenv('GROQ_RETRY_BUDGET_WINDOW_SECONDS', '60'))
+    GROQ_BREAKER_FAILURE_THRESHOLD = int(os.getenv('GROQ_BREAKER_FAILURE_THRESHOLD', '5'))
+    GROQ_BREAKER_RECOVERY_SECONDS = float(os.getenv('GROQ_BREAKER_RECOVERY_SECONDS', '30'))
+    
+    # Client-side Groq rate-limit scheduling (limits are per model)
+    GROQ_SCHEDULER_ENABLED = os.getenv('GROQ_SCHEDULER_ENABLED', 'true').lower() == 'true'
+    GROQ_TOKENS_PER_MINUTE = int(os.getenv('GROQ_TOKENS_PER_MINUTE', '30000'))
+    GROQ_REQUESTS_PER_MINUTE = int(os.getenv('GROQ_REQUESTS_PER_MINUTE', '30'))
+    GROQ_SCHEDULER_HEADROOM = float(os.getenv('GROQ_SCHEDULER_HEADROOM', '0.9'))
+    GROQ_SCHEDULER_MAX_WAIT_SECONDS = float(os.getenv('GROQ_SCHEDULER_MAX_WAIT_SECONDS', '20'))
+    
+    # LLM routing configuration ("provider:model" entries, comma separated)
+    LLM_MODELS = os.getenv('LLM_MODELS', 'groq:llama3-8b-8192')
+    LOCAL_LLM_BASE_URL = os.getenv('LOCAL_LLM_BASE_URL', 'http://localhost:8080/v1')
+    LOCAL_LLM_API_KEY = os.getenv('LOCAL_LLM_API_KEY')
+    LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'false').lower() == 'true'  # needs two or more LLM_MODELS
+    LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', '95'))
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+    
+    # Completion budget: max_tokens is sized per trip from the tokens per day responses actually use
+    LLM_TOKENS_PER_DAY = int(os.getenv('LLM_TOKENS_PER_DAY', '800'))  # starting estimate until measured
+    LLM_COMPLETION_OVERHEAD_TOKENS = int(os.getenv('LLM_COMPLETION_OVERHEAD_TOKENS', '600'))  # summary, stays, transport, tips
+    LLM_COMPLETION_HEADROOM = float(os.getenv('LLM_COMPLETION_HEADROOM', '1.25'))
+    LLM_MIN_COMPLETION_TOKENS = int(os.getenv('LLM_MIN_COMPLETION_TOKENS', '1024'))
+    LLM_MAX_COMPLETION_TOKENS = int(os.getenv('LLM_MAX_COMPLETION_TOKENS', '8000'))
+    LLM_MAX_CONTINUATIONS = int(os.getenv('LLM_MAX_CONTINUATIONS', '2'))  # follow-up calls after a truncated response
+    
+    # Shared local store used to coordinate gunicorn workers on one machine
+    SHARED_STORE_PATH = os.getenv('SHARED_STORE_PATH', '/tmp/ai-itinerary/shared.db')
+    
+    # Rate limiting and admission control for itinerary generation
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_USER_CAPACITY = int(os.getenv('RATE_LIMIT_USER_CAPACITY', '5'))
+    RATE_LIMIT_USER_PER_MINUTE = float(os.getenv('RATE_LIMIT_USER_PER_MINUTE', '5'))
+    RATE_LIMIT_IP_CAPACITY = int(os.getenv('RATE_LIMIT_IP_CAPACITY', '20'))
+    RATE_LIMIT_IP_PER_MINUTE = float(os.getenv('RATE_LIMIT_IP_PER_MINUTE', '20'))
+    # Proxies in front of the app that append to X-Forwarded-For (Render's load balancer is one)
+    TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '1'))
+    # Generations in flight across all workers; the default follows GUNICORN_PROFILE, since a
+    # gevent or gthread worker holds many waiting generations where a sync worker holds one
+    GENERATION_MAX_IN_FLIGHT = int(os.getenv(
+        'GENERATION_MAX_IN_FLIGHT',
+        {'gevent': '64', 'gthread': '32'}.get(os.getenv('GUNICORN_PROFILE', 'sync'), '8')
+    ))
+    GENERATION_MAX_QUEUE_SECONDS = float(os.getenv('GENERATION_MAX_QUEUE_SECONDS', '15'))
+    GENERATION_SLOT_TTL_SECONDS = float(os.getenv('GENERATION_SLOT_TTL_SECONDS', '300'))
+    
+    # Idempotency-Key support on generate and update: retries get the stored response
+    IDEMPOTENCY_TTL_SECONDS = float(os.getenv('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+    IDEMPOTENCY_IN_PROGRESS_TTL_SECONDS = float(os.getenv('IDEMPOTENCY_IN_PROGRESS_TTL_SECONDS', '300'))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', '20'))  # retry waits this long for the original
+    
+    # Batch generation (each trip still takes a generation slot)
+    BATCH_MAX_TRIPS = int(os.getenv('BATCH_MAX_TRIPS', '50'))
+    BATCH_MAX_PARALLEL = int(os.getenv('BATCH_MAX_PARALLEL', '4'))
+    BATCH_WRITE_WINDOW_SECONDS = float(os.getenv('BATCH_WRITE_WINDOW_SECONDS', '0.25'))
+    
+    # Generation cache: reuse itineraries for equivalent trips instead of calling the LLM
+    GENERATION_CACHE_ENABLED = os.getenv('GENERATION_CACHE_ENABLED', 'true').lower() == 'true'
+    GENERATION_CACHE_TTL_SECONDS = float(os.getenv('GENERATION_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+    CACHE_DESTINATION_SIMILARITY = float(os.getenv('CACHE_DESTINATION_SIMILARITY', '0.6'))
+    CACHE_DURATION_TOLERANCE_DAYS = int(os.getenv('CACHE_DURATION_TOLERANCE_DAYS', '1'))  # longer cached trips only, trimmed to fit
+    DESTINATION_ALIASES_PATH = os.getenv('DESTINATION_ALIASES_PATH')  # JSON object of alias -> canonical
+    
+    # Off-peak pre-generation: fill the generation cache with the most requested trips overnight
+    PREGEN_ENABLED = os.getenv('PREGEN_ENABLED', 'false').lower() == 'true'
+    PREGEN_OFF_PEAK_HOURS = os.getenv('PREGEN_OFF_PEAK_HOURS', '1-6')  # start-end hour, may wrap past midnight
+    PREGEN_TIMEZONE = os.getenv('PREGEN_TIMEZONE', 'Asia/Kolkata')  # where the off-peak hours are
+    PREGEN_TOKEN_BUDGET = int(os.getenv('PREGEN_TOKEN_BUDGET', '200000'))  # Groq tokens per off-peak window
+    PREGEN_TOP_N = int(os.getenv('PREGEN_TOP_N', '25'))
+    PREGEN_MIN_REQUESTS = int(os.getenv('PREGEN_MIN_REQUESTS', '3'))  # a trip must be this common to pre-generate
+    PREGEN_LOOKBACK_DAYS = int(os.getenv('PREGEN_LOOKBACK_DAYS', '30'))
+    PREGEN_CHECK_INTERVAL_SECONDS = float(os.getenv('PREGEN_CHECK_INTERVAL_SECONDS', '300'))
+    PREGEN_PACE_SECONDS = float(os.getenv('PREGEN_PACE_SECONDS', '5'))  # pause between generations
+    
+    # Traffic capture for local record/replay load tests (disabled unless a path is set)
+    TRAFFIC_CAPTURE_PATH = os.getenv('TRAFFIC_CAPTURE_PATH')
+    TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv('TRAFFIC_CAPTURE_SAMPLE_RATE', '1.0'))
+    TRAFFIC_CAPTURE_SALT = os.getenv('TRAFFIC_CAPTURE_SALT', '')
+    
+    # On-demand profiling: send X-Profile-Token with this token, or sample a fraction of requests
+    PROFILING_ADMIN_TOKEN = os.getenv('PROFILING_ADMIN_TOKEN')
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+    PROFILING_MODE = os.getenv('PROFILING_MODE', 'sampling')  # sampling | deterministic
+    PROFILING_INTERVAL_SECONDS = float(os.getenv('PROFILING_INTERVAL_SECONDS', '0.005'))
+    PROFILING_DIR = os.getenv('PROFILING_DIR', '/tmp/ai-itinerary/profiles')
+    TRACEMALLOC_AT_STARTUP = os.getenv('TRACEMALLOC_AT_STARTUP', 'false').lower() == 'true'
+    TRACEMALLOC_FRAMES = int(os.getenv('TRACEMALLOC_FRAMES', '25'))
+    
+    # Request tracing: spans to a JSONL file or an OTLP/HTTP collector
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'false').lower() == 'true'
+    TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'file')  # file | otlp
+    TRACING_FILE_PATH = os.getenv('TRACING_FILE_PATH', '/tmp/ai-itinerary/spans.jsonl')
+    TRACING_OTLP_ENDPOINT = os.getenv('TRACING_OTLP_ENDPOINT', 'http://localhost:4318')
+    TRACING_SAMPLE_RATE = float(os.getenv('TRACING_SAMPLE_RATE', '1.0'))
+    TRACING_LOG_PREFIX = os.getenv('TRACING_LOG_PREFIX', 'true').lower() == 'true'  # [trace=...] on printed lines
+    
+    # Rows fetched per database round trip when streaming exports
+    EXPORT_PAGE_SIZE = int(os.getenv('EXPORT_PAGE_SIZE', '100'))
+    
+    # Delta sync: tombstones are kept this long; older updated_since values get a full list instead
+    SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', '30'))
+    # The returned sync_token is set back by this much so writes committing during the query are not missed
+    SYNC_OVERLAP_SECONDS = float(os.getenv('SYNC_OVERLAP_SECONDS', '5'))
+    
+    # Read cache of itinerary days for the per-day endpoints, keyed by immutable blob hash
+    DAY_CACHE_ENABLED = os.getenv('DAY_CACHE_ENABLED', 'true').lower() == 'true'
+    DAY_CACHE_TTL_SECONDS = float(os.getenv('DAY_CACHE_TTL_SECONDS', str(24 * 3600)))
+    
+    # Itinerary search page size (?limit=), and the most one page may ask for
+    SEARCH_DEFAULT_LIMIT = int(os.getenv('SEARCH_DEFAULT_LIMIT', '20'))
+    SEARCH_MAX_LIMIT = int(os.getenv('SEARCH_MAX_LIMIT', '50'))
+    
+    # Most ids accepted by one bulk fetch/delete call (one in_ filter each)
+    BULK_MAX_IDS = int(os.getenv('BULK_MAX_IDS', '100'))
+    
     # Flask configuration
     SECRET_KEY = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key')
     
@@ -0,0 +1,31 @@
+# gunicorn.conf.py - picked up automatically by `gunicorn app:app` from this directory
+#
+# GUNICORN_PROFILE selects how a worker waits on Groq and Supabase:
+#   sync   - one request per worker process (gunicorn's default)
+#   gthread - a thread pool per worker, GUNICORN_THREADS requests each
+#   gevent - cooperative greenlets, GUNICORN_WORKER_CONNECTIONS requests each
+# Generation spends nearly all of its time waiting on the LLM, so gevent lets one
+# process hold hundreds of in-flight generations.
+import os
+
+profile = os.getenv('GUNICORN_PROFILE', 'sync')
+
+if os.getenv('PORT'):
+    bind = f"0.0.0.0:{os.getenv('PORT')}"
+
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+
+# LLM calls can take far longer than gunicorn's 30 second default
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+
+if profile == 'gevent':
+    worker_class = 'gevent'
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '500'))
+elif profile == 'gthread':
+    worker_class = 'gthread'
+    threads = int(os.getenv('GUNICORN_THREADS', '32'))
+elif profile == 'sync':
+    worker_class = 'sync'
+else:
+    raise ValueError(f"Unknown GUNICORN_PROFILE: {profile}")
@@ -0,0 +1,20 @@
+-- Full normalized ai_response per itinerary, stored once per distinct content.
+-- data is the zlib-compressed canonical JSON, base64 encoded so it travels through PostgREST as text.
+create table if not exists itinerary_blobs (
+    content_hash text primary key,            -- sha256 of the canonical JSON
+    encoding text not null default 'zlib+base64',
+    data text not null,
+    size_bytes integer,
+    compressed_bytes integer,
+    created_at timestamptz not null default now()
+);
+
+alter table itineraries
+    add column if not exists content_hash text references itinerary_blobs (content_hash);
+
+create index if not exists idx_itineraries_content_hash on itineraries (content_hash);
+
+-- Blobs are shared between itineraries, so they are not deleted with them.
+-- Unreferenced blobs can be removed periodically with:
+--   delete from itinerary_blobs b
+--   where not exists (select 1 from itineraries i where i.content_hash = b.content_hash);
@@ -0,0 +1,35 @@
+-- Per-itinerary summary columns for the dashboard list, maintained by DatabaseService
+-- whenever an itinerary's items are written, so listing never reads itinerary_items.
+alter table itineraries
+    add column if not exists item_count integer not null default 0,
+    add column if not exists activity_count integer not null default 0,
+    add column if not exists meal_count integer not null default 0,
+    add column if not exists day_count integer not null default 0,
+    add column if not exists activity_cost_total numeric not null default 0,  -- sum of parsed item costs
+    add column if not exists meal_cost_total numeric not null default 0,
+    add column if not exists cost_total numeric not null default 0;
+
+-- Backfill itineraries saved before this migration from their items
+update itineraries i
+set item_count = s.item_count,
+    activity_count = s.activity_count,
+    meal_count = s.meal_count,
+    day_count = s.day_count,
+    activity_cost_total = s.activity_cost_total,
+    meal_cost_total = s.meal_cost_total,
+    cost_total = s.activity_cost_total + s.meal_cost_total
+from (
+    select itinerary_id,
+           count(*) as item_count,
+           count(*) filter (where activity_type is distinct from 'meal') as activity_count,
+           count(*) filter (where activity_type = 'meal') as meal_count,
+           count(distinct day_number) as day_count,
+           coalesce(sum(cost) filter (where activity_type is distinct from 'meal'), 0) as activity_cost_total,
+           coalesce(sum(cost) filter (where activity_type = 'meal'), 0) as meal_cost_total
+    from itinerary_items
+    group by itinerary_id
+) s
+where s.itinerary_id = i.id;
+
+-- The list query: a user's itineraries, newest first
+create index if not exists idx_itineraries_user_created on itineraries (user_id, created_at desc);
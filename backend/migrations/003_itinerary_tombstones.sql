@@ -0,0 +1,14 @@
+-- Deleted itineraries, so clients syncing with ?updated_since= learn about deletions.
+create table if not exists itinerary_tombstones (
+    itinerary_id uuid primary key,
+    user_id uuid not null,
+    deleted_at timestamptz not null default now()
+);
+
+create index if not exists idx_itinerary_tombstones_user_deleted on itinerary_tombstones (user_id, deleted_at);
+
+-- The delta query: a user's itineraries changed since a point in time
+create index if not exists idx_itineraries_user_updated on itineraries (user_id, updated_at);
+
+-- Tombstones only need to outlive SYNC_TOMBSTONE_RETENTION_DAYS (clients older than that do a full sync):
+--   delete from itinerary_tombstones where deleted_at < now() - interval '30 days';
@@ -0,0 +1,7 @@
+-- Record whether a trip was generated vegetarian, so off-peak pre-generation can find
+-- the most requested destination/length/budget/diet combinations.
+alter table itineraries
+    add column if not exists is_vegetarian boolean not null default false;
+
+-- The mining query: every itinerary created in the lookback window
+create index if not exists idx_itineraries_created on itineraries (created_at);
@@ -0,0 +1,28 @@
+-- Shared catalog of places (sights, activities, restaurants), one row per place per destination.
+-- place_key is the sha256 of canonical destination, normalized name and normalized location,
+-- computed by DatabaseService, so the same landmark in every itinerary maps to one row.
+create table if not exists places (
+    place_key text primary key,
+    canonical_destination text not null,
+    kind text not null,                       -- activity type, or 'meal' for restaurants
+    name text not null,
+    location text,
+    description text,
+    notes text,                               -- JSON list of tips or specialties
+    created_at timestamptz not null default now()
+);
+
+-- Looking up a destination's places when assembling or caching itineraries
+create index if not exists idx_places_destination_kind on places (canonical_destination, kind, name);
+
+-- Items now keep only per-trip fields and reference the catalog for the rest
+alter table itinerary_items
+    add column if not exists place_key text references places (place_key);
+
+create index if not exists idx_itinerary_items_place on itinerary_items (place_key);
+
+-- Items written before this migration keep their own location, description and notes;
+-- readers use those when place_key is null. Places are shared, so they are not deleted
+-- with itineraries. Unreferenced places can be removed periodically with:
+--   delete from places p
+--   where not exists (select 1 from itinerary_items i where i.place_key = p.place_key);
@@ -0,0 +1,65 @@
+-- Full-text search over a user's itineraries.
+-- search_text holds the item titles, locations and notes, written by DatabaseService with the
+-- row; search_vector is generated from it and the row's own text, so every upsert re-indexes
+-- the itinerary and a delete removes it from the index.
+alter table itineraries
+    add column if not exists search_text text;
+
+-- Backfill from the items (and their catalog places) of itineraries saved before this migration
+update itineraries i
+set search_text = s.search_text
+from (
+    select it.itinerary_id,
+           string_agg(concat_ws(' ', it.title, coalesce(it.location, p.location), coalesce(it.notes, p.notes)), ' ') as search_text
+    from itinerary_items it
+    left join places p on p.place_key = it.place_key
+    group by it.itinerary_id
+) s
+where s.itinerary_id = i.id and i.search_text is null;
+
+alter table itineraries
+    add column if not exists search_vector tsvector generated always as (
+        setweight(to_tsvector('english', coalesce(title, '') || ' ' || coalesce(destination, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(search_text, '')), 'C')
+    ) stored;
+
+-- One index answers "this user's itineraries matching the query"
+create extension if not exists btree_gin;
+create index if not exists idx_itineraries_user_search on itineraries using gin (user_id, search_vector);
+
+-- Ranked, paginated search; called through PostgREST as rpc('search_itineraries')
+create or replace function search_itineraries(p_user_id uuid, p_query text, p_limit integer default 20, p_offset integer default 0)
+returns table (
+    id uuid,
+    user_id uuid,
+    destination text,
+    title text,
+    description text,
+    start_date date,
+    end_date date,
+    budget numeric,
+    created_at timestamptz,
+    updated_at timestamptz,
+    item_count integer,
+    activity_count integer,
+    meal_count integer,
+    day_count integer,
+    activity_cost_total numeric,
+    meal_cost_total numeric,
+    cost_total numeric,
+    rank real
+)
+language sql stable
+as $$
+    select i.id, i.user_id, i.destination::text, i.title::text, i.description::text,
+           i.start_date::date, i.end_date::date, i.budget::numeric,
+           i.created_at::timestamptz, i.updated_at::timestamptz,
+           i.item_count, i.activity_count, i.meal_count, i.day_count,
+           i.activity_cost_total, i.meal_cost_total, i.cost_total,
+           ts_rank_cd(i.search_vector, q) as rank
+    from itineraries i, websearch_to_tsquery('english', p_query) q
+    where i.user_id = p_user_id and i.search_vector @@ q
+    order by rank desc, i.created_at desc, i.id
+    limit p_limit offset p_offset;
+$$;
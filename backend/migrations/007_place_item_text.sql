@@ -0,0 +1,10 @@
+-- Descriptions and tips are written by the model for each itinerary, so they go back on
+-- itinerary_items (description, notes) instead of the shared places row, where the first
+-- itinerary to mention a place decided the text every later itinerary showed.
+-- place_key now also covers kind, so a sight and a restaurant of the same name at the same
+-- location get separate rows. Existing places keep their old keys and the items that use them.
+
+comment on column places.description is
+    'Legacy: only read for items saved before descriptions moved to itinerary_items';
+comment on column places.notes is
+    'Legacy: only read for items saved before tips moved to itinerary_items';
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
-from datetime import date
+from datetime import date, timedelta
+from functools import lru_cache
 from typing import Optional, Dict, Any
+import json
 
 @dataclass
 class ItineraryRequest:
@@ -26,4 +28,288 @@ class ItineraryResponse:
     vegetarian_preference: bool
     special_requirements: Optional[str]
     ai_generated_itinerary: Dict[Any, Any]
-    created_at: str
\ No newline at end of file
+    created_at: str
+
+# Typed itinerary model. Itineraries arrive from the LLM (or the cache) as
+# parsed JSON; Trip.from_dict normalizes them in a single pass and to_dict
+# turns them back into the JSON shape the API and the database expect.
+
+MISSING = object()  # Field absent from the source JSON; omitted again by to_dict
+
+
+def _compile_reader(cls):
+    """Generate cls._read: one straight-line attribute assignment per field, no per-field loop"""
+    lines = ['def _read(data):', '    record = _new(_cls)', '    get = data.get']
+    lines += [f"    record.{name} = get({name!r}, MISSING)" for name in cls.FIELDS]
+    lines += [
+        '    if data.keys() - _fields:',
+        '        record.extra = {k: v for k, v in data.items() if k not in _fields}',
+        '    else:',
+        '        record.extra = None',
+        '    return record'
+    ]
+    namespace = {'_new': object.__new__, '_cls': cls, '_fields': cls._FIELD_SET, 'MISSING': MISSING}
+    exec('\n'.join(lines), namespace)
+    return namespace['_read']
+
+
+def _compile_writer(cls):
+    """Generate cls._write, serializing nested records and copying cached tuples to lists"""
+    lines = ['def _write(self):', '    result = {}']
+    for name in cls.FIELDS:
+        lines.append(f"    value = self.{name}")
+        lines.append('    if value is not MISSING:')
+        if name in cls.NESTED:
+            # Non-object entries from the LLM are passed through as they came
+            lines.append(f"        result[{name!r}] = [item.to_dict() if isinstance(item, _Record) else item "
+                         f"for item in value]")
+        else:
+            # Cached defaults hold tuples so they cannot be mutated through a response
+            lines.append(f"        result[{name!r}] = list(value) if value.__class__ is tuple else value")
+    lines += ['    if self.extra:', '        result.update(self.extra)', '    return result']
+    namespace = {'MISSING': MISSING, '_Record': _Record}
+    exec('\n'.join(lines), namespace)
+    return namespace['_write']
+
+
+class _Record:
+    """Base for the slotted itinerary records; unknown keys are kept in `extra`"""
+    __slots__ = ('extra',)
+    FIELDS = ()
+    NESTED = ()  # Fields holding a sequence of records
+
+    def __init__(self, **values):
+        for name in self.FIELDS:
+            setattr(self, name, values.pop(name, MISSING))
+        self.extra = values or None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._FIELD_SET = frozenset(cls.FIELDS)
+        cls._read = staticmethod(_compile_reader(cls))
+        cls._write = _compile_writer(cls)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls._read(data)
+
+    def to_dict(self):
+        return self._write()
+
+    def __repr__(self):
+        fields = ', '.join(f"{n}={getattr(self, n)!r}" for n in self.FIELDS if getattr(self, n) is not MISSING)
+        return f"{type(self).__name__}({fields})"
+
+
+class Activity(_Record):
+    FIELDS = ('time', 'activity', 'description', 'location', 'duration', 'estimated_cost',
+              'type', 'highlights', 'tips')
+    __slots__ = FIELDS
+
+
+class Meal(_Record):
+    FIELDS = ('meal_type', 'time', 'restaurant', 'cuisine', 'location', 'estimated_cost',
+              'specialties', 'vegetarian_friendly', 'ambiance', 'booking_required')
+    __slots__ = FIELDS
+
+
+class Day(_Record):
+    FIELDS = ('day', 'date', 'day_name', 'theme', 'activities', 'meals')
+    NESTED = ('activities', 'meals')
+    __slots__ = FIELDS
+
+    @classmethod
+    def normalize(cls, data, index, date, destination, is_vegetarian):
+        """Build a day from LLM output, dating it and filling missing activities/meals with defaults"""
+        day = cls._read(data)
+        if day.day is MISSING:
+            day.day = index + 1
+        day.date = date.strftime('%Y-%m-%d')
+        day.day_name = date.strftime('%A')
+        if day.theme is MISSING:
+            day.theme = f"Day {index + 1} - Explore {destination}"
+        activities, meals = day.activities, day.meals
+        read_activity, read_meal = Activity._read, Meal._read
+        # Entries that are not objects are kept untouched, as the dict pipeline did
+        day.activities = (tuple([read_activity(a) if a.__class__ is dict else a for a in activities])
+                          if activities.__class__ is list else default_activities(destination, index + 1))
+        day.meals = (tuple([read_meal(m) if m.__class__ is dict else m for m in meals])
+                     if meals.__class__ is list else default_meals(is_vegetarian))
+        return day
+
+
+class Trip(_Record):
+    FIELDS = ('destination', 'duration', 'total_estimated_cost', 'trip_summary', 'daily_itinerary',
+              'accommodation_suggestions', 'transportation', 'packing_suggestions', 'local_tips',
+              'emergency_contacts')
+    NESTED = ('daily_itinerary',)
+    __slots__ = FIELDS
+
+    @classmethod
+    def from_dict(cls, data, destination, duration, start_date, is_vegetarian=False):
+        """Normalize parsed itinerary JSON for a trip of `duration` days starting on `start_date`"""
+        is_vegetarian = bool(is_vegetarian)
+        trip = cls._read(data)
+        if trip.destination is MISSING:
+            trip.destination = destination
+        if trip.duration is MISSING:
+            trip.duration = f"{duration} days"
+
+        raw_days = trip.daily_itinerary if isinstance(trip.daily_itinerary, list) else []
+        days = [
+            Day.normalize(raw if isinstance(raw, dict) else {}, i, start_date + timedelta(days=i),
+                          destination, is_vegetarian)
+            for i, raw in enumerate(raw_days)
+        ]
+        for i in range(len(days), duration):
+            days.append(default_day(i + 1, start_date + timedelta(days=i), destination, is_vegetarian))
+        trip.daily_itinerary = tuple(days)
+
+        if trip.trip_summary is MISSING:
+            trip.trip_summary = (f"An amazing {duration}-day journey through {destination}, featuring "
+                                 f"cultural exploration, local cuisine, and memorable experiences.")
+        if trip.accommodation_suggestions is MISSING:
+            trip.accommodation_suggestions = [{
+                "name": f"Recommended Stay in {destination}",
+                "type": "hotel",
+                "location": f"Central {destination}",
+                "estimated_cost_per_night": "₹2500-4000",
+                "amenities": ["WiFi", "Breakfast", "AC", "Room Service"],
+                "rating": "4.2",
+                "booking_tips": "Book in advance for better rates"
+            }]
+        if trip.transportation is MISSING:
+            trip.transportation = {
+                "to_destination": {
+                    "mode": "flight/train",
+                    "estimated_cost": "₹3000-8000",
+                    "duration": "2-6 hours",
+                    "booking_tips": "Book 2-3 weeks in advance"
+                },
+                "local_transport": [
+                    {"mode": "taxi/auto", "usage": "general transport", "estimated_cost": "₹200-500 per day"}
+                ]
+            }
+        if trip.local_tips is MISSING:
+            trip.local_tips = [
+                f"Best time to visit {destination} is during pleasant weather",
+                "Carry cash for local vendors and street food",
+                "Respect local customs and dress codes",
+                "Try authentic local cuisine",
+                "Keep emergency contacts handy"
+            ]
+        return trip
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+
+_MORNING_ACTIVITIES = ("Historic {destination} Walking Tour", "Visit {destination} Museum",
+                       "Explore {destination} Old Town", "Temple/Heritage Site Visit in {destination}",
+                       "Local Market Tour in {destination}")
+_AFTERNOON_ACTIVITIES = ("Scenic Viewpoint in {destination}", "Cultural Center Visit", "Local Craft Workshop",
+                         "Nature Park/Garden Tour", "Shopping District Exploration")
+_EVENING_ACTIVITIES = ("Sunset Point in {destination}", "Evening Cultural Show", "Riverside/Lakeside Walk",
+                       "Local Street Food Tour", "Photography Walk")
+
+
+def default_activities(destination, day_num):
+    """Template activities for a day; cached and immutable, so shared between trips"""
+    return _default_activities(destination, (day_num - 1) % len(_MORNING_ACTIVITIES))
+
+
+@lru_cache(maxsize=1024)
+def _default_activities(destination, slot):
+    return (
+        Activity(
+            time="09:00 AM",
+            activity=_MORNING_ACTIVITIES[slot].format(destination=destination),
+            description=f"Start your day exploring the cultural and historical aspects of {destination}",
+            location=f"Central {destination}",
+            duration="2-3 hours",
+            estimated_cost="₹200-400",
+            type="sightseeing",
+            highlights=("Historical significance", "Photo opportunities", "Local culture"),
+            tips=("Start early to avoid crowds", "Carry water", "Wear comfortable shoes")
+        ),
+        Activity(
+            time="02:00 PM",
+            activity=_AFTERNOON_ACTIVITIES[slot].format(destination=destination),
+            description=f"Afternoon exploration of {destination}'s unique attractions",
+            location=f"{destination} Main Area",
+            duration="2 hours",
+            estimated_cost="₹150-300",
+            type="cultural",
+            highlights=("Local crafts", "Authentic experience", "Cultural immersion"),
+            tips=("Bargain at markets", "Try local snacks", "Interact with locals")
+        ),
+        Activity(
+            time="05:30 PM",
+            activity=_EVENING_ACTIVITIES[slot].format(destination=destination),
+            description=f"End your day with beautiful views and relaxation in {destination}",
+            location=f"{destination} Scenic Area",
+            duration="1.5 hours",
+            estimated_cost="₹100-200",
+            type="leisure",
+            highlights=("Beautiful views", "Relaxation", "Perfect photo spots"),
+            tips=("Arrive before sunset", "Carry camera", "Enjoy the moment")
+        )
+    )
+
+
+@lru_cache(maxsize=2)
+def default_meals(is_vegetarian):
+    """Template meals for a day; cached and immutable, so shared between trips"""
+    is_vegetarian = bool(is_vegetarian)
+    veg_suffix = " (Vegetarian)" if is_vegetarian else ""
+    return (
+        Meal(
+            meal_type="breakfast",
+            time="08:00 AM",
+            restaurant=f"Local Breakfast Spot{veg_suffix}",
+            cuisine=f"Traditional breakfast{veg_suffix}",
+            location="Near accommodation",
+            estimated_cost="₹150-250",
+            specialties=("Local breakfast items", "Fresh beverages"),
+            vegetarian_friendly=is_vegetarian,
+            ambiance="casual",
+            booking_required=False
+        ),
+        Meal(
+            meal_type="lunch",
+            time="01:00 PM",
+            restaurant=f"Popular Local Restaurant{veg_suffix}",
+            cuisine=f"Regional specialties{veg_suffix}",
+            location="City center",
+            estimated_cost="₹300-500",
+            specialties=("Regional thali", "Local favorites"),
+            vegetarian_friendly=is_vegetarian,
+            ambiance="traditional",
+            booking_required=False
+        ),
+        Meal(
+            meal_type="dinner",
+            time="07:30 PM",
+            restaurant=f"Fine Dining Restaurant{veg_suffix}",
+            cuisine=f"Multi-cuisine{veg_suffix}",
+            location="Premium dining area",
+            estimated_cost="₹500-800",
+            specialties=("Chef's special", "Fusion cuisine"),
+            vegetarian_friendly=is_vegetarian,
+            ambiance="upscale",
+            booking_required=True
+        )
+    )
+
+
+def default_day(day_num, date, destination, is_vegetarian):
+    """Template day used to pad short LLM responses and build fallbacks"""
+    day = Day(
+        day=day_num,
+        date=date.strftime('%Y-%m-%d'),
+        day_name=date.strftime('%A'),
+        theme=f"Day {day_num} - Discover {destination}"
+    )
+    day.activities = default_activities(destination, day_num)
+    day.meals = default_meals(bool(is_vegetarian))
+    return day
@@ -1,60 +1,394 @@
-from groq import Groq
 from config import Config
+from models import Trip, default_day
+from services.completion_budget import CompletionBudget
+from services.itinerary_cache import ItineraryCache, get_default_canonicalizer
+from services.json_repair import repair_json
+from services.llm_router import build_router_from_config
+from services.resilience import CircuitOpenError
+from services.shared_store import get_shared_store
+from services.tracing import span
 import json
+from collections import Counter
+from contextvars import ContextVar
 from datetime import datetime, timedelta
 import re
+import threading
+
+# Kept byte-for-byte (including indentation) so captured prompt fingerprints still match
+SYSTEM_PROMPT = """You are an expert travel planner with deep knowledge of destinations worldwide. 
+                        Create detailed, practical, and engaging itineraries. Always respond with valid JSON only.
+                        Focus on realistic timing, authentic local experiences, and budget-appropriate suggestions.
+                        Include specific restaurant names, attraction details, and practical tips.
+                        Consider local culture, weather, and seasonal events.
+                        Provide detailed transportation options and costs.
+                        Include emergency contacts and local customs."""
+
+# How the current request's itinerary was produced: 'llm', 'cache' or 'fallback', or
+# 'partial' when the model's days ran short and the template filled the rest
+generation_source = ContextVar('generation_source', default=None)
+
+# Per-process count of how generations ended: parsed, repaired, cache or fallback
+_outcomes = Counter()
+_outcomes_lock = threading.Lock()
+
+def _record_outcome(outcome):
+    with _outcomes_lock:
+        _outcomes[outcome] += 1
+
+def get_generation_outcomes():
+    with _outcomes_lock:
+        counts = dict(_outcomes)
+    from_llm = sum(counts.get(k, 0) for k in ('parsed', 'repaired', 'fallback'))
+    return {
+        **counts,
+        # Share of generations that reached the model (or tried to) but ended up as the template
+        'fallback_rate': round(counts.get('fallback', 0) / from_llm, 4) if from_llm else 0.0
+    }
+
+_default_router = None
+_default_router_lock = threading.Lock()
+
+def get_default_router():
+    """Shared by every AIService instance so routing stats and breakers see all traffic"""
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = build_router_from_config()
+        return _default_router
+
+_default_cache = None
+
+def get_default_cache():
+    """Shared generation cache, or None when disabled"""
+    global _default_cache
+    if not Config.GENERATION_CACHE_ENABLED:
+        return None
+    with _default_router_lock:
+        if _default_cache is None:
+            _default_cache = ItineraryCache(
+                get_shared_store(),
+                get_default_canonicalizer(),
+                similarity_threshold=Config.CACHE_DESTINATION_SIMILARITY,
+                duration_tolerance=Config.CACHE_DURATION_TOLERANCE_DAYS,
+                ttl=Config.GENERATION_CACHE_TTL_SECONDS
+            )
+        return _default_cache
+
+_default_budget = None
+
+def get_default_completion_budget():
+    """Shared max_tokens sizing, learned from every worker's completions"""
+    global _default_budget
+    with _default_router_lock:
+        if _default_budget is None:
+            _default_budget = CompletionBudget(
+                get_shared_store(),
+                'itinerary',
+                default_tokens_per_day=Config.LLM_TOKENS_PER_DAY,
+                overhead_tokens=Config.LLM_COMPLETION_OVERHEAD_TOKENS,
+                headroom=Config.LLM_COMPLETION_HEADROOM,
+                min_tokens=Config.LLM_MIN_COMPLETION_TOKENS,
+                max_tokens=Config.LLM_MAX_COMPLETION_TOKENS
+            )
+        return _default_budget
 
 class AIService:
-    def __init__(self):
-        self.client = Groq(api_key=Config.GROQ_API_KEY)
+    def __init__(self, router=None, cache=None, budget=None):
+        self.router = router or get_default_router()
+        self.cache = cache or get_default_cache()
+        self.budget = budget or get_default_completion_budget()
     
-    def generate_itinerary(self, request_data):
+    def generate_itinerary(self, request_data, use_cache=True):
         """Generate comprehensive itinerary using Groq AI"""
+        generation_source.set('llm')
+        repaired = False
         try:
             start_date = datetime.strptime(request_data['start_date'], '%Y-%m-%d')
             end_date = datetime.strptime(request_data['end_date'], '%Y-%m-%d')
             duration = (end_date - start_date).days + 1
             
+            # Reuse an equivalent itinerary when we already have one
+            if use_cache:
+                with span('ai.cache_lookup', destination=request_data['destination'], duration_days=duration):
+                    cached_itinerary = self._get_cached_itinerary(request_data, duration, start_date)
+                if cached_itinerary:
+                    return cached_itinerary
+            
             # Create enhanced prompt with more context
-            prompt = self._create_enhanced_prompt(request_data, duration, start_date)
+            with span('ai.prompt_build', duration_days=duration) as prompt_span:
+                prompt = self._create_enhanced_prompt(request_data, duration, start_date)
+                if prompt_span:
+                    prompt_span.set_attribute('prompt_chars', len(prompt))
             
-            # Call Groq API with optimized parameters
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are an expert travel planner with deep knowledge of destinations worldwide. 
-                        Create detailed, practical, and engaging itineraries. Always respond with valid JSON only.
-                        Focus on realistic timing, authentic local experiences, and budget-appropriate suggestions.
-                        Include specific restaurant names, attraction details, and practical tips.
-                        Consider local culture, weather, and seasonal events.
-                        Provide detailed transportation options and costs.
-                        Include emergency contacts and local customs."""
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                model="llama3-8b-8192",
-                temperature=0.3,
-                max_tokens=8000
-            )
+            # Call the fastest healthy model, with room for this many days and little more
+            max_tokens = self.budget.max_tokens_for(duration)
+            with span('ai.llm', max_tokens=max_tokens) as llm_span:
+                chat_completion, endpoint = self.router.complete(
+                    validate=self._is_parseable_json,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": SYSTEM_PROMPT
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.3,
+                    max_tokens=max_tokens
+                )
+                if llm_span:
+                    llm_span.set_attribute('llm.endpoint', endpoint.name)
             
             response_content = chat_completion.choices[0].message.content.strip()
-            print(f"AI Response Length: {len(response_content)}")
+            finish_reason = getattr(chat_completion.choices[0], 'finish_reason', None)
+            print(f"AI Response Length: {len(response_content)} (from {endpoint.name}, finish_reason={finish_reason})")
+            
+            # Parse, repairing truncated or malformed JSON instead of discarding it
+            with span('ai.parse', response_chars=len(response_content)) as parse_span:
+                itinerary_data, repairs = self._parse_itinerary_json(response_content)
+                if parse_span and repairs:
+                    parse_span.set_attribute('json.repairs', ','.join(repairs))
             
-            # Parse and validate response
-            itinerary_data = self._extract_and_validate_json(response_content, request_data, duration, start_date)
+            if itinerary_data is None:
+                enhanced_itinerary = self._create_comprehensive_fallback(request_data, duration, start_date)
+            else:
+                repaired = bool(repairs) or finish_reason == 'length'
+                if repaired:
+                    days = itinerary_data.get('daily_itinerary')
+                    continuations = recovered = 0
+                    if isinstance(days, list) and len(days) < duration:
+                        # Keep the days we already paid for and ask only for the rest
+                        print(f"✂️ {len(days)} of {duration} days usable (max_tokens={max_tokens}), requesting the rest")
+                        with span('ai.continue', salvaged_days=len(days)):
+                            continuations, recovered = self._request_missing_days(
+                                itinerary_data, request_data, duration, start_date
+                            )
+                    if finish_reason == 'length':
+                        self.budget.record_truncation(continuations, recovered)
+                else:
+                    self._record_completion_size(chat_completion, duration)
+                # Days still missing are filled from the template; that itinerary is served but not cached
+                days = itinerary_data.get('daily_itinerary')
+                model_days = sum(isinstance(day, dict) for day in days) if isinstance(days, list) else 0
+                if model_days < duration:
+                    generation_source.set('partial')
+                enhanced_itinerary = self._normalize_itinerary(itinerary_data, request_data, duration, start_date)
             
-            # Enhance the itinerary with additional data
-            enhanced_itinerary = self._enhance_itinerary_data(itinerary_data, request_data, duration, start_date)
+            if self.cache and generation_source.get() == 'llm':
+                with span('ai.cache_store'):
+                    self._cache_itinerary(request_data, duration, enhanced_itinerary)
             
             return enhanced_itinerary
             
+        except CircuitOpenError as e:
+            print(f"⚡ Skipping LLM call: {str(e)}")
+            return self._create_comprehensive_fallback(request_data, duration, start_date)
         except Exception as e:
             print(f"Error generating itinerary: {str(e)}")
             return self._create_comprehensive_fallback(request_data, duration, start_date)
+        finally:
+            source = generation_source.get()
+            _record_outcome(source if source in ('cache', 'fallback') else 'repaired' if repaired else 'parsed')
+    
+    def estimate_tokens(self, request_data):
+        """Worst-case Groq tokens for one generation of this trip, continuations included.
+
+        Each call is counted at prompt plus max_tokens. A truncated response is followed by
+        up to LLM_MAX_CONTINUATIONS calls for the missing days, each with a prompt about the
+        size of the first (fewer days in the template) and room for no more days than the trip.
+        """
+        start_date = datetime.strptime(request_data['start_date'], '%Y-%m-%d')
+        duration = (datetime.strptime(request_data['end_date'], '%Y-%m-%d') - start_date).days + 1
+        prompt = self._create_enhanced_prompt(request_data, duration, start_date)
+        per_call = (len(SYSTEM_PROMPT) + len(prompt)) // 4 + self.budget.max_tokens_for(duration)
+        return per_call * (1 + Config.LLM_MAX_CONTINUATIONS)
+    
+    def get_resilience_state(self):
+        """Expose routing stats, circuit breakers and retry budgets for monitoring"""
+        return {
+            **self.router.get_state(),
+            'generation_cache': self.cache.get_state() if self.cache else None,
+            'completion_budget': self.budget.get_state(),
+            'generation_outcomes': get_generation_outcomes()
+        }
+    
+    def _record_completion_size(self, completion, days):
+        usage = getattr(completion, 'usage', None)
+        try:
+            self.budget.record(getattr(usage, 'completion_tokens', None), days)
+        except Exception as e:
+            print(f"⚠️ Could not record completion size: {str(e)}")
+    
+    def _request_missing_days(self, itinerary_data, request_data, duration, start_date):
+        """Ask the model for the days (and sections) a damaged response is missing, merging them in place.
+
+        Returns (continuation requests made, days recovered).
+        """
+        days = itinerary_data['daily_itinerary']
+        salvaged_days = len(days)
+        
+        continuations = 0
+        while len(days) < duration and continuations < Config.LLM_MAX_CONTINUATIONS:
+            continuations += 1
+            remaining = duration - len(days)
+            max_tokens = self.budget.max_tokens_for(remaining)
+            prompt = self._create_continuation_prompt(request_data, duration, start_date, itinerary_data)
+            try:
+                chat_completion, endpoint = self.router.complete(
+                    validate=self._is_parseable_json,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.3,
+                    max_tokens=max_tokens
+                )
+            except Exception as e:
+                print(f"⚠️ Continuation request failed: {str(e)}")
+                break
+            
+            finish_reason = getattr(chat_completion.choices[0], 'finish_reason', None)
+            part, repairs = self._parse_itinerary_json(chat_completion.choices[0].message.content.strip())
+            new_days = (part or {}).get('daily_itinerary')
+            new_days = [day for day in new_days if isinstance(day, dict)] if isinstance(new_days, list) else []
+            print(f"➕ Continuation {continuations} from {endpoint.name}: {len(new_days)} more days (finish_reason={finish_reason})")
+            if not new_days:
+                break
+            if not repairs and finish_reason != 'length':
+                self._record_completion_size(chat_completion, len(new_days))
+            
+            for day in new_days[:remaining]:
+                day['day'] = len(days) + 1
+                days.append(day)
+            # Trip-level sections come after the days, so they are usually what was cut off
+            for key, value in part.items():
+                if key != 'daily_itinerary':
+                    itinerary_data.setdefault(key, value)
+        
+        return continuations, len(days) - salvaged_days
+    
+    def _parse_itinerary_json(self, response_content):
+        """Load itinerary JSON from a model response, repairing it when it is malformed or cut off.
+
+        Returns (data, repairs): repairs lists the fixes applied, empty for valid JSON.
+        (None, None) when nothing usable could be recovered.
+        """
+        cleaned_content = self._clean_response((response_content or '').strip())
+        json_content = self._extract_json_content(cleaned_content)
+        if json_content:
+            try:
+                data = json.loads(json_content)
+                if isinstance(data, dict):
+                    return data, []
+            except json.JSONDecodeError as e:
+                print(f"JSON decode error: {e}")
+        
+        try:
+            data, repairs, open_path = repair_json(cleaned_content)
+        except ValueError as e:
+            print(f"⚠️ Could not repair JSON: {e}")
+            return None, None
+        if not isinstance(data, dict):
+            return None, None
+        
+        days = data.get('daily_itinerary')
+        if isinstance(days, list):
+            if len(open_path) > 1 and open_path[0] == 'daily_itinerary':
+                # The day being written at the cut-off is incomplete; it is treated as missing
+                del days[open_path[1]:]
+            data['daily_itinerary'] = [day for day in days if isinstance(day, dict)]
+        print(f"🩹 Repaired model JSON ({', '.join(repairs)}), {len(data.get('daily_itinerary') or [])} days kept")
+        return data, repairs
+    
+    def _get_cached_itinerary(self, request_data, duration, start_date):
+        """Re-date and re-budget a compatible cached itinerary, or return None"""
+        if not self.cache:
+            return None
+        try:
+            cached = self.cache.lookup(
+                request_data['destination'], duration, request_data.get('budget'), request_data.get('isVegetarian', False)
+            )
+            if not cached:
+                return None
+            
+            data, cached_duration, cached_budget = cached
+            if sum(isinstance(day, dict) for day in data.get('daily_itinerary') or []) < duration:
+                # Too few days to serve without template padding
+                return None
+            print(f"♻️ Reusing cached {cached_duration}-day itinerary for {request_data['destination']}")
+            generation_source.set('cache')
+            return self._adapt_cached_itinerary(data, cached_duration, cached_budget, request_data, duration, start_date)
+        except Exception as e:
+            print(f"⚠️ Generation cache lookup failed: {str(e)}")
+            return None
+    
+    def _cache_itinerary(self, request_data, duration, itinerary):
+        try:
+            self.cache.put(
+                request_data['destination'], duration, request_data.get('budget'),
+                request_data.get('isVegetarian', False), itinerary
+            )
+        except Exception as e:
+            print(f"⚠️ Could not cache itinerary: {str(e)}")
+    
+    def _adapt_cached_itinerary(self, data, cached_duration, cached_budget, request_data, duration, start_date):
+        """Fit a cached itinerary to this request's dates, length and budget"""
+        days = [day for day in data.get('daily_itinerary', []) if isinstance(day, dict)][:duration]
+        for i, day in enumerate(days):
+            day['day'] = i + 1
+        data['daily_itinerary'] = days
+        data['destination'] = request_data['destination']
+        data['duration'] = f"{duration} days"
+        
+        budget = request_data.get('budget')
+        if budget and cached_budget:
+            # Costs are per activity/meal, so scale by the change in daily budget
+            ratio = (float(budget) / duration) / (float(cached_budget) / cached_duration)
+            if abs(ratio - 1) > 0.01:
+                data = self._scale_costs(data, ratio)
+            data['total_estimated_cost'] = f"₹{budget}"
+        
+        # Normalization re-dates every day from start_date and pads missing days
+        return self._normalize_itinerary(data, request_data, duration, start_date)
+    
+    def _scale_costs(self, value, ratio, key=''):
+        """Scale rupee amounts in cost fields, e.g. '₹200-400' -> '₹220-440'"""
+        if isinstance(value, dict):
+            return {k: self._scale_costs(v, ratio, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._scale_costs(v, ratio, key) for v in value]
+        if isinstance(value, str) and '₹' in value and ('cost' in key or key in ('activities', 'meals', 'transport', 'miscellaneous')):
+            return re.sub(
+                r'(?<=[₹\-–])\s*(\d[\d,]*)',
+                lambda m: str(self._scale_amount(int(m.group(1).replace(',', '')), ratio)),
+                value
+            )
+        return value
+    
+    def _scale_amount(self, amount, ratio):
+        """Scale one rupee amount: nearest ₹10 from ₹100 up, whole rupees below, never down to ₹0"""
+        scaled = amount * ratio
+        rounded = int(round(scaled, -1)) if scaled >= 100 else int(round(scaled))
+        return max(rounded, 1) if amount else 0
+    
+    def _is_parseable_json(self, response_content):
+        """Check whether a raw model response contains JSON we can load, after repair if need be"""
+        cleaned_content = self._clean_response((response_content or '').strip())
+        json_content = self._extract_json_content(cleaned_content)
+        if json_content:
+            try:
+                json.loads(json_content)
+                return True
+            except json.JSONDecodeError:
+                pass
+        try:
+            data, _, _ = repair_json(cleaned_content)
+        except ValueError:
+            return False
+        # Repaired output is only worth keeping if some of the itinerary survived
+        return isinstance(data, dict) and bool(data.get('daily_itinerary'))
     
     def _create_enhanced_prompt(self, data, duration, start_date):
         """Create detailed prompt for high-quality itinerary generation"""
@@ -142,11 +476,55 @@ Make this itinerary engaging, practical, and perfectly suited for {data['destina
 """
         return prompt
     
-    def _generate_daily_template(self, dates, destination, budget_per_day, is_vegetarian):
+    def _create_continuation_prompt(self, data, duration, start_date, partial):
+        """Prompt for the days (and trip-level sections) missing from a truncated itinerary"""
+        done = len(partial['daily_itinerary'])
+        budget_per_day = int(data['budget']) // duration if data.get('budget') else 5000
+        veg_preference = "MUST include vegetarian options" if data.get('isVegetarian') else "any cuisine type"
+        
+        formatted_dates = [
+            (start_date + timedelta(days=i)).strftime('%Y-%m-%d (%A)') for i in range(done, duration)
+        ]
+        planned = [
+            activity.get('activity') for day in partial['daily_itinerary']
+            for activity in day.get('activities') or [] if isinstance(activity, dict) and activity.get('activity')
+        ]
+        
+        sections = {
+            'accommodation_suggestions': '[{"name": "...", "type": "...", "location": "...", "estimated_cost_per_night": "₹XXXX", "amenities": [], "rating": "4.2", "booking_tips": "..."}]',
+            'transportation': '{"to_destination": {"mode": "...", "from": "...", "estimated_cost": "₹XXXX", "duration": "X hours", "booking_tips": "..."}, "local_transport": [{"mode": "...", "usage": "...", "estimated_cost": "₹XXX"}]}',
+            'packing_suggestions': '["..."]',
+            'local_tips': '["..."]',
+            'emergency_contacts': '{"tourist_helpline": "...", "local_emergency": "108", "nearest_hospital": "..."}'
+        }
+        missing_sections = ''.join(
+            f',\n    "{key}": {shape}' for key, shape in sections.items() if key not in partial
+        )
+        
+        return f"""
+Continue the {duration}-day travel itinerary for visiting {data['destination']}.
+
+RESPOND WITH VALID JSON ONLY - NO OTHER TEXT.
+
+Days 1 to {done} are already planned. Plan only days {done + 1} to {duration}:
+- Dates: {' to '.join([formatted_dates[0], formatted_dates[-1]])}
+- Daily budget: ≈₹{budget_per_day}
+- Food Requirements: {veg_preference}
+- Already planned activities, do not repeat them: {'; '.join(planned) or 'none'}
+
+JSON Structure Required:
+{{
+    "daily_itinerary": [
+        {self._generate_daily_template(formatted_dates, data['destination'], budget_per_day, data.get('isVegetarian', False), first_day=done + 1)}
+    ]{missing_sections}
+}}
+"""
+    
+    def _generate_daily_template(self, dates, destination, budget_per_day, is_vegetarian, first_day=1):
         """Generate template for daily itinerary structure"""
         template = ""
         for i, date in enumerate(dates):
-            day_num = i + 1
+            day_num = first_day + i
             template += f"""
         {{
             "day": {day_num},
@@ -235,21 +613,11 @@ Make this itinerary engaging, practical, and perfectly suited for {data['destina
     def _extract_and_validate_json(self, response_content, request_data, duration, start_date):
         """Enhanced JSON extraction and validation"""
         try:
-            # Clean response
-            cleaned_content = self._clean_response(response_content)
-            
-            # Multiple extraction attempts
-            json_content = self._extract_json_content(cleaned_content)
-            
-            if json_content:
-                try:
-                    itinerary_data = json.loads(json_content)
-                    return self._validate_structure(itinerary_data, request_data, duration, start_date)
-                except json.JSONDecodeError as e:
-                    print(f"JSON decode error: {e}")
-                    return self._create_comprehensive_fallback(request_data, duration, start_date)
-            else:
+            # Strict parse first, then repair; only unrecoverable output becomes the fallback
+            itinerary_data, _ = self._parse_itinerary_json(response_content)
+            if itinerary_data is None:
                 return self._create_comprehensive_fallback(request_data, duration, start_date)
+            return self._normalize_itinerary(itinerary_data, request_data, duration, start_date)
                 
         except Exception as e:
             print(f"JSON processing error: {e}")
@@ -305,210 +673,21 @@ Make this itinerary engaging, practical, and perfectly suited for {data['destina
         except Exception:
             return None
     
-    def _validate_structure(self, data, request_data, duration, start_date):
-        """Validate and fix JSON structure"""
-        # Ensure required top-level fields
-        data['destination'] = data.get('destination', request_data['destination'])
-        data['duration'] = data.get('duration', f"{duration} days")
-        
-        # Validate daily_itinerary
-        if 'daily_itinerary' not in data or not isinstance(data['daily_itinerary'], list):
-            data['daily_itinerary'] = []
-        
-        # Ensure we have the right number of days
-        while len(data['daily_itinerary']) < duration:
-            day_num = len(data['daily_itinerary']) + 1
-            current_date = start_date + timedelta(days=day_num - 1)
-            data['daily_itinerary'].append(self._create_default_day(day_num, current_date, request_data))
-        
-        # Validate each day
-        for i, day in enumerate(data['daily_itinerary']):
-            if not isinstance(day, dict):
-                day = {}
-            
-            current_date = start_date + timedelta(days=i)
-            day['day'] = day.get('day', i + 1)
-            day['date'] = current_date.strftime('%Y-%m-%d')
-            day['day_name'] = current_date.strftime('%A')
-            day['theme'] = day.get('theme', f"Day {i + 1} - Explore {request_data['destination']}")
-            
-            # Validate activities
-            if 'activities' not in day or not isinstance(day['activities'], list):
-                day['activities'] = self._create_default_activities(request_data['destination'], i + 1)
-            
-            # Validate meals
-            if 'meals' not in day or not isinstance(day['meals'], list):
-                day['meals'] = self._create_default_meals(request_data.get('isVegetarian', False))
-        
-        return data
-    
-    def _create_default_day(self, day_num, date, request_data):
-        """Create a default day structure"""
-        return {
-            "day": day_num,
-            "date": date.strftime('%Y-%m-%d'),
-            "day_name": date.strftime('%A'),
-            "theme": f"Day {day_num} - Discover {request_data['destination']}",
-            "activities": self._create_default_activities(request_data['destination'], day_num),
-            "meals": self._create_default_meals(request_data.get('isVegetarian', False))
-        }
-    
-    def _create_default_activities(self, destination, day_num):
-        """Create default activities for a day"""
-        morning_activities = [
-            f"Historic {destination} Walking Tour",
-            f"Visit {destination} Museum",
-            f"Explore {destination} Old Town",
-            f"Temple/Heritage Site Visit in {destination}",
-            f"Local Market Tour in {destination}"
-        ]
-        
-        afternoon_activities = [
-            f"Scenic Viewpoint in {destination}",
-            f"Cultural Center Visit",
-            f"Local Craft Workshop",
-            f"Nature Park/Garden Tour",
-            f"Shopping District Exploration"
-        ]
-        
-        evening_activities = [
-            f"Sunset Point in {destination}",
-            f"Evening Cultural Show",
-            f"Riverside/Lakeside Walk",
-            f"Local Street Food Tour",
-            f"Photography Walk"
-        ]
-        
-        return [
-            {
-                "time": "09:00 AM",
-                "activity": morning_activities[(day_num - 1) % len(morning_activities)],
-                "description": f"Start your day exploring the cultural and historical aspects of {destination}",
-                "location": f"Central {destination}",
-                "duration": "2-3 hours",
-                "estimated_cost": "₹200-400",
-                "type": "sightseeing",
-                "highlights": ["Historical significance", "Photo opportunities", "Local culture"],
-                "tips": ["Start early to avoid crowds", "Carry water", "Wear comfortable shoes"]
-            },
-            {
-                "time": "02:00 PM",
-                "activity": afternoon_activities[(day_num - 1) % len(afternoon_activities)],
-                "description": f"Afternoon exploration of {destination}'s unique attractions",
-                "location": f"{destination} Main Area",
-                "duration": "2 hours",
-                "estimated_cost": "₹150-300",
-                "type": "cultural",
-                "highlights": ["Local crafts", "Authentic experience", "Cultural immersion"],
-                "tips": ["Bargain at markets", "Try local snacks", "Interact with locals"]
-            },
-            {
-                "time": "05:30 PM",
-                "activity": evening_activities[(day_num - 1) % len(evening_activities)],
-                "description": f"End your day with beautiful views and relaxation in {destination}",
-                "location": f"{destination} Scenic Area",
-                "duration": "1.5 hours",
-                "estimated_cost": "₹100-200",
-                "type": "leisure",
-                "highlights": ["Beautiful views", "Relaxation", "Perfect photo spots"],
-                "tips": ["Arrive before sunset", "Carry camera", "Enjoy the moment"]
-            }
-        ]
-    
-    def _create_default_meals(self, is_vegetarian):
-        """Create default meal suggestions"""
-        veg_suffix = " (Vegetarian)" if is_vegetarian else ""
-        
-        return [
-            {
-                "meal_type": "breakfast",
-                "time": "08:00 AM",
-                "restaurant": f"Local Breakfast Spot{veg_suffix}",
-                "cuisine": f"Traditional breakfast{veg_suffix}",
-                "location": "Near accommodation",
-                "estimated_cost": "₹150-250",
-                "specialties": ["Local breakfast items", "Fresh beverages"],
-                "vegetarian_friendly": is_vegetarian,
-                "ambiance": "casual",
-                "booking_required": False
-            },
-            {
-                "meal_type": "lunch",
-                "time": "01:00 PM",
-                "restaurant": f"Popular Local Restaurant{veg_suffix}",
-                "cuisine": f"Regional specialties{veg_suffix}",
-                "location": "City center",
-                "estimated_cost": "₹300-500",
-                "specialties": ["Regional thali", "Local favorites"],
-                "vegetarian_friendly": is_vegetarian,
-                "ambiance": "traditional",
-                "booking_required": False
-            },
-            {
-                "meal_type": "dinner",
-                "time": "07:30 PM",
-                "restaurant": f"Fine Dining Restaurant{veg_suffix}",
-                "cuisine": f"Multi-cuisine{veg_suffix}",
-                "location": "Premium dining area",
-                "estimated_cost": "₹500-800",
-                "specialties": ["Chef's special", "Fusion cuisine"],
-                "vegetarian_friendly": is_vegetarian,
-                "ambiance": "upscale",
-                "booking_required": True
-            }
-        ]
-    
-    def _enhance_itinerary_data(self, data, request_data, duration, start_date):
-        """Add missing fields and enhance data structure"""
-        # Add comprehensive trip information
-        if 'trip_summary' not in data:
-            data['trip_summary'] = f"An amazing {duration}-day journey through {request_data['destination']}, featuring cultural exploration, local cuisine, and memorable experiences."
-        
-        if 'accommodation_suggestions' not in data:
-            data['accommodation_suggestions'] = [
-                {
-                    "name": f"Recommended Stay in {request_data['destination']}",
-                    "type": "hotel",
-                    "location": f"Central {request_data['destination']}",
-                    "estimated_cost_per_night": "₹2500-4000",
-                    "amenities": ["WiFi", "Breakfast", "AC", "Room Service"],
-                    "rating": "4.2",
-                    "booking_tips": "Book in advance for better rates"
-                }
-            ]
-        
-        if 'transportation' not in data:
-            data['transportation'] = {
-                "to_destination": {
-                    "mode": "flight/train",
-                    "estimated_cost": "₹3000-8000",
-                    "duration": "2-6 hours",
-                    "booking_tips": "Book 2-3 weeks in advance"
-                },
-                "local_transport": [
-                    {"mode": "taxi/auto", "usage": "general transport", "estimated_cost": "₹200-500 per day"}
-                ]
-            }
-        
-        if 'local_tips' not in data:
-            data['local_tips'] = [
-                f"Best time to visit {request_data['destination']} is during pleasant weather",
-                "Carry cash for local vendors and street food",
-                "Respect local customs and dress codes",
-                "Try authentic local cuisine",
-                "Keep emergency contacts handy"
-            ]
-        
-        return data
+    def _normalize_itinerary(self, data, request_data, duration, start_date):
+        """Validate, re-date and complete parsed itinerary JSON in a single pass"""
+        return Trip.from_dict(
+            data, request_data['destination'], duration, start_date, request_data.get('isVegetarian', False)
+        ).to_dict()
     
     def _create_comprehensive_fallback(self, request_data, duration, start_date):
         """Create a comprehensive fallback itinerary"""
+        generation_source.set('fallback')
         daily_itinerary = []
         
         for i in range(duration):
             current_date = start_date + timedelta(days=i)
-            day_data = self._create_default_day(i + 1, current_date, request_data)
-            daily_itinerary.append(day_data)
+            day_data = default_day(i + 1, current_date, request_data['destination'], request_data.get('isVegetarian', False))
+            daily_itinerary.append(day_data.to_dict())
         
         return {
             "destination": request_data['destination'],
@@ -0,0 +1,73 @@
+import json
+import threading
+
+
+class CompletionBudget:
+    """Size max_tokens for an itinerary from its length and the tokens per day responses really use.
+
+    The per-day figure is an EWMA kept in the shared store, learned from completions
+    that finished normally, so every worker sizes requests from the same history.
+    """
+
+    def __init__(self, store, name, default_tokens_per_day=800, overhead_tokens=600, headroom=1.25,
+                 min_tokens=1024, max_tokens=8000, alpha=0.2):
+        self.store = store
+        self.default_tokens_per_day = default_tokens_per_day
+        self.overhead_tokens = overhead_tokens
+        self.headroom = headroom
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.alpha = alpha
+        self._key = f"completion_budget:{name}"
+        self._lock = threading.Lock()
+        self._truncated = 0
+        self._continuations = 0
+        self._recovered_days = 0
+
+    def tokens_per_day(self):
+        stats = self.store.get(self._key)
+        return stats['tokens_per_day'] if stats else self.default_tokens_per_day
+
+    def max_tokens_for(self, days, with_overhead=True):
+        """Completion budget for `days` itinerary days, plus the trip-level sections if asked"""
+        estimate = self.tokens_per_day() * days + (self.overhead_tokens if with_overhead else 0)
+        return int(min(self.max_tokens, max(self.min_tokens, estimate * self.headroom)))
+
+    def record(self, completion_tokens, days):
+        """Learn from a completion that finished on its own (not cut off at max_tokens)"""
+        if not completion_tokens or days <= 0:
+            return
+        sample = max(completion_tokens - self.overhead_tokens, completion_tokens / 2) / days
+        with self.store.transaction() as conn:
+            row = conn.execute('SELECT value FROM kv WHERE key = ?', (self._key,)).fetchone()
+            stats = json.loads(row[0]) if row else None
+            if stats:
+                stats['tokens_per_day'] = (1 - self.alpha) * stats['tokens_per_day'] + self.alpha * sample
+                stats['samples'] += 1
+            else:
+                stats = {'tokens_per_day': sample, 'samples': 1}
+            conn.execute(
+                'INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, NULL)',
+                (self._key, json.dumps(stats))
+            )
+
+    def record_truncation(self, continuations=0, recovered_days=0):
+        with self._lock:
+            self._truncated += 1
+            self._continuations += continuations
+            self._recovered_days += recovered_days
+
+    def get_state(self):
+        stats = self.store.get(self._key) or {}
+        with self._lock:
+            return {
+                'tokens_per_day': round(self.tokens_per_day(), 1),
+                'samples': stats.get('samples', 0),
+                'overhead_tokens': self.overhead_tokens,
+                'headroom': self.headroom,
+                'max_tokens': self.max_tokens,
+                'truncated_responses': self._truncated,
+                'continuation_requests': self._continuations,
+                'days_recovered_by_continuation': self._recovered_days
+            }
+
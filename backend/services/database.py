@@ -1,13 +1,41 @@
 from supabase import create_client
 from config import Config
-from datetime import datetime
+from datetime import datetime, timezone
+from models import Trip
+from services.day_cache import ItineraryDayCache
+from services.itinerary_blobs import decode_blob, encode_blob
+from services.itinerary_cache import get_default_canonicalizer
+from services.place_catalog import build_place, merge_place
+from services.shared_store import get_shared_store
+from services.tracing import TracedClient, get_tracer, traced
 import json
 import uuid
 
+# Columns the dashboard list needs; the summary columns are maintained at write time
+LIST_COLUMNS = (
+    'id, user_id, destination, title, description, start_date, end_date, budget, created_at, updated_at, '
+    'item_count, activity_count, meal_count, day_count, activity_cost_total, meal_cost_total, cost_total'
+)
+
+# Item rows with the catalog fields of the place they reference. Description and notes are the
+# item's own; the catalog's copies only fill in for items saved before they moved back to items
+ITEM_COLUMNS = '*, places(location, description, notes)'
+
+# What ?fields= may select: itinerary row columns, AI response fields (read from the blob) and item fields
+ITINERARY_FIELDS = tuple(column.strip() for column in LIST_COLUMNS.split(',')) + ('content_hash', 'is_vegetarian')
+TRIP_FIELDS = tuple(field for field in Trip.FIELDS if field not in ITINERARY_FIELDS)
+PLACE_FIELDS = ('location', 'description', 'notes')
+ITEM_FIELDS = ('id', 'itinerary_id', 'place_key', 'day_number', 'activity_type', 'title',
+               'start_time', 'end_time', 'cost', 'created_at') + PLACE_FIELDS
+
 class DatabaseService:
     def __init__(self):
         try:
             self.supabase = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+            if get_tracer():
+                # Every execute() becomes a span under the current request
+                self.supabase = TracedClient(self.supabase)
+            self.day_cache = ItineraryDayCache(get_shared_store(), Config.DAY_CACHE_TTL_SECONDS) if Config.DAY_CACHE_ENABLED else None
             print("✅ Database connection initialized successfully")
         except Exception as e:
             print(f"❌ Database connection failed: {str(e)}")
@@ -46,6 +74,7 @@ class DatabaseService:
             print(f"❌ Error upserting user: {str(e)}")
             return None
     
+    @traced('db.upsert_itinerary')
     def upsert_itinerary(self, request_data, ai_response, user_id, itinerary_id=None):
         """Upsert complete itinerary - update if exists, insert if new"""
         try:
@@ -54,26 +83,20 @@ class DatabaseService:
             print(f"Itinerary ID: {itinerary_id}")
             print(f"Destination: {request_data.get('destination')}")
             
-            # Generate new ID if not provided
-            if not itinerary_id:
-                itinerary_id = str(uuid.uuid4())
-            
-            # Prepare main itinerary data
-            itinerary_data = {
-                'id': itinerary_id,  # Include ID for upsert
-                'user_id': user_id,
-                'destination': request_data['destination'],
-                'start_date': request_data['start_date'],
-                'end_date': request_data['end_date'],
-                'budget': float(request_data.get('budget', 0)) if request_data.get('budget') else None,
-                'created_at': datetime.now().isoformat(),
-                'updated_at': datetime.now().isoformat()
-            }
-            
-            # Add AI-generated content as JSONB
+            itinerary_data = self._build_itinerary_record(request_data, ai_response, user_id, itinerary_id)
             if ai_response:
-                itinerary_data['title'] = ai_response.get('destination', request_data['destination'])
-                itinerary_data['description'] = ai_response.get('trip_summary', f"Trip to {request_data['destination']}")
+                itinerary_data['content_hash'] = self._store_blob(ai_response)
+                # The itinerary view usually opens right after saving; have its days ready
+                self._cache_days(itinerary_data['content_hash'], ai_response)
+            
+            items = None
+            places = {}
+            if ai_response and 'daily_itinerary' in ai_response:
+                # Summary columns go out with the row itself; the items replace the old ones below
+                items = self._build_itinerary_items(
+                    itinerary_data['id'], ai_response['daily_itinerary'], request_data['destination'], places
+                )
+                itinerary_data.update(self._summarize_items(items))
             
             print(f"[DEBUG] Itinerary data to upsert: {itinerary_data}")
             
@@ -94,9 +117,11 @@ class DatabaseService:
             saved_itinerary = result.data[0]
             print(f"✅ Main itinerary upserted with ID: {saved_itinerary['id']}")
             
-            # Upsert itinerary items (daily activities)
-            if ai_response and 'daily_itinerary' in ai_response:
-                self._upsert_itinerary_items(saved_itinerary['id'], ai_response['daily_itinerary'])
+            # Upsert itinerary items (daily activities) - kept as a secondary index over the blob
+            if items is not None:
+                self._upsert_itinerary_items(
+                    saved_itinerary['id'], ai_response['daily_itinerary'], request_data['destination'], items, places
+                )
             
             # Return the complete saved itinerary with AI response
             return {
@@ -110,8 +135,132 @@ class DatabaseService:
             print(f"AI Response type: {type(ai_response)}")
             return None
     
-    def _upsert_itinerary_items(self, itinerary_id, daily_itinerary):
-        """Upsert daily itinerary items"""
+    @traced('db.insert_itineraries_bulk')
+    def insert_itineraries_bulk(self, entries, user_id):
+        """Insert several new itineraries with one write per table; entries are (request_data, ai_response) pairs"""
+        try:
+            print(f"💾 Bulk inserting {len(entries)} itineraries for user {user_id}")
+            
+            records, blobs, items, places = [], {}, [], {}
+            for request_data, ai_response in entries:
+                record = self._build_itinerary_record(request_data, ai_response, user_id)
+                if ai_response:
+                    content_hash, blob = encode_blob(ai_response)
+                    blobs[content_hash] = blob
+                    record['content_hash'] = content_hash
+                    record_items = self._build_itinerary_items(
+                        record['id'], ai_response.get('daily_itinerary', []), request_data['destination'], places
+                    )
+                    record.update(self._summarize_items(record_items))
+                    items.extend(record_items)
+                records.append(record)
+            
+            if blobs:
+                self.supabase.table('itinerary_blobs').upsert(
+                    list(blobs.values()),
+                    on_conflict='content_hash',
+                    ignore_duplicates=True
+                ).execute()
+            
+            self._store_places(places)
+            
+            result = self.supabase.table('itineraries').insert(records).execute()
+            if not result.data or len(result.data) != len(records):
+                print("❌ Bulk itinerary insert returned incomplete data")
+                return None
+            
+            if items:
+                self.supabase.table('itinerary_items').insert(items).execute()
+            
+            print(f"✅ Bulk inserted {len(records)} itineraries, {len(blobs)} blobs, {len(items)} items and {len(places)} places")
+            saved_by_id = {row['id']: row for row in result.data}
+            return [
+                {**saved_by_id.get(record['id'], record), 'ai_response': ai_response}
+                for record, (_, ai_response) in zip(records, entries)
+            ]
+            
+        except Exception as e:
+            print(f"❌ Error bulk inserting itineraries: {str(e)}")
+            return None
+    
+    def _build_itinerary_record(self, request_data, ai_response, user_id, itinerary_id=None):
+        """Row for the itineraries table"""
+        # Generate new ID if not provided
+        if not itinerary_id:
+            itinerary_id = str(uuid.uuid4())
+        
+        # Prepare main itinerary data
+        itinerary_data = {
+            'id': itinerary_id,  # Include ID for upsert
+            'user_id': user_id,
+            'destination': request_data['destination'],
+            'start_date': request_data['start_date'],
+            'end_date': request_data['end_date'],
+            'budget': float(request_data.get('budget', 0)) if request_data.get('budget') else None,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'updated_at': datetime.now(timezone.utc).isoformat()
+        }
+        
+        # Only generation requests know the diet; updates leave the stored flag alone
+        if 'isVegetarian' in request_data:
+            itinerary_data['is_vegetarian'] = bool(request_data['isVegetarian'])
+        
+        # Add AI-generated summary fields
+        if ai_response:
+            itinerary_data['title'] = ai_response.get('destination', request_data['destination'])
+            itinerary_data['description'] = ai_response.get('trip_summary', f"Trip to {request_data['destination']}")
+            itinerary_data['search_text'] = self._search_text(ai_response.get('daily_itinerary', []))
+        
+        return itinerary_data
+    
+    def _search_text(self, daily_itinerary):
+        """Item titles, locations and notes of an itinerary, as one document for the full-text index"""
+        parts = []
+        for day_data in daily_itinerary:
+            if not isinstance(day_data, dict):
+                continue
+            for activity in day_data.get('activities', []):
+                if isinstance(activity, dict):
+                    parts.append(activity.get('activity', activity.get('title')))
+                    parts.append(activity.get('location'))
+                    parts.extend(activity.get('tips') or [])
+            for meal in day_data.get('meals', []):
+                if isinstance(meal, dict):
+                    parts.append(meal.get('restaurant'))
+                    parts.append(meal.get('cuisine'))
+                    parts.append(meal.get('location'))
+                    parts.extend(meal.get('specialties') or [])
+        return ' '.join(str(part) for part in parts if part)
+    
+    def _store_places(self, places):
+        """Add places not yet in the catalog; ones already there are left untouched"""
+        if not places:
+            return
+        self.supabase.table('places').upsert(
+            list(places.values()),
+            on_conflict='place_key',
+            ignore_duplicates=True
+        ).execute()
+    
+    def _store_blob(self, ai_response):
+        """Store the full ai_response once per distinct content and return its content hash"""
+        content_hash, blob = encode_blob(ai_response)
+        self.supabase.table('itinerary_blobs').upsert(
+            blob,
+            on_conflict='content_hash',
+            ignore_duplicates=True  # Identical content is already stored
+        ).execute()
+        print(f"📦 Stored itinerary blob {content_hash[:12]} ({blob['size_bytes']} → {blob['compressed_bytes']} bytes)")
+        return content_hash
+    
+    @traced('db.upsert_itinerary_items')
+    def _upsert_itinerary_items(self, itinerary_id, daily_itinerary, destination, items=None, places=None):
+        """Replace an itinerary's items and keep its summary columns in step.
+
+        Callers that pass prebuilt `items` (and the `places` they reference) have already
+        written their summary with the itinerary row.
+        """
+        summary_written = items is not None
         try:
             print(f"💾 Upserting itinerary items for {itinerary_id}")
             
@@ -119,55 +268,16 @@ class DatabaseService:
             delete_result = self.supabase.table('itinerary_items').delete().eq('itinerary_id', itinerary_id).execute()
             print(f"🗑️ Deleted existing items: {len(delete_result.data) if delete_result.data else 0}")
             
-            items_to_upsert = []
+            if items is None:
+                places = {}
+                items_to_upsert = self._build_itinerary_items(itinerary_id, daily_itinerary, destination, places)
+            else:
+                items_to_upsert = items
+            self._store_places(places)
             
-            for day_data in daily_itinerary:
-                if not isinstance(day_data, dict):
-                    continue
-                    
-                day_number = day_data.get('day', 1)
-                activities = day_data.get('activities', [])
-                meals = day_data.get('meals', [])
-                
-                print(f"Processing day {day_number}: {len(activities)} activities, {len(meals)} meals")
-                
-                # Process activities
-                for idx, activity in enumerate(activities):
-                    if isinstance(activity, dict):
-                        item_data = {
-                            'id': str(uuid.uuid4()),  # Generate unique ID for each item
-                            'itinerary_id': itinerary_id,
-                            'day_number': day_number,
-                            'activity_type': activity.get('type', 'activity'),
-                            'title': activity.get('activity', activity.get('title', 'Activity')),
-                            'description': activity.get('description', ''),
-                            'location': activity.get('location', ''),
-                            'start_time': self._extract_time(activity.get('time')),
-                            'end_time': None,  # Could be calculated from duration
-                            'cost': self._extract_cost(activity.get('estimated_cost')),
-                            'notes': json.dumps(activity.get('tips', [])) if activity.get('tips') else None,
-                            'created_at': datetime.now().isoformat()
-                        }
-                        items_to_upsert.append(item_data)
-                
-                # Process meals
-                for idx, meal in enumerate(meals):
-                    if isinstance(meal, dict):
-                        item_data = {
-                            'id': str(uuid.uuid4()),
-                            'itinerary_id': itinerary_id,
-                            'day_number': day_number,
-                            'activity_type': 'meal',
-                            'title': f"{meal.get('meal_type', 'Meal').title()} at {meal.get('restaurant', 'Restaurant')}",
-                            'description': f"{meal.get('cuisine', '')} cuisine",
-                            'location': meal.get('location', ''),
-                            'start_time': self._extract_time(meal.get('time')),
-                            'end_time': None,
-                            'cost': self._extract_cost(meal.get('estimated_cost')),
-                            'notes': json.dumps(meal.get('specialties', [])) if meal.get('specialties') else None,
-                            'created_at': datetime.now().isoformat()
-                        }
-                        items_to_upsert.append(item_data)
+            if not summary_written:
+                self._write_summary(itinerary_id, self._summarize_items(items_to_upsert))
+                summary_written = True
             
             if items_to_upsert:
                 print(f"💾 Upserting {len(items_to_upsert)} itinerary items...")
@@ -184,76 +294,297 @@ class DatabaseService:
                     
         except Exception as e:
             print(f"❌ Error upserting itinerary items: {str(e)}")
+            # Some of the old or new items may be missing; recount what is actually stored
+            if summary_written:
+                self._refresh_summary(itinerary_id)
+    
+    def _summarize_items(self, items):
+        """Summary columns for the itineraries row, from its itinerary_items rows"""
+        summary = {
+            'item_count': len(items),
+            'activity_count': 0,
+            'meal_count': 0,
+            'day_count': len({item['day_number'] for item in items}),
+            'activity_cost_total': 0.0,
+            'meal_cost_total': 0.0
+        }
+        for item in items:
+            kind = 'meal' if item['activity_type'] == 'meal' else 'activity'
+            summary[f'{kind}_count'] += 1
+            summary[f'{kind}_cost_total'] += item['cost'] or 0
+        summary['cost_total'] = summary['activity_cost_total'] + summary['meal_cost_total']
+        return summary
+    
+    def _write_summary(self, itinerary_id, summary):
+        # A changed summary is a change to the row as far as delta sync is concerned
+        self.supabase.table('itineraries')\
+            .update({**summary, 'updated_at': datetime.now(timezone.utc).isoformat()})\
+            .eq('id', itinerary_id)\
+            .execute()
+    
+    def _refresh_summary(self, itinerary_id):
+        """Recompute an itinerary's summary from the items actually stored"""
+        try:
+            items = self.supabase.table('itinerary_items')\
+                .select('day_number, activity_type, cost')\
+                .eq('itinerary_id', itinerary_id)\
+                .execute().data or []
+            self._write_summary(itinerary_id, self._summarize_items(items))
+            print(f"🔁 Summary for {itinerary_id} recounted from {len(items)} stored items")
+        except Exception as e:
+            print(f"⚠️ Could not refresh itinerary summary: {str(e)}")
+    
+    def _build_itinerary_items(self, itinerary_id, daily_itinerary, destination, places):
+        """Flatten a daily itinerary into itinerary_items rows.
+
+        What identifies the place (kind, name, location) goes into the shared catalog: each
+        place referenced is added to `places` by place_key. The item keeps the per-trip
+        fields, including this itinerary's description and tips for the place.
+        """
+        canonical_destination = get_default_canonicalizer().canonicalize(destination)
+        items_to_upsert = []
+        
+        for day_data in daily_itinerary:
+            if not isinstance(day_data, dict):
+                continue
+                
+            day_number = day_data.get('day', 1)
+            activities = day_data.get('activities', [])
+            meals = day_data.get('meals', [])
+            
+            print(f"Processing day {day_number}: {len(activities)} activities, {len(meals)} meals")
+            
+            # Process activities
+            for idx, activity in enumerate(activities):
+                if isinstance(activity, dict):
+                    title = activity.get('activity', activity.get('title', 'Activity'))
+                    key, place = build_place(
+                        canonical_destination,
+                        activity.get('type', 'activity'),
+                        title,
+                        activity.get('location', '')
+                    )
+                    places.setdefault(key, place)
+                    item_data = {
+                        'id': str(uuid.uuid4()),  # Generate unique ID for each item
+                        'itinerary_id': itinerary_id,
+                        'place_key': key,
+                        'day_number': day_number,
+                        'activity_type': activity.get('type', 'activity'),
+                        'title': title,
+                        'description': activity.get('description', ''),
+                        'notes': json.dumps(activity.get('tips', [])) if activity.get('tips') else None,
+                        'start_time': self._extract_time(activity.get('time')),
+                        'end_time': None,  # Could be calculated from duration
+                        'cost': self._extract_cost(activity.get('estimated_cost')),
+                        'created_at': datetime.now().isoformat()
+                    }
+                    items_to_upsert.append(item_data)
+            
+            # Process meals
+            for idx, meal in enumerate(meals):
+                if isinstance(meal, dict):
+                    restaurant = meal.get('restaurant', 'Restaurant')
+                    key, place = build_place(
+                        canonical_destination,
+                        'meal',
+                        restaurant,
+                        meal.get('location', '')
+                    )
+                    places.setdefault(key, place)
+                    item_data = {
+                        'id': str(uuid.uuid4()),
+                        'itinerary_id': itinerary_id,
+                        'place_key': key,
+                        'day_number': day_number,
+                        'activity_type': 'meal',
+                        'title': f"{meal.get('meal_type', 'Meal').title()} at {restaurant}",
+                        'description': f"{meal.get('cuisine', '')} cuisine",
+                        'notes': json.dumps(meal.get('specialties', [])) if meal.get('specialties') else None,
+                        'start_time': self._extract_time(meal.get('time')),
+                        'end_time': None,
+                        'cost': self._extract_cost(meal.get('estimated_cost')),
+                        'created_at': datetime.now().isoformat()
+                    }
+                    items_to_upsert.append(item_data)
+        
+        return items_to_upsert
     
     def save_itinerary(self, request_data, ai_response, user_id=None):
         """Legacy method - now uses upsert internally"""
         return self.upsert_itinerary(request_data, ai_response, user_id)
     
-    def get_user_itineraries(self, user_id):
-        """Get all itineraries for a user with complete data"""
+    @traced('db.get_user_itineraries')
+    def get_user_itineraries(self, user_id, fields=None):
+        """Get a user's itineraries for listing: one narrow row each, summaries included, or only `fields`"""
         try:
-            print(f"🔍 Fetching complete itineraries for user: {user_id}")
+            print(f"🔍 Fetching itinerary summaries for user: {user_id}")
             
             result = self.supabase.table('itineraries')\
-                .select('*')\
+                .select(self._row_columns(fields) if fields else LIST_COLUMNS)\
                 .eq('user_id', user_id)\
                 .order('created_at', desc=True)\
                 .execute()
             
             print(f"✅ Found {len(result.data)} itineraries")
-            
-            # Enhance each itinerary with items
-            for itinerary in result.data:
-                try:
-                    items_result = self.supabase.table('itinerary_items')\
-                        .select('*')\
-                        .eq('itinerary_id', itinerary['id'])\
-                        .order('day_number', desc=False)\
-                        .order('start_time', desc=False)\
-                        .execute()
-                    
-                    if items_result.data:
-                        itinerary['items'] = items_result.data
-                        print(f"Added {len(items_result.data)} items to itinerary {itinerary['id']}")
-                except Exception as e:
-                    print(f"⚠️ Could not fetch items for itinerary {itinerary['id']}: {str(e)}")
-            
             return result.data
             
         except Exception as e:
             print(f"❌ Error fetching user itineraries: {str(e)}")
             return []
     
-    def get_itinerary_by_id(self, itinerary_id):
-        """Get specific itinerary by ID with all related data"""
+    @traced('db.get_itinerary_changes')
+    def get_itinerary_changes(self, user_id, since, fields=None):
+        """A user's itineraries created or updated at or after `since`, and the ids deleted since then"""
+        print(f"🔍 Fetching itinerary changes for user {user_id} since {since}")
+        
+        changed = self.supabase.table('itineraries')\
+            .select(self._row_columns(fields) if fields else LIST_COLUMNS)\
+            .eq('user_id', user_id)\
+            .gte('updated_at', since)\
+            .order('updated_at', desc=False)\
+            .execute().data or []
+        
+        tombstones = self.supabase.table('itinerary_tombstones')\
+            .select('itinerary_id')\
+            .eq('user_id', user_id)\
+            .gte('deleted_at', since)\
+            .execute().data or []
+        
+        print(f"✅ {len(changed)} changed, {len(tombstones)} deleted")
+        return changed, [t['itinerary_id'] for t in tombstones]
+    
+    def _record_tombstones(self, deleted_rows):
+        """Remember deleted itineraries so delta sync can tell clients to drop them"""
+        if not deleted_rows:
+            return
+        deleted_at = datetime.now(timezone.utc).isoformat()
+        try:
+            self.supabase.table('itinerary_tombstones').upsert(
+                [{'itinerary_id': row['id'], 'user_id': row.get('user_id'), 'deleted_at': deleted_at} for row in deleted_rows],
+                on_conflict='itinerary_id'
+            ).execute()
+        except Exception as e:
+            print(f"⚠️ Could not record tombstones: {str(e)}")
+    
+    @traced('db.search_itineraries')
+    def search_itineraries(self, user_id, query, limit=20, offset=0):
+        """A user's itineraries matching a web-search style query, best match first, with their rank"""
+        print(f"🔍 Searching itineraries for user {user_id}: {query!r}")
+        rows = self.supabase.rpc('search_itineraries', {
+            'p_user_id': user_id,
+            'p_query': query,
+            'p_limit': limit,
+            'p_offset': offset
+        }).execute().data or []
+        print(f"✅ {len(rows)} matches")
+        return rows
+    
+    def iter_trip_requests(self, since, page_size=1000):
+        """Yield the trip parameters of every itinerary created at or after `since`, one page at a time"""
+        offset = 0
+        while True:
+            page = self.supabase.table('itineraries')\
+                .select('destination, start_date, end_date, budget, is_vegetarian')\
+                .gte('created_at', since)\
+                .order('created_at', desc=False)\
+                .order('id', desc=False)\
+                .range(offset, offset + page_size - 1)\
+                .execute().data or []
+            yield from page
+            if len(page) < page_size:
+                return
+            offset += page_size
+    
+    def iter_user_itineraries(self, user_id, page_size=100):
+        """Yield a user's itineraries with their items, oldest first, one page of rows at a time"""
+        offset = 0
+        while True:
+            # Ascending order keeps pages stable while new trips are being added
+            page = self.supabase.table('itineraries')\
+                .select('*, itinerary_blobs(data, encoding)')\
+                .eq('user_id', user_id)\
+                .order('created_at', desc=False)\
+                .order('id', desc=False)\
+                .range(offset, offset + page_size - 1)\
+                .execute().data or []
+            if not page:
+                return
+            
+            items_by_itinerary = {}
+            for item in self._iter_items([row['id'] for row in page], page_size):
+                items_by_itinerary.setdefault(item['itinerary_id'], []).append(item)
+            
+            for itinerary in page:
+                blob = itinerary.pop('itinerary_blobs', None)
+                try:
+                    ai_response = decode_blob(blob)
+                except Exception as e:
+                    print(f"⚠️ Could not decode itinerary blob: {str(e)}")
+                    ai_response = None
+                if ai_response:
+                    itinerary['ai_response'] = ai_response
+                itinerary['items'] = items_by_itinerary.get(itinerary['id'], [])
+                yield itinerary
+            
+            if len(page) < page_size:
+                return
+            offset += page_size
+    
+    def _iter_items(self, itinerary_ids, page_size):
+        """Page through the items of several itineraries with one query per page"""
+        offset = 0
+        while True:
+            rows = self.supabase.table('itinerary_items')\
+                .select(ITEM_COLUMNS)\
+                .in_('itinerary_id', itinerary_ids)\
+                .order('itinerary_id', desc=False)\
+                .order('day_number', desc=False)\
+                .order('start_time', desc=False)\
+                .order('id', desc=False)\
+                .range(offset, offset + page_size - 1)\
+                .execute().data or []
+            for row in rows:
+                yield merge_place(row)
+            if len(rows) < page_size:
+                return
+            offset += page_size
+    
+    @traced('db.get_itinerary_by_id')
+    def get_itinerary_by_id(self, itinerary_id, fields=None):
+        """Get specific itinerary by ID with all related data, or only `fields` (as from parse_fields)"""
         try:
             print(f"🔍 Fetching complete itinerary: {itinerary_id}")
             
-            # Get main itinerary
+            if fields:
+                # Only the requested columns, and the blob only when an AI response field is asked for
+                columns = self._row_columns(fields)
+                if any(field in TRIP_FIELDS for field in fields):
+                    columns += ', itinerary_blobs(data, encoding)'
+            else:
+                # Get main itinerary together with its stored AI response in one read
+                columns = '*, itinerary_blobs(data, encoding)'
             result = self.supabase.table('itineraries')\
-                .select('*')\
+                .select(columns)\
                 .eq('id', itinerary_id)\
                 .execute()
             
             if not result.data:
                 return None
                 
-            itinerary = result.data[0]
-            
-            # Get related items
-            try:
-                items_result = self.supabase.table('itinerary_items')\
-                    .select('*')\
-                    .eq('itinerary_id', itinerary_id)\
-                    .order('day_number', desc=False)\
-                    .order('start_time', desc=False)\
-                    .execute()
-                
-                if items_result.data:
-                    itinerary['items'] = items_result.data
-                    print(f"✅ Found {len(items_result.data)} related items")
-            except Exception as e:
-                print(f"⚠️ Could not fetch related items: {str(e)}")
+            itinerary = self._merge_blob(result.data[0])
+            
+            if fields:
+                itinerary = {key: value for key, value in itinerary.items() if key == 'id' or key in fields}
+                if 'items' in fields:
+                    itinerary['items'] = self._fetch_items(itinerary_id, self._item_columns(fields['items']))
+            elif 'content_hash' in itinerary and 'daily_itinerary' in itinerary:
+                print(f"✅ Served from stored blob {itinerary['content_hash'][:12]}")
+            else:
+                # Rows saved before blobs existed are reassembled from their items
+                items = self._fetch_items(itinerary_id, ITEM_COLUMNS)
+                if items:
+                    itinerary['items'] = items
             
             print(f"✅ Complete itinerary fetched successfully")
             return itinerary
@@ -262,6 +593,216 @@ class DatabaseService:
             print(f"❌ Error fetching itinerary: {str(e)}")
             return None
     
+    @traced('db.get_itinerary_days')
+    def get_itinerary_days(self, itinerary_id, first=None, last=None):
+        """An itinerary's day index, or its days first..last when first is given; None if not found.
+
+        Blob-backed days come from the day read cache, filled from the blob on a miss.
+        Itineraries saved before blobs are assembled from their items, filtered on day_number.
+        """
+        print(f"🔍 Fetching days {first}-{last} of itinerary {itinerary_id}")
+        rows = self.supabase.table('itineraries')\
+            .select('id, user_id, title, destination, start_date, end_date, day_count, content_hash')\
+            .eq('id', itinerary_id)\
+            .execute().data
+        if not rows:
+            return None
+        itinerary = rows[0]
+        content_hash = itinerary.pop('content_hash', None)
+        if not content_hash:
+            return self._legacy_itinerary_days(itinerary, first, last)
+        
+        day_index = self.day_cache.get_index(content_hash) if self.day_cache else None
+        if day_index is not None:
+            if first is not None:
+                itinerary['days'] = self.day_cache.get_days(content_hash, first, last)
+            else:
+                itinerary['days'] = day_index
+            print(f"✅ Served from day cache {content_hash[:12]}")
+            return itinerary
+        
+        blobs = self.supabase.table('itinerary_blobs')\
+            .select('data, encoding')\
+            .eq('content_hash', content_hash)\
+            .execute().data
+        ai_response = decode_blob(blobs[0]) if blobs else None
+        days, day_index = self._cache_days(content_hash, ai_response or {})
+        itinerary['days'] = days[first - 1:last] if first is not None else day_index
+        return itinerary
+    
+    def _cache_days(self, content_hash, ai_response):
+        """Split an AI response into days and its day index, keeping both in the day cache"""
+        days = [day for day in ai_response.get('daily_itinerary') or [] if isinstance(day, dict)]
+        day_index = [self._day_summary(number, day) for number, day in enumerate(days, 1)]
+        if self.day_cache and days:
+            try:
+                self.day_cache.put(content_hash, day_index, days)
+            except Exception as e:
+                print(f"⚠️ Could not cache itinerary days: {str(e)}")
+        return days, day_index
+    
+    def _day_summary(self, number, day):
+        """One entry of the day index: what the day tabs show before the day itself is loaded"""
+        activities = [a for a in day.get('activities', []) if isinstance(a, dict)]
+        meals = [m for m in day.get('meals', []) if isinstance(m, dict)]
+        costs = [self._extract_cost(entry.get('estimated_cost')) for entry in activities + meals]
+        return {
+            'day': number,
+            'date': day.get('date'),
+            'day_name': day.get('day_name'),
+            'theme': day.get('theme'),
+            'activity_count': len(activities),
+            'meal_count': len(meals),
+            'estimated_cost': sum(cost for cost in costs if cost)
+        }
+    
+    def _legacy_itinerary_days(self, itinerary, first, last):
+        """Day index or days of an itinerary saved before blobs, from its items"""
+        query = self.supabase.table('itinerary_items')
+        if first is None:
+            items = query.select('day_number, activity_type, cost')\
+                .eq('itinerary_id', itinerary['id'])\
+                .execute().data or []
+            by_day = {}
+            for item in items:
+                by_day.setdefault(item.get('day_number') or 1, []).append(item)
+            itinerary['days'] = [{
+                'day': number,
+                'date': None,
+                'day_name': None,
+                'theme': None,
+                'activity_count': sum(1 for item in day_items if item.get('activity_type') != 'meal'),
+                'meal_count': sum(1 for item in day_items if item.get('activity_type') == 'meal'),
+                'estimated_cost': sum(item.get('cost') or 0 for item in day_items)
+            } for number, day_items in sorted(by_day.items())]
+            return itinerary
+        
+        items = query.select(ITEM_COLUMNS)\
+            .eq('itinerary_id', itinerary['id'])\
+            .gte('day_number', first)\
+            .lte('day_number', last)\
+            .order('day_number', desc=False)\
+            .order('start_time', desc=False)\
+            .execute().data or []
+        by_day = {}
+        for item in items:
+            by_day.setdefault(item['day_number'], []).append(merge_place(item))
+        itinerary['days'] = [{'day': number, 'items': day_items} for number, day_items in sorted(by_day.items())]
+        return itinerary
+    
+    def _fetch_items(self, itinerary_id, columns):
+        """An itinerary's items in day order, with their catalog place fields folded in"""
+        try:
+            items = self.supabase.table('itinerary_items')\
+                .select(columns)\
+                .eq('itinerary_id', itinerary_id)\
+                .order('day_number', desc=False)\
+                .order('start_time', desc=False)\
+                .execute().data or []
+            print(f"✅ Found {len(items)} related items")
+            return [merge_place(item) for item in items]
+        except Exception as e:
+            print(f"⚠️ Could not fetch related items: {str(e)}")
+            return []
+    
+    def _row_columns(self, fields):
+        """Select list for the requested itinerary row columns; id is always included"""
+        return ', '.join(['id'] + [field for field in fields if field in ITINERARY_FIELDS and field != 'id'])
+    
+    def _item_columns(self, item_fields):
+        """Select list for the requested item fields, reading place fields from the catalog"""
+        # Items carry their own place fields too (all of them before the catalog), so select both
+        columns = list(item_fields)
+        place_fields = [field for field in item_fields if field in PLACE_FIELDS]
+        if place_fields:
+            columns.append(f"places({', '.join(place_fields)})")
+        return ', '.join(columns)
+    
+    def _merge_blob(self, itinerary):
+        """Fold an embedded itinerary_blobs row into the itinerary, generate-response style"""
+        blob = itinerary.pop('itinerary_blobs', None)
+        ai_response = None
+        if blob:
+            try:
+                ai_response = decode_blob(blob)
+            except Exception as e:
+                print(f"⚠️ Could not decode itinerary blob: {str(e)}")
+        if not ai_response:
+            return itinerary
+        # AI fields at the top level, row columns win
+        return {**ai_response, **itinerary}
+    
+    @traced('db.get_itineraries_bulk')
+    def get_itineraries_bulk(self, itinerary_ids, user_id):
+        """Fetch several itineraries in two round trips; returns {id: (status, itinerary)}"""
+        print(f"🔍 Bulk fetching {len(itinerary_ids)} itineraries for user {user_id}")
+        
+        rows = self.supabase.table('itineraries')\
+            .select('*, itinerary_blobs(data, encoding)')\
+            .in_('id', itinerary_ids)\
+            .execute().data or []
+        
+        found = {}
+        results = {}
+        for row in rows:
+            if str(row.get('user_id')) != str(user_id):
+                results[row['id']] = ('forbidden', None)
+                continue
+            found[row['id']] = self._merge_blob(row)
+        
+        # Rows saved before blobs existed are reassembled from their items, all in one query
+        legacy_ids = [i for i, itinerary in found.items() if 'daily_itinerary' not in itinerary]
+        if legacy_ids:
+            items = self.supabase.table('itinerary_items')\
+                .select(ITEM_COLUMNS)\
+                .in_('itinerary_id', legacy_ids)\
+                .order('day_number', desc=False)\
+                .order('start_time', desc=False)\
+                .execute().data or []
+            for item in items:
+                found[item['itinerary_id']].setdefault('items', []).append(merge_place(item))
+        
+        for itinerary_id in itinerary_ids:
+            if itinerary_id in found:
+                results[itinerary_id] = ('ok', found[itinerary_id])
+            else:
+                results.setdefault(itinerary_id, ('not_found', None))
+        print(f"✅ Bulk fetch: {sum(1 for status, _ in results.values() if status == 'ok')} of {len(itinerary_ids)} returned")
+        return results
+    
+    @traced('db.delete_itineraries_bulk')
+    def delete_itineraries_bulk(self, itinerary_ids, user_id):
+        """Delete the caller's itineraries among itinerary_ids in three round trips; returns {id: status}"""
+        print(f"🗑️ Bulk deleting {len(itinerary_ids)} itineraries for user {user_id}")
+        
+        rows = self.supabase.table('itineraries')\
+            .select('id, user_id')\
+            .in_('id', itinerary_ids)\
+            .execute().data or []
+        owners = {row['id']: str(row.get('user_id')) for row in rows}
+        owned = [i for i in itinerary_ids if owners.get(i) == str(user_id)]
+        
+        results = {
+            i: 'not_found' if i not in owners else 'forbidden'
+            for i in itinerary_ids if i not in owned
+        }
+        if owned:
+            self.supabase.table('itinerary_items').delete().in_('itinerary_id', owned).execute()
+            # The user_id filter keeps the delete safe even if ownership changed since the check
+            deleted = self.supabase.table('itineraries')\
+                .delete()\
+                .in_('id', owned)\
+                .eq('user_id', user_id)\
+                .execute().data or []
+            self._record_tombstones(deleted)
+            deleted_ids = {row['id'] for row in deleted}
+            for i in owned:
+                results[i] = 'deleted' if i in deleted_ids else 'not_found'
+        
+        print(f"✅ Bulk delete: {sum(1 for status in results.values() if status == 'deleted')} of {len(itinerary_ids)} deleted")
+        return results
+    
+    @traced('db.delete_itinerary')
     def delete_itinerary(self, itinerary_id):
         """Delete itinerary and all related items"""
         try:
@@ -272,9 +813,16 @@ class DatabaseService:
             print(f"🗑️ Deleted {len(items_result.data) if items_result.data else 0} related items")
             
             # Delete main itinerary
-            result = self.supabase.table('itineraries').delete().eq('id', itinerary_id).execute()
+            try:
+                result = self.supabase.table('itineraries').delete().eq('id', itinerary_id).execute()
+            except Exception:
+                # The row survived without its items; don't leave it advertising them
+                if items_result.data:
+                    self._write_summary(itinerary_id, self._summarize_items([]))
+                raise
             
             if result.data:
+                self._record_tombstones(result.data)
                 print(f"✅ Itinerary {itinerary_id} deleted successfully")
                 return True
             else:
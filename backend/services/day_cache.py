@@ -0,0 +1,83 @@
+import json
+import time
+
+
+class ItineraryDayCache:
+    """Shared read cache of itinerary days and day indexes, keyed by blob content hash.
+
+    Blobs are content-addressed, so an entry never goes stale: an edited itinerary
+    points at a new hash. The TTL only bounds how much the cache keeps on disk.
+    """
+
+    def __init__(self, store, ttl=24 * 3600):
+        self.store = store
+        self.ttl = ttl
+        self._hits = 0
+        self._misses = 0
+        store.ensure_schema(
+            """
+            CREATE TABLE IF NOT EXISTS itinerary_day_index (
+                content_hash TEXT PRIMARY KEY,
+                day_index TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS itinerary_days (
+                content_hash TEXT NOT NULL,
+                day_number INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                PRIMARY KEY (content_hash, day_number)
+            )
+            """
+        )
+
+    def get_index(self, content_hash):
+        """The cached day index for a blob, or None"""
+        row = self.store.execute(
+            'SELECT day_index FROM itinerary_day_index WHERE content_hash = ? AND expires_at > ?',
+            (content_hash, time.time())
+        ).fetchone()
+        if row is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return json.loads(row[0])
+
+    def get_days(self, content_hash, first, last):
+        """Cached days first..last of a blob whose index is cached, in day order"""
+        rows = self.store.execute(
+            """
+            SELECT day FROM itinerary_days
+            WHERE content_hash = ? AND day_number BETWEEN ? AND ?
+            ORDER BY day_number
+            """,
+            (content_hash, first, last)
+        ).fetchall()
+        return [json.loads(day) for (day,) in rows]
+
+    def put(self, content_hash, day_index, days):
+        """Cache a blob's index and its days; days are numbered by position, from 1"""
+        now = time.time()
+        with self.store.transaction() as conn:
+            # Drop whatever has expired, so the tables only hold recently read itineraries
+            expired = [h for (h,) in conn.execute(
+                'SELECT content_hash FROM itinerary_day_index WHERE expires_at <= ?', (now,)
+            ).fetchall()]
+            for stale in expired:
+                conn.execute('DELETE FROM itinerary_days WHERE content_hash = ?', (stale,))
+                conn.execute('DELETE FROM itinerary_day_index WHERE content_hash = ?', (stale,))
+            conn.executemany(
+                'INSERT OR REPLACE INTO itinerary_days (content_hash, day_number, day) VALUES (?, ?, ?)',
+                [(content_hash, number, json.dumps(day, ensure_ascii=False)) for number, day in enumerate(days, 1)]
+            )
+            conn.execute(
+                'INSERT OR REPLACE INTO itinerary_day_index (content_hash, day_index, expires_at) VALUES (?, ?, ?)',
+                (content_hash, json.dumps(day_index, ensure_ascii=False), now + self.ttl)
+            )
+
+    def get_state(self):
+        entries = self.store.execute(
+            'SELECT COUNT(*) FROM itinerary_day_index WHERE expires_at > ?', (time.time(),)
+        ).fetchone()[0]
+        return {'itineraries': entries, 'hits': self._hits, 'misses': self._misses}
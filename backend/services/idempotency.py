@@ -0,0 +1,59 @@
+import hashlib
+import time
+
+
+class IdempotencyStore:
+    """Remember responses by Idempotency-Key in the shared store so a retried request is answered once.
+
+    A key is claimed with an in-progress marker before the work starts; retries that
+    arrive while it runs wait for the stored result instead of doing the work again.
+    The marker expires after in_progress_ttl, so a worker dying mid-request frees the key.
+    """
+
+    def __init__(self, store, ttl=86400, in_progress_ttl=300, wait_seconds=20.0, poll_interval=0.25):
+        self.store = store
+        self.ttl = ttl
+        self.in_progress_ttl = in_progress_ttl
+        self.wait_seconds = wait_seconds
+        self.poll_interval = poll_interval
+
+    @staticmethod
+    def fingerprint(body):
+        return hashlib.sha256(body or b'').hexdigest()
+
+    def begin(self, key, fingerprint):
+        """Claim key for a request; returns (state, record).
+
+        state is 'new' (caller does the work, then complete() or release()), 'replay'
+        (record holds the stored response), 'in_progress' (still running after waiting)
+        or 'mismatch' (key reused with a different request body).
+        """
+        store_key = f"idem:{key}"
+        deadline = time.time() + self.wait_seconds
+        while True:
+            if self.store.add(store_key, {'state': 'in_progress', 'fingerprint': fingerprint}, ttl=self.in_progress_ttl):
+                return 'new', None
+            record = self.store.get(store_key)
+            if record is None:
+                continue  # expired or released between the two calls
+            if record['fingerprint'] != fingerprint:
+                return 'mismatch', record
+            if record['state'] == 'done':
+                return 'replay', record
+            if time.time() >= deadline:
+                return 'in_progress', record
+            time.sleep(self.poll_interval)
+
+    def complete(self, key, fingerprint, status, body, headers=None):
+        self.store.set(f"idem:{key}", {
+            'state': 'done',
+            'fingerprint': fingerprint,
+            'status': status,
+            'body': body,
+            'headers': headers or {},
+            'completed_at': time.time()
+        }, ttl=self.ttl)
+
+    def release(self, key):
+        """Forget a claimed key so the request can be retried (after errors)"""
+        self.store.delete(f"idem:{key}")
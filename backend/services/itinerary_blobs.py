@@ -0,0 +1,35 @@
+import base64
+import hashlib
+import json
+import zlib
+
+ENCODING = 'zlib+base64'
+
+
+def canonical_json(ai_response):
+    """Deterministic serialization, so identical itineraries hash to the same blob"""
+    return json.dumps(ai_response, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+
+def encode_blob(ai_response):
+    """Return (content_hash, row) for storing ai_response in itinerary_blobs"""
+    raw = canonical_json(ai_response).encode('utf-8')
+    content_hash = hashlib.sha256(raw).hexdigest()
+    compressed = zlib.compress(raw, 6)
+    return content_hash, {
+        'content_hash': content_hash,
+        'encoding': ENCODING,
+        'data': base64.b64encode(compressed).decode('ascii'),
+        'size_bytes': len(raw),
+        'compressed_bytes': len(compressed)
+    }
+
+
+def decode_blob(blob_row):
+    """Inverse of encode_blob for a row (or embedded object) from itinerary_blobs"""
+    if not blob_row or not blob_row.get('data'):
+        return None
+    encoding = blob_row.get('encoding') or ENCODING
+    if encoding != ENCODING:
+        raise ValueError(f"Unsupported itinerary blob encoding: {encoding}")
+    return json.loads(zlib.decompress(base64.b64decode(blob_row['data'])).decode('utf-8'))
@@ -0,0 +1,238 @@
+import json
+import re
+import threading
+import time
+import unicodedata
+
+from config import Config
+
+# Common spellings, old names and sub-regions that should share cached itineraries
+DEFAULT_DESTINATION_ALIASES = {
+    'north goa': 'goa',
+    'south goa': 'goa',
+    'panaji': 'goa',
+    'bombay': 'mumbai',
+    'bangalore': 'bengaluru',
+    'calcutta': 'kolkata',
+    'madras': 'chennai',
+    'new delhi': 'delhi',
+    'old delhi': 'delhi',
+    'cochin': 'kochi',
+    'trivandrum': 'thiruvananthapuram',
+    'pondicherry': 'puducherry',
+    'pondy': 'puducherry',
+    'benaras': 'varanasi',
+    'banaras': 'varanasi',
+    'kashi': 'varanasi',
+    'mysore': 'mysuru',
+    'gurgaon': 'gurugram',
+    'ooty': 'udhagamandalam',
+    'simla': 'shimla',
+    'leh ladakh': 'ladakh',
+    'leh': 'ladakh',
+    'kerala backwaters': 'kerala',
+    'alleppey': 'alappuzha'
+}
+
+# Trailing qualifiers users add that do not change the trip
+COUNTRY_SUFFIXES = ('india', 'bharat')
+
+# Per-day budget bands in rupees; itineraries are only reused within a band
+BUDGET_BANDS = ((2000, 'shoestring'), (5000, 'budget'), (12000, 'comfort'), (float('inf'), 'luxury'))
+
+
+def budget_band(budget, duration):
+    try:
+        per_day = float(budget) / max(1, duration)
+    except (TypeError, ValueError):
+        return 'unknown'
+    for ceiling, band in BUDGET_BANDS:
+        if per_day < ceiling:
+            return band
+    return 'luxury'
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_similarity(a, b):
+    ta, tb = trigrams(a), trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+class DestinationCanonicalizer:
+    """Normalize free-text destinations ("goa, India", "North Goa") to one canonical name"""
+
+    def __init__(self, aliases=None):
+        self.aliases = dict(DEFAULT_DESTINATION_ALIASES)
+        if aliases:
+            self.aliases.update({self._normalize(k): self._normalize(v) for k, v in aliases.items()})
+
+    @staticmethod
+    def _normalize(text):
+        text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii')
+        text = re.sub(r'[^a-z0-9, ]+', ' ', text.lower())
+        return re.sub(r'\s+', ' ', text).strip()
+
+    def canonicalize(self, destination):
+        text = self._normalize(destination)
+        parts = [p.strip() for p in text.split(',') if p.strip()]
+        while len(parts) > 1 and parts[-1] in COUNTRY_SUFFIXES:
+            parts.pop()
+        text = parts[0] if parts else ''
+        words = text.split(' ')
+        if len(words) > 1 and words[-1] in COUNTRY_SUFFIXES:
+            text = ' '.join(words[:-1])
+        return self.aliases.get(text, text)
+
+
+_default_canonicalizer = None
+_default_canonicalizer_lock = threading.Lock()
+
+
+def get_default_canonicalizer():
+    """Canonicalizer with DESTINATION_ALIASES_PATH applied, shared by the cache and the place catalog"""
+    global _default_canonicalizer
+    with _default_canonicalizer_lock:
+        if _default_canonicalizer is None:
+            aliases = None
+            if Config.DESTINATION_ALIASES_PATH:
+                with open(Config.DESTINATION_ALIASES_PATH) as f:
+                    aliases = json.load(f)
+            _default_canonicalizer = DestinationCanonicalizer(aliases)
+        return _default_canonicalizer
+
+
+class ItineraryCache:
+    """Shared cache of generated itineraries, matched by canonical destination, length and budget band"""
+
+    def __init__(self, store, canonicalizer, similarity_threshold=0.6, duration_tolerance=1,
+                 ttl=7 * 24 * 3600, index_refresh_seconds=60):
+        self.store = store
+        self.canonicalizer = canonicalizer
+        self.similarity_threshold = similarity_threshold
+        self.duration_tolerance = duration_tolerance
+        self.ttl = ttl
+        self.index_refresh_seconds = index_refresh_seconds
+        self._lock = threading.Lock()
+        self._trigram_index = {}
+        self._known_destinations = set()
+        self._index_loaded_at = 0
+        self._hits = 0
+        self._fuzzy_hits = 0
+        self._misses = 0
+        store.ensure_schema(
+            """
+            CREATE TABLE IF NOT EXISTS generation_cache (
+                canonical_destination TEXT NOT NULL,
+                duration INTEGER NOT NULL,
+                budget_band TEXT NOT NULL,
+                is_vegetarian INTEGER NOT NULL,
+                budget REAL,
+                itinerary TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (canonical_destination, duration, budget_band, is_vegetarian)
+            )
+            """
+        )
+
+    def _add_to_index(self, destination):
+        if destination in self._known_destinations:
+            return
+        self._known_destinations.add(destination)
+        for gram in trigrams(destination):
+            self._trigram_index.setdefault(gram, set()).add(destination)
+
+    def _refresh_index(self, force=False):
+        with self._lock:
+            if not force and time.time() - self._index_loaded_at < self.index_refresh_seconds:
+                return
+            rows = self.store.execute(
+                'SELECT DISTINCT canonical_destination FROM generation_cache WHERE expires_at > ?', (time.time(),)
+            ).fetchall()
+            for (destination,) in rows:
+                self._add_to_index(destination)
+            self._index_loaded_at = time.time()
+
+    def resolve_destination(self, destination):
+        """Canonical name, snapped to the closest cached destination above the similarity threshold"""
+        canonical = self.canonicalizer.canonicalize(destination)
+        self._refresh_index()
+        with self._lock:
+            if canonical in self._known_destinations:
+                return canonical
+            candidates = set()
+            for gram in trigrams(canonical):
+                candidates |= self._trigram_index.get(gram, set())
+        best, best_score = canonical, 0.0
+        for candidate in candidates:
+            score = trigram_similarity(canonical, candidate)
+            if score > best_score:
+                best, best_score = candidate, score
+        return best if best_score >= self.similarity_threshold else canonical
+
+    def _compatible(self, canonical, duration, budget, is_vegetarian, columns, valid_until):
+        # Only trips at least as long: a shorter one would be padded with template days
+        return self.store.execute(
+            f"""
+            SELECT {columns} FROM generation_cache
+            WHERE canonical_destination = ? AND budget_band = ? AND is_vegetarian = ?
+              AND duration BETWEEN ? AND ? AND expires_at > ?
+            """,
+            (canonical, budget_band(budget, duration), int(bool(is_vegetarian)),
+             duration, duration + self.duration_tolerance, valid_until)
+        ).fetchall()
+
+    def lookup(self, destination, duration, budget, is_vegetarian):
+        """Return (itinerary, cached_duration, cached_budget) for the closest compatible entry, or None"""
+        canonical = self.resolve_destination(destination)
+        rows = self._compatible(canonical, duration, budget, is_vegetarian, 'duration, budget, itinerary', time.time())
+        if not rows:
+            self._misses += 1
+            return None
+
+        # Prefer the exact length, then the shortest longer trip to trim
+        cached_duration, cached_budget, itinerary = min(rows, key=lambda r: r[0])
+        self._hits += 1
+        if canonical != self.canonicalizer.canonicalize(destination):
+            self._fuzzy_hits += 1
+        return json.loads(itinerary), cached_duration, cached_budget
+
+    def covers(self, destination, duration, budget, is_vegetarian, valid_for=0):
+        """True if lookup() would be answered for this trip for at least the next valid_for seconds"""
+        canonical = self.resolve_destination(destination)
+        return bool(self._compatible(canonical, duration, budget, is_vegetarian, '1', time.time() + valid_for))
+
+    def put(self, destination, duration, budget, is_vegetarian, itinerary):
+        canonical = self.resolve_destination(destination)
+        now = time.time()
+        self.store.execute(
+            """
+            INSERT OR REPLACE INTO generation_cache
+                (canonical_destination, duration, budget_band, is_vegetarian, budget, itinerary, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (canonical, duration, budget_band(budget, duration), int(bool(is_vegetarian)),
+             float(budget) if budget else None, json.dumps(itinerary, ensure_ascii=False), now, now + self.ttl)
+        )
+        with self._lock:
+            self._add_to_index(canonical)
+
+    def get_state(self):
+        entries = self.store.execute(
+            'SELECT COUNT(*) FROM generation_cache WHERE expires_at > ?', (time.time(),)
+        ).fetchone()[0]
+        return {
+            'entries': entries,
+            'destinations_indexed': len(self._known_destinations),
+            'similarity_threshold': self.similarity_threshold,
+            'duration_tolerance_days': self.duration_tolerance,
+            'hits': self._hits,
+            'fuzzy_hits': self._fuzzy_hits,
+            'misses': self._misses
+        }
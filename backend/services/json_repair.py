@@ -0,0 +1,250 @@
+import json
+import re
+
+# Python/JS literals models emit in place of JSON ones
+LITERALS = {'true': 'true', 'false': 'false', 'null': 'null', 'True': 'true', 'False': 'false', 'None': 'null',
+            'NaN': 'null', 'undefined': 'null'}
+NUMBER = re.compile(r'^-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?$')
+BAREWORD_CHARS = re.compile(r'[^\s,:{}\[\]"\'/]+')
+
+
+class _Frame:
+    __slots__ = ('closer', 'safe', 'count', 'key', 'state')
+
+    def __init__(self, closer, safe):
+        self.closer = closer  # '}' or ']'
+        self.safe = safe      # output length after the last complete element
+        self.count = 0        # complete elements so far
+        self.key = None       # object member being read
+        self.state = 'key' if closer == '}' else 'value'  # key | colon | value | comma
+
+
+def repair_json(text):
+    """Parse model output that may be truncated or slightly malformed JSON.
+
+    Fixes single-quoted strings, trailing and missing commas, comments, Python
+    literals, bare keys and raw newlines in strings. At a cut-off, the element that
+    was being written when the text ends is dropped and every open string, array and
+    object is closed.
+
+    Returns (data, repairs, open_path): repairs names each fix applied (empty when the
+    text was valid), open_path is the key/index path of the containers still open at
+    the cut-off (e.g. ['daily_itinerary', 6, 'meals']), or [] when the text was complete.
+    Raises ValueError when no JSON object or array can be recovered.
+    """
+    start = min((i for i in (text.find('{'), text.find('[')) if i != -1), default=-1)
+    if start == -1:
+        raise ValueError('No JSON object or array found')
+
+    out = []
+    stack = []
+    repairs = []
+    root_closed = False
+    i, n = start, len(text)
+
+    def note(repair):
+        if repair not in repairs:
+            repairs.append(repair)
+
+    def begin_value():
+        """Emit the separator before a new element of the innermost container"""
+        frame = stack[-1]
+        if frame.state == 'comma':
+            note('missing comma')
+            out.append(',')
+        elif frame.count:
+            out.append(',')
+        frame.state = 'colon' if frame.closer == '}' and frame.state in ('key', 'comma') else 'comma'
+
+    def end_value():
+        frame = stack[-1]
+        frame.count += 1
+        frame.safe = len(out)
+        frame.state = 'comma'
+        if frame.closer == '}':
+            frame.key = None
+
+    while i < n and not root_closed:
+        char = text[i]
+
+        if char in ' \t\r\n':
+            i += 1
+            continue
+
+        if char == '/' and text.startswith('//', i):
+            note('comment')
+            end = text.find('\n', i)
+            i = n if end == -1 else end + 1
+            continue
+        if char == '/' and text.startswith('/*', i):
+            note('comment')
+            end = text.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            continue
+
+        if char in '{[':
+            if stack:
+                frame = stack[-1]
+                if frame.closer == ']':
+                    begin_value()
+                elif frame.state in ('key', 'comma'):
+                    # A container where a key belongs; keep what came before it
+                    note('unexpected container')
+                    break
+                else:
+                    if frame.state == 'colon':
+                        note('missing colon')
+                        out.append(':')
+                    frame.state = 'comma'
+            out.append(char)
+            stack.append(_Frame('}' if char == '{' else ']', len(out)))
+            i += 1
+            continue
+
+        if char in '}]':
+            if not stack:
+                break
+            if stack[-1].closer != char:
+                note('mismatched bracket')
+                # Close whatever is open inside until the bracket matches, or ignore a stray one
+                if not any(frame.closer == char for frame in stack):
+                    i += 1
+                    continue
+            while True:
+                frame = stack.pop()
+                if frame.state in ('colon', 'value') and frame.closer == '}':
+                    # "key" or "key": with no value before the brace
+                    note('dangling key')
+                    del out[frame.safe:]
+                elif frame.state == ('key' if frame.closer == '}' else 'value') and frame.count:
+                    note('trailing comma')
+                out.append(frame.closer)
+                if not stack:
+                    root_closed = True
+                    break
+                end_value()
+                if frame.closer == char:
+                    break
+            i += 1
+            continue
+
+        if char == ',':
+            frame = stack[-1] if stack else None
+            if frame is None:
+                break
+            if frame.state == 'comma':
+                frame.state = 'key' if frame.closer == '}' else 'value'
+            else:
+                note('extra comma')
+            i += 1
+            continue
+
+        if char == ':':
+            frame = stack[-1] if stack else None
+            if frame is not None and frame.closer == '}' and frame.state == 'colon':
+                out.append(':')
+                frame.state = 'value'
+            else:
+                note('stray colon')
+            i += 1
+            continue
+
+        if not stack:
+            break
+        frame = stack[-1]
+        is_key = frame.closer == '}' and frame.state in ('key', 'comma')
+
+        if char in '"\'':
+            value, i, closed = _read_string(text, i, note)
+            if not closed:
+                # Cut off inside a string: it is dropped with the rest of the partial element
+                break
+        else:
+            match = BAREWORD_CHARS.match(text, i)
+            if not match:
+                note('stray character')
+                i += 1
+                continue
+            word = match.group(0)
+            i = match.end()
+            if i >= n:
+                break  # possibly cut off mid-number or mid-word
+            if is_key:
+                note('unquoted key')
+                value = json.dumps(word)
+            elif word in LITERALS:
+                if LITERALS[word] != word:
+                    note('non-JSON literal')
+                value = LITERALS[word]
+            elif NUMBER.match(word):
+                value = word
+            else:
+                note('unquoted string')
+                value = json.dumps(word)
+
+        if is_key:
+            begin_value()
+            frame.key = json.loads(value)
+            out.append(value)
+        elif frame.closer == ']':
+            begin_value()
+            out.append(value)
+            end_value()
+        elif frame.state == 'colon':
+            # "key" "value" with the colon left out
+            note('missing colon')
+            out.append(':')
+            out.append(value)
+            end_value()
+        else:
+            out.append(value)
+            end_value()
+
+    open_path = []
+    if stack:
+        note('truncated')
+        # Each open container's child that is still open: a member key, or an array index
+        open_path = [frame.key if frame.closer == '}' else frame.count for frame in stack[:-1]]
+        # Drop the partial element of the innermost container, then close everything
+        del out[stack[-1].safe:]
+        out.extend(frame.closer for frame in reversed(stack))
+
+    try:
+        return json.loads(''.join(out)), repairs, open_path
+    except json.JSONDecodeError as e:
+        raise ValueError(f'Could not repair JSON: {e}') from e
+
+
+def _read_string(text, start, note):
+    """Read a quoted string starting at text[start]; returns (json_literal, next_index, closed)"""
+    quote = text[start]
+    if quote == "'":
+        note('single quotes')
+    chars = []
+    i, n = start + 1, len(text)
+    while i < n:
+        char = text[i]
+        if char == '\\':
+            if i + 1 >= n:
+                break
+            following = text[i + 1]
+            if following == "'":
+                chars.append("'")
+            elif following in '"\\/bfnrtu':
+                chars.append(text[i:i + 2])
+            else:
+                note('invalid escape')
+                chars.append('\\\\' + following)
+            i += 2
+            continue
+        if char == quote:
+            return '"' + ''.join(chars) + '"', i + 1, True
+        if char == '"':
+            chars.append('\\"')
+        elif char < ' ':
+            note('control character in string')
+            chars.append({'\n': '\\n', '\r': '\\r', '\t': '\\t'}.get(char, f'\\u{ord(char):04x}'))
+        else:
+            chars.append(char)
+        i += 1
+    return None, n, False
@@ -0,0 +1,381 @@
+import contextvars
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from types import SimpleNamespace
+
+from config import Config
+from services.resilience import CallCancelled, CircuitBreaker, CircuitOpenError, ResilientCaller, RetryBudget
+from services.shared_store import get_shared_store
+from services.token_scheduler import TokenScheduler
+from services.traffic_capture import capture_enabled, get_traffic_recorder
+from services.tracing import span
+
+
+class LocalLLMError(Exception):
+    """Error returned by a local OpenAI-compatible server"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _to_namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: _to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(v) for v in value]
+    return value
+
+
+class LocalOpenAIClient:
+    """Minimal OpenAI-compatible chat client for local stand-in servers (llama.cpp, vLLM, mocks)"""
+
+    def __init__(self, base_url, api_key=None):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_chat_completion))
+
+    def _create_chat_completion(self, messages, model, temperature=None, max_tokens=None, timeout=None, **kwargs):
+        payload = {'model': model, 'messages': messages}
+        if temperature is not None:
+            payload['temperature'] = temperature
+        if max_tokens is not None:
+            payload['max_tokens'] = max_tokens
+        payload.update(kwargs)
+
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+
+        req = urllib.request.Request(
+            f"{self.base_url}/chat/completions",
+            data=json.dumps(payload).encode('utf-8'),
+            headers=headers,
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                return _to_namespace(json.loads(resp.read().decode('utf-8')))
+        except urllib.error.HTTPError as e:
+            raise LocalLLMError(f"Local LLM returned HTTP {e.code}", status_code=e.code) from e
+        except urllib.error.URLError as e:
+            raise LocalLLMError(f"Local LLM unreachable: {e.reason}") from e
+
+
+class ModelEndpoint:
+    """One provider/model pair with its own resilience layer and latency/error history"""
+
+    def __init__(self, provider, model, client, caller, scheduler=None, window=100):
+        self.provider = provider
+        self.model = model
+        self.client = client
+        self.caller = caller
+        self.scheduler = scheduler
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._ewma_latency = None
+
+    @property
+    def name(self):
+        return f"{self.provider}:{self.model}"
+
+    def create(self, cancelled=None, **kwargs):
+        """Call the model; setting `cancelled` stops further attempts and scheduler waits"""
+        estimated = None
+        if self.scheduler:
+            estimated = self.scheduler.estimate_tokens(kwargs.get('messages', []), kwargs.get('max_tokens'))
+        return self.caller.call(self._create_once, estimated, cancelled, cancelled=cancelled,
+                                model=self.model, **kwargs)
+
+    def _create_once(self, estimated, cancelled, **kwargs):
+        """One provider call; every attempt, retries included, takes its own scheduler reservation"""
+        if cancelled is not None and cancelled.is_set():
+            raise CallCancelled(f"{self.name} call cancelled before it was sent")
+        reservation_id = self.scheduler.acquire(estimated, cancelled) if self.scheduler else None
+
+        # The raw-response variant exposes rate-limit headers alongside the parsed completion
+        raw_api = getattr(self.client.chat.completions, 'with_raw_response', None)
+        try:
+            if raw_api is not None:
+                raw = raw_api.create(**kwargs)
+                completion, headers = raw.parse(), raw.headers
+            else:
+                completion = self.client.chat.completions.create(**kwargs)
+                headers = None
+        except Exception as e:
+            if reservation_id:
+                error_headers = getattr(getattr(e, 'response', None), 'headers', None)
+                self.scheduler.settle(reservation_id, headers=error_headers if error_headers is not None else {})
+            raise
+
+        if reservation_id:
+            self.scheduler.settle(reservation_id, usage=getattr(completion, 'usage', None), headers=headers)
+        return completion
+
+    def record(self, latency, success):
+        with self._lock:
+            self._outcomes.append(1 if success else 0)
+            if success:
+                self._latencies.append(latency)
+                if self._ewma_latency is None:
+                    self._ewma_latency = latency
+                else:
+                    self._ewma_latency = 0.8 * self._ewma_latency + 0.2 * latency
+
+    def error_rate(self):
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return 1 - sum(self._outcomes) / len(self._outcomes)
+
+    def latency_percentile(self, percentile):
+        with self._lock:
+            if not self._latencies:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def sample_count(self):
+        with self._lock:
+            return len(self._latencies)
+
+    def score(self):
+        """Lower is better: expected latency inflated by the recent error rate"""
+        with self._lock:
+            latency = self._ewma_latency
+        if latency is None:
+            # Untried endpoints look attractive so they get measured
+            return 0.0
+        return latency * (1 + 4 * self.error_rate())
+
+    def is_available(self):
+        # Includes open breakers due a half-open probe; allow_request() makes the transition
+        return self.caller.breaker.can_attempt()
+
+    def get_state(self):
+        return {
+            'name': self.name,
+            'samples': self.sample_count(),
+            'ewma_latency_seconds': round(self._ewma_latency, 3) if self._ewma_latency is not None else None,
+            'p95_latency_seconds': self.latency_percentile(95),
+            'error_rate': round(self.error_rate(), 3),
+            'resilience': self.caller.get_state(),
+            'token_scheduler': self.scheduler.get_state() if self.scheduler else None
+        }
+
+
+class LLMRouter:
+    """Pick the best model endpoint by observed latency and errors, optionally hedging slow calls"""
+
+    def __init__(self, endpoints, hedge_enabled=False, hedge_percentile=95, hedge_min_samples=20,
+                 explore_probability=0.05, max_workers=None):
+        if not endpoints:
+            raise ValueError("LLMRouter needs at least one model endpoint")
+        if hedge_enabled and len(endpoints) < 2:
+            # A hedge goes to the next best endpoint, so there has to be one
+            print("⚠️ LLM hedging needs at least two endpoints in LLM_MODELS; hedging disabled")
+            hedge_enabled = False
+        self.endpoints = endpoints
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.explore_probability = explore_probability
+        if max_workers is None:
+            # Every admitted generation may have a call and a hedge in flight, all in this worker;
+            # under gevent the executor's threads are greenlets, so a large pool costs little
+            max_workers = max(16, Config.GENERATION_MAX_IN_FLIGHT * 2)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-router')
+        self._hedges_sent = 0
+        self._hedges_won = 0
+
+    def _rank(self, exclude=()):
+        candidates = [e for e in self.endpoints if e not in exclude and e.is_available()]
+        if not candidates:
+            return []
+        ranked = sorted(candidates, key=lambda e: e.score())
+        if len(ranked) > 1 and random.random() < self.explore_probability:
+            # Occasionally try a non-leader so its stats do not go stale
+            ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+        return ranked
+
+    def _attempt(self, endpoint, request_kwargs, validate, cancelled):
+        with span('llm.call', provider=endpoint.provider, model=endpoint.model) as call_span:
+            completion, latency = self._call_endpoint(endpoint, request_kwargs, validate, cancelled)
+            usage = getattr(completion, 'usage', None)
+            if call_span and usage is not None:
+                call_span.set_attribute('llm.prompt_tokens', getattr(usage, 'prompt_tokens', None) or 0)
+                call_span.set_attribute('llm.completion_tokens', getattr(usage, 'completion_tokens', None) or 0)
+
+        recorder = get_traffic_recorder()
+        if recorder and capture_enabled.get():
+            recorder.record_completion(
+                endpoint.model, request_kwargs.get('messages', []), completion.choices[0].message.content, latency,
+                finish_reason=getattr(completion.choices[0], 'finish_reason', None),
+                usage=getattr(completion, 'usage', None)
+            )
+        return completion
+
+    def _call_endpoint(self, endpoint, request_kwargs, validate, cancelled=None):
+        started = time.monotonic()
+        try:
+            completion = endpoint.create(cancelled=cancelled, **request_kwargs)
+            content = completion.choices[0].message.content
+            # A response cut off at max_tokens is the caller's budget, not the endpoint's fault;
+            # callers check finish_reason and continue it rather than retrying elsewhere
+            truncated = getattr(completion.choices[0], 'finish_reason', None) == 'length'
+            if validate and not truncated and not validate(content):
+                raise ValueError(f"{endpoint.name} returned a response that failed validation")
+        except (CircuitOpenError, CallCancelled):
+            raise
+        except Exception:
+            endpoint.record(time.monotonic() - started, success=False)
+            raise
+        latency = time.monotonic() - started
+        endpoint.record(latency, success=True)
+        return completion, latency
+
+    def _submit(self, endpoint, request_kwargs, validate):
+        """Start a call; returns (future, event that cancels it)"""
+        cancelled = threading.Event()
+        # Run in a copy of the caller's context so per-request context vars follow the call
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, self._attempt, endpoint, request_kwargs, validate, cancelled)
+        return future, cancelled
+
+    @staticmethod
+    def _cancel(pending):
+        """Stop calls that lost a hedge: queued ones never start, running ones skip retries and
+        scheduler waits. A request already sent cannot be recalled; its real usage is settled."""
+        for future, (_, cancelled) in pending.items():
+            cancelled.set()
+            future.cancel()
+
+    def _hedge_delay(self, endpoint):
+        if not self.hedge_enabled or endpoint.sample_count() < self.hedge_min_samples:
+            return None
+        return endpoint.latency_percentile(self.hedge_percentile)
+
+    def complete(self, validate=None, **request_kwargs):
+        """Return (completion, endpoint) from the first endpoint whose answer passes validate"""
+        ranked = self._rank()
+        if not ranked:
+            raise CircuitOpenError('All LLM endpoints have open circuit breakers')
+
+        primary = ranked[0]
+        pending = {}
+        future, cancelled = self._submit(primary, request_kwargs, validate)
+        pending[future] = (primary, cancelled)
+        hedge_delay = self._hedge_delay(primary)
+        fallbacks = ranked[1:]
+        last_error = None
+
+        done, _ = wait(pending, timeout=hedge_delay, return_when=FIRST_COMPLETED)
+        if not done and fallbacks:
+            hedge = fallbacks.pop(0)
+            print(f"⏱️ {primary.name} slower than p{self.hedge_percentile} ({hedge_delay:.2f}s), hedging with {hedge.name}")
+            self._hedges_sent += 1
+            future, cancelled = self._submit(hedge, request_kwargs, validate)
+            pending[future] = (hedge, cancelled)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                endpoint, _ = pending.pop(future)
+                try:
+                    completion = future.result()
+                except Exception as e:
+                    print(f"⚠️ {endpoint.name} failed: {str(e)}")
+                    last_error = e
+                    continue
+                if endpoint is not primary:
+                    self._hedges_won += 1
+                self._cancel(pending)
+                return completion, endpoint
+
+            if not pending and fallbacks:
+                # Everything in flight failed, fall through to the next best endpoint
+                endpoint = fallbacks.pop(0)
+                future, cancelled = self._submit(endpoint, request_kwargs, validate)
+                pending[future] = (endpoint, cancelled)
+
+        raise last_error
+
+    def get_state(self):
+        return {
+            'hedge_enabled': self.hedge_enabled,
+            'hedge_percentile': self.hedge_percentile,
+            'hedges_sent': self._hedges_sent,
+            'hedges_won': self._hedges_won,
+            'endpoints': [e.get_state() for e in self.endpoints]
+        }
+
+
+def _build_caller():
+    return ResilientCaller(
+        breaker=CircuitBreaker(
+            failure_threshold=Config.GROQ_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=Config.GROQ_BREAKER_RECOVERY_SECONDS
+        ),
+        retry_budget=RetryBudget(
+            ratio=Config.GROQ_RETRY_BUDGET_RATIO,
+            min_retries=Config.GROQ_RETRY_BUDGET_MIN_RETRIES,
+            window_seconds=Config.GROQ_RETRY_BUDGET_WINDOW_SECONDS
+        ),
+        timeout=Config.GROQ_TIMEOUT_SECONDS,
+        max_retries=Config.GROQ_MAX_RETRIES,
+        base_delay=Config.GROQ_RETRY_BASE_DELAY,
+        max_delay=Config.GROQ_RETRY_MAX_DELAY
+    )
+
+
+def build_router_from_config():
+    """Create endpoints for every entry in Config.LLM_MODELS ("provider:model", comma separated)"""
+    clients = {}
+    endpoints = []
+
+    for entry in Config.LLM_MODELS.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        provider, _, model = entry.partition(':')
+        if not model:
+            provider, model = 'groq', provider
+
+        if provider not in clients:
+            if provider == 'groq':
+                from groq import Groq
+                # Retries are handled by ResilientCaller, so the SDK's own retry loop is disabled
+                clients[provider] = Groq(api_key=Config.GROQ_API_KEY, max_retries=0)
+            elif provider == 'local':
+                clients[provider] = LocalOpenAIClient(Config.LOCAL_LLM_BASE_URL, Config.LOCAL_LLM_API_KEY)
+            else:
+                raise ValueError(f"Unknown LLM provider: {provider}")
+
+        scheduler = None
+        if provider == 'groq' and Config.GROQ_SCHEDULER_ENABLED:
+            # Groq enforces its RPM/TPM limits per model
+            scheduler = TokenScheduler(
+                get_shared_store(),
+                f"groq:{model}",
+                tokens_per_minute=Config.GROQ_TOKENS_PER_MINUTE,
+                requests_per_minute=Config.GROQ_REQUESTS_PER_MINUTE,
+                headroom=Config.GROQ_SCHEDULER_HEADROOM,
+                max_wait=Config.GROQ_SCHEDULER_MAX_WAIT_SECONDS
+            )
+
+        endpoints.append(ModelEndpoint(provider, model, clients[provider], _build_caller(), scheduler))
+
+    return LLMRouter(
+        endpoints,
+        hedge_enabled=Config.LLM_HEDGE_ENABLED,
+        hedge_percentile=Config.LLM_HEDGE_PERCENTILE,
+        hedge_min_samples=Config.LLM_HEDGE_MIN_SAMPLES
+    )
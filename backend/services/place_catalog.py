@@ -0,0 +1,44 @@
+import hashlib
+import re
+import unicodedata
+
+
+def normalize_place_text(text):
+    """Case, accent, punctuation and spacing-insensitive form of a place name or location"""
+    text = unicodedata.normalize('NFKD', str(text or '')).encode('ascii', 'ignore').decode('ascii')
+    text = re.sub(r'[^a-z0-9]+', ' ', text.lower())
+    return text.strip()
+
+
+def place_key(canonical_destination, kind, name, location):
+    """Stable key for a place, so the same landmark or restaurant maps to one catalog row"""
+    raw = '\x1f'.join((canonical_destination, normalize_place_text(kind), normalize_place_text(name),
+                        normalize_place_text(location)))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def build_place(canonical_destination, kind, name, location):
+    """Return (place_key, row) for storing a place in the places table.
+
+    Only what identifies the place goes in the catalog. Descriptions and tips differ from
+    one itinerary to the next, so they stay on the itinerary's own items.
+    """
+    key = place_key(canonical_destination, kind, name, location)
+    return key, {
+        'place_key': key,
+        'canonical_destination': canonical_destination,
+        'kind': kind,
+        'name': name,
+        'location': location
+    }
+
+
+def merge_place(item):
+    """Fold an embedded places row into an itinerary_items row, giving it the pre-catalog item shape"""
+    place = item.pop('places', None)
+    if place:
+        # Only the place fields that were selected; items saved before the catalog keep their own
+        for field, value in place.items():
+            if item.get(field) is None:
+                item[field] = value
+    return item
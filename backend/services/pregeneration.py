@@ -0,0 +1,194 @@
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from contextvars import copy_context
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from services.aiservice import generation_source
+from services.itinerary_cache import budget_band
+
+
+def parse_hours(spec):
+    """'1-6' -> (1, 6); the window runs from the start hour up to (not including) the end hour"""
+    start, end = (int(part) for part in spec.split('-'))
+    if not (0 <= start < 24 and 0 <= end < 24) or start == end:
+        raise ValueError(f"Invalid off-peak hours: {spec}")
+    return start, end
+
+
+class PregenerationScheduler:
+    """Generate the most requested trips during off-peak hours so peak traffic is served from the cache.
+
+    Popular trips are mined from recent itineraries, grouped the way the generation cache
+    matches them (canonical destination, length, budget band, vegetarian). Every gunicorn
+    worker runs the scheduler thread; a shared-store lock lets only one of them generate, and
+    Groq tokens spent in a window are counted in the shared store against token_budget.
+    Each trip is charged its worst case before it runs (the first call and every continuation
+    a truncated response may need, each at prompt plus max_tokens), so the window's own calls
+    stay within the budget; retried or hedged calls are not counted.
+    """
+
+    def __init__(self, ai_service, db_service, store, off_peak_hours='1-6', timezone='Asia/Kolkata',
+                 token_budget=200000, top_n=25, min_requests=3, lookback_days=30,
+                 check_interval=300, pace_seconds=5.0):
+        self.ai_service = ai_service
+        self.db_service = db_service
+        self.store = store
+        self.cache = ai_service.cache
+        self.start_hour, self.end_hour = parse_hours(off_peak_hours)
+        self.timezone = ZoneInfo(timezone)
+        self.token_budget = token_budget
+        self.top_n = top_n
+        self.min_requests = min_requests
+        self.lookback_days = lookback_days
+        self.check_interval = check_interval
+        self.pace_seconds = pace_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _now(self):
+        return datetime.now(self.timezone)
+
+    def in_off_peak(self, now=None):
+        hour = (now or self._now()).hour
+        if self.start_hour < self.end_hour:
+            return self.start_hour <= hour < self.end_hour
+        return hour >= self.start_hour or hour < self.end_hour
+
+    def window_id(self, now=None):
+        """Date the current (or most recent) off-peak window started on"""
+        return ((now or self._now()) - timedelta(hours=self.start_hour)).date().isoformat()
+
+    def popular_trips(self):
+        """The top_n most requested trip kinds, most requested first, each as a generation request"""
+        since = (self._now() - timedelta(days=self.lookback_days)).isoformat()
+        counts = Counter()
+        spellings = {}
+        budgets = {}
+        for row in self.db_service.iter_trip_requests(since):
+            try:
+                duration = (datetime.strptime(row['end_date'], '%Y-%m-%d') -
+                            datetime.strptime(row['start_date'], '%Y-%m-%d')).days + 1
+            except (TypeError, ValueError):
+                continue
+            if duration <= 0 or not row.get('destination') or not row.get('budget'):
+                continue
+            canonical = self.cache.canonicalizer.canonicalize(row['destination'])
+            key = (canonical, duration, budget_band(row['budget'], duration), bool(row.get('is_vegetarian')))
+            counts[key] += 1
+            spellings.setdefault(key, Counter())[row['destination'].strip()] += 1
+            budgets.setdefault(key, []).append(float(row['budget']))
+
+        start_date = self._now().date() + timedelta(days=1)
+        trips = []
+        for key, count in counts.most_common(self.top_n):
+            if count < self.min_requests:
+                break
+            _, duration, _, is_vegetarian = key
+            trips.append(({
+                # The spelling users type most, and the typical budget so cache hits re-budget little
+                'destination': spellings[key].most_common(1)[0][0],
+                'start_date': start_date.isoformat(),
+                'end_date': (start_date + timedelta(days=duration - 1)).isoformat(),
+                'budget': str(int(statistics.median(budgets[key]))),
+                'isVegetarian': is_vegetarian
+            }, duration, count))
+        return trips
+
+    def run_once(self, force=False):
+        """Pre-generate popular trips missing from the cache; returns a summary of the run, or None if busy"""
+        window = self.window_id()
+        lock_ttl = 24 * 3600 if force else self._seconds_left_in_window()
+        if not self.store.add('pregen:lock', {'pid': os.getpid()}, ttl=max(60, lock_ttl)):
+            return None
+
+        spent_key = f"pregen:spent:{window}"
+        summary = {'window': window, 'started_at': time.time(), 'generated': 0, 'partial': 0,
+                   'already_cached': 0, 'over_budget': 0, 'candidates': 0, 'stopped': None}
+        try:
+            trips = self.popular_trips()
+            summary['candidates'] = len(trips)
+            print(f"🌙 Pre-generation: {len(trips)} popular trips, window {window}")
+            for request_data, duration, count in trips:
+                if not force and not self.in_off_peak():
+                    summary['stopped'] = 'off-peak window ended'
+                    break
+                # Entries expiring before the next window are regenerated now
+                if self.cache.covers(request_data['destination'], duration, request_data['budget'],
+                                     request_data['isVegetarian'], valid_for=24 * 3600):
+                    summary['already_cached'] += 1
+                    continue
+                estimate = self.ai_service.estimate_tokens(request_data)
+                spent = self.store.get(spent_key, 0)
+                if spent + estimate > self.token_budget:
+                    # A shorter trip further down the list may still fit
+                    summary['over_budget'] += 1
+                    continue
+                self.store.set(spent_key, spent + estimate, ttl=2 * 24 * 3600)
+
+                source = copy_context().run(self._generate, request_data)
+                print(f"🌙 {request_data['destination']} {duration}d ({count} requests): {source}")
+                if source == 'fallback':
+                    # Groq is failing; leave the window open so the next check tries again
+                    summary['stopped'] = 'generation failed'
+                    break
+                # A partial itinerary was not cached; the next window tries it again
+                summary['partial' if source == 'partial' else 'generated'] += 1
+                if self._stop.wait(self.pace_seconds):
+                    summary['stopped'] = 'shutting down'
+                    break
+            else:
+                self.store.set(f"pregen:done:{window}", True, ttl=2 * 24 * 3600)
+        finally:
+            summary['tokens_spent'] = self.store.get(spent_key, 0)
+            summary['finished_at'] = time.time()
+            self.store.set('pregen:last_run', summary)
+            self.store.delete('pregen:lock')
+        print(f"🌙 Pre-generation finished: {summary}")
+        return summary
+
+    def _generate(self, request_data):
+        # Skip the cache lookup: entries about to expire are being refreshed
+        self.ai_service.generate_itinerary(request_data, use_cache=False)
+        return generation_source.get()
+
+    def _seconds_left_in_window(self):
+        now = self._now()
+        end = now.replace(hour=self.end_hour, minute=0, second=0, microsecond=0)
+        if end <= now:
+            end += timedelta(days=1)
+        return (end - now).total_seconds()
+
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            if not self.in_off_peak() or self.store.get(f"pregen:done:{self.window_id()}"):
+                continue
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠️ Pre-generation run failed: {str(e)}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='pregeneration', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def get_state(self):
+        window = self.window_id()
+        return {
+            'off_peak_hours': f"{self.start_hour}-{self.end_hour}",
+            'timezone': str(self.timezone),
+            'in_off_peak': self.in_off_peak(),
+            'window': window,
+            'window_done': bool(self.store.get(f"pregen:done:{window}")),
+            'token_budget': self.token_budget,
+            'tokens_spent': self.store.get(f"pregen:spent:{window}", 0),
+            'last_run': self.store.get('pregen:last_run')
+        }
@@ -0,0 +1,250 @@
+import cProfile
+import hmac
+import importlib
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+PROFILE_MODES = ('sampling', 'deterministic')
+
+
+def _original(module, name):
+    """module.name as it was before gevent monkey patching (itself when nothing is patched)"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return getattr(importlib.import_module(module), name)
+    return monkey.get_original(module, name)
+
+
+def _current_greenlet():
+    """The running greenlet when gevent has patched threading, else None"""
+    try:
+        from gevent import getcurrent, monkey
+    except ImportError:
+        return None
+    return getcurrent() if monkey.is_module_patched('threading') else None
+
+
+class SamplingProfiler:
+    """Sample one thread's Python stack at a fixed interval into collapsed-stack counts.
+
+    Output is the "folded" format read by flamegraph.pl, speedscope and inferno:
+    one line per distinct stack, frames root-first separated by ';', then a count.
+    The sampler always runs on a real OS thread, so it keeps sampling under gevent.
+    Given the request's greenlet, it samples that greenlet: its suspended stack
+    while it waits, the OS thread's stack while it runs.
+    """
+
+    def __init__(self, thread_id, interval=0.005, greenlet=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.greenlet = greenlet
+        self.samples = Counter()
+        self._stopped = False
+        self._done = None
+
+    @staticmethod
+    def _frame_label(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _current_frame(self):
+        if self.greenlet is not None:
+            # gr_frame is only set while the greenlet is switched out
+            frame = self.greenlet.gr_frame
+            if frame is not None:
+                return frame
+        return sys._current_frames().get(self.thread_id)
+
+    def _run(self):
+        sleep = _original('time', 'sleep')
+        try:
+            while not self._stopped:
+                sleep(self.interval)
+                frame = self._current_frame()
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    self.samples[';'.join(reversed(stack))] += 1
+        finally:
+            self._done.release()
+
+    def start(self):
+        # gevent patches threading into greenlets, which would only sample when the request yields
+        self._done = _original('_thread', 'allocate_lock')()
+        self._done.acquire()
+        _original('_thread', 'start_new_thread')(self._run, ())
+
+    def stop(self):
+        self._stopped = True
+        if self._done:
+            self._done.acquire()
+            self._done.release()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfile:
+    """One profiled request; stop() writes the profile and returns its file name"""
+
+    def __init__(self, directory, mode, interval, label):
+        self.directory = directory
+        self.mode = mode
+        self.label = label
+        self.started = time.time()
+        if mode == 'deterministic':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = SamplingProfiler(_original('_thread', 'get_ident')(), interval,
+                                              greenlet=_current_greenlet())
+            self._profiler.start()
+
+    def stop(self, status=None):
+        elapsed_ms = int((time.time() - self.started) * 1000)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started))
+        name = f"{stamp}-{os.getpid()}-{self.label}-{status or 'na'}-{elapsed_ms}ms"
+        if self.mode == 'deterministic':
+            self._profiler.disable()
+            # Render with snakeviz/flameprof, or `python -m pstats`
+            name += '.pstats'
+            self._profiler.dump_stats(os.path.join(self.directory, name))
+        else:
+            self._profiler.stop()
+            name += '.collapsed'
+            self._profiler.write(os.path.join(self.directory, name))
+        return name
+
+
+class ProfilingHooks:
+    """Decide which requests to profile: an admin token header, or a random sample"""
+
+    def __init__(self, directory, admin_token=None, sample_rate=0.0, mode='sampling', interval=0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.directory = directory
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.interval = interval
+        self.profiled = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def is_admin(self, headers):
+        token = headers.get('X-Profile-Token')
+        return bool(self.admin_token and token and hmac.compare_digest(token, self.admin_token))
+
+    def start(self, method, path, headers):
+        """Start profiling this request if asked to (or sampled); returns a RequestProfile or None"""
+        requested = self.is_admin(headers)
+        if not requested and not (self.sample_rate > 0 and random.random() < self.sample_rate):
+            return None
+        mode = headers.get('X-Profile-Mode', self.mode) if requested else self.mode
+        if mode not in PROFILE_MODES:
+            mode = self.mode
+        label = re.sub(r'[^A-Za-z0-9]+', '_', f"{method}{path}").strip('_')[:80]
+        self.profiled += 1
+        return RequestProfile(self.directory, mode, self.interval, label)
+
+    def list_profiles(self, limit=50):
+        names = sorted(os.listdir(self.directory), reverse=True)
+        return [
+            {'name': n, 'bytes': os.path.getsize(os.path.join(self.directory, n))}
+            for n in names[:limit]
+        ]
+
+
+class MemoryTracker:
+    """tracemalloc snapshots for a worker, diffed against the previous snapshot"""
+
+    def __init__(self, frames=25):
+        self.frames = frames
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def snapshot(self, limit=25, group_by='lineno', compare=True):
+        """Top allocation sites now, plus the biggest growth since the last call"""
+        if group_by not in ('lineno', 'filename', 'traceback'):
+            raise ValueError(f"Unknown grouping: {group_by}")
+        started_now = not tracemalloc.is_tracing()
+        self.start()
+        with self._lock:
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            ))
+            previous, self._previous = self._previous, snapshot
+
+        def describe(stat, size_diff=None, count_diff=None):
+            entry = {
+                'size_bytes': stat.size,
+                'count': stat.count,
+                'traceback': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+            }
+            if size_diff is not None:
+                entry['size_diff_bytes'] = size_diff
+                entry['count_diff'] = count_diff
+            return entry
+
+        current, peak = tracemalloc.get_traced_memory()
+        result = {
+            'pid': os.getpid(),
+            'tracing_started_now': started_now,
+            'traced_bytes': current,
+            'peak_traced_bytes': peak,
+            'top': [describe(s) for s in snapshot.statistics(group_by)[:limit]]
+        }
+        if compare and previous is not None:
+            result['growth'] = [
+                describe(s, s.size_diff, s.count_diff)
+                for s in snapshot.compare_to(previous, group_by)[:limit]
+                if s.size_diff > 0
+            ]
+        return result
+
+
+_hooks = None
+_memory_tracker = None
+_lock = threading.Lock()
+
+
+def get_profiling_hooks():
+    """Process-wide hooks, or None when neither an admin token nor a sample rate is configured"""
+    global _hooks
+    from config import Config
+    if not Config.PROFILING_ADMIN_TOKEN and Config.PROFILING_SAMPLE_RATE <= 0:
+        return None
+    with _lock:
+        if _hooks is None:
+            _hooks = ProfilingHooks(
+                Config.PROFILING_DIR,
+                admin_token=Config.PROFILING_ADMIN_TOKEN,
+                sample_rate=Config.PROFILING_SAMPLE_RATE,
+                mode=Config.PROFILING_MODE,
+                interval=Config.PROFILING_INTERVAL_SECONDS
+            )
+        return _hooks
+
+
+def get_memory_tracker():
+    global _memory_tracker
+    from config import Config
+    with _lock:
+        if _memory_tracker is None:
+            _memory_tracker = MemoryTracker(Config.TRACEMALLOC_FRAMES)
+        return _memory_tracker
@@ -0,0 +1,58 @@
+import re
+
+FIELD_NAME = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+
+def _split_top_level(spec):
+    parts, depth, current = [], 0, []
+    for char in spec:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth < 0:
+                raise ValueError('Unbalanced parentheses in fields')
+        if char == ',' and depth == 0:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    if depth:
+        raise ValueError('Unbalanced parentheses in fields')
+    parts.append(''.join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def parse_fields(spec, allowed, nested=None):
+    """Parse ?fields=id,title,items(title,cost) into {'id': None, 'title': None, 'items': ['title', 'cost']}.
+
+    `allowed` are the plain field names, `nested` maps each field that takes a
+    sub-selection to its allowed names; `items` alone selects every nested field.
+    Raises ValueError naming the first unknown or malformed field.
+    """
+    nested = nested or {}
+    fields = {}
+    for part in _split_top_level(spec):
+        name, paren, rest = part.partition('(')
+        name = name.strip()
+        if not FIELD_NAME.match(name):
+            raise ValueError(f"Invalid field: {part}")
+        if name in nested:
+            sub_fields = None
+            if paren:
+                if not rest.rstrip().endswith(')'):
+                    raise ValueError(f"Invalid field: {part}")
+                sub_fields = [f.strip() for f in rest.rstrip()[:-1].split(',') if f.strip()]
+                unknown = [f for f in sub_fields if f not in nested[name]]
+                if not sub_fields or unknown:
+                    raise ValueError(f"Unknown {name} field: {unknown[0] if unknown else part}")
+            fields[name] = sub_fields or list(nested[name])
+        elif paren:
+            raise ValueError(f"Field {name} has no sub-fields")
+        elif name not in allowed:
+            raise ValueError(f"Unknown field: {name}")
+        else:
+            fields[name] = None
+    if not fields:
+        raise ValueError('No fields requested')
+    return fields
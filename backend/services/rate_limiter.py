@@ -0,0 +1,183 @@
+import math
+import random
+import threading
+import time
+import uuid
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of queued"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """Token bucket per key, stored in the shared store so all workers draw from one bucket"""
+
+    def __init__(self, store, namespace, capacity, refill_per_second):
+        self.store = store
+        self.namespace = namespace
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        store.ensure_schema("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def consume(self, key, tokens=1):
+        """Take tokens from key's bucket; returns (allowed, retry_after_seconds)"""
+        bucket_key = f"{self.namespace}:{key}"
+        now = time.time()
+
+        with self.store.transaction() as conn:
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM rate_buckets WHERE key = ?', (bucket_key,)
+            ).fetchone()
+            available = self.capacity
+            if row is not None:
+                available = min(self.capacity, row[0] + (now - row[1]) * self.refill_per_second)
+
+            if available >= tokens:
+                available -= tokens
+                allowed, retry_after = True, 0
+            else:
+                allowed = False
+                retry_after = (tokens - available) / self.refill_per_second if self.refill_per_second else 60
+
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                (bucket_key, available, now)
+            )
+
+        return allowed, retry_after
+
+
+class AdmissionController:
+    """Global cap on in-flight generations across workers, shedding load when the queue is too long"""
+
+    AVG_DURATION_KEY = 'admission:avg_duration'
+
+    def __init__(self, store, max_in_flight, max_queue_seconds, slot_ttl=300,
+                 default_duration=10.0, poll_interval=0.1, max_poll_interval=1.0):
+        self.store = store
+        self.max_in_flight = max_in_flight
+        self.max_queue_seconds = max_queue_seconds
+        self.slot_ttl = slot_ttl
+        self.default_duration = default_duration
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._shed = 0
+        # Waiters in this worker wake as soon as one of its slots is released
+        self._released = threading.Condition()
+        store.ensure_schema(
+            """
+            CREATE TABLE IF NOT EXISTS admission_slots (
+                id TEXT PRIMARY KEY,
+                started_at REAL NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS admission_waiters (
+                id TEXT PRIMARY KEY,
+                enqueued_at REAL NOT NULL
+            )
+            """
+        )
+
+    def _average_duration(self):
+        return self.store.get(self.AVG_DURATION_KEY, self.default_duration)
+
+    def _reject(self, waiter_id, message, retry_after):
+        self.store.execute('DELETE FROM admission_waiters WHERE id = ?', (waiter_id,))
+        self._shed += 1
+        raise AdmissionRejected(message, max(1, math.ceil(retry_after)))
+
+    def _position(self, now, waiter_id, enqueued_at):
+        """(in_flight, waiters ahead) from plain reads; slots and waiters past their TTL do not count"""
+        in_flight = self.store.execute(
+            'SELECT COUNT(*) FROM admission_slots WHERE started_at >= ?', (now - self.slot_ttl,)
+        ).fetchone()[0]
+        ahead = self.store.execute(
+            """
+            SELECT COUNT(*) FROM admission_waiters
+            WHERE enqueued_at >= ? AND (enqueued_at < ? OR (enqueued_at = ? AND id < ?))
+            """,
+            (now - self.max_queue_seconds - self.slot_ttl, enqueued_at, enqueued_at, waiter_id)
+        ).fetchone()[0]
+        return in_flight, ahead
+
+    def _try_claim(self, now, waiter_id, enqueued_at):
+        """Take a slot in a write transaction if one is still free for this waiter"""
+        with self.store.transaction() as conn:
+            # Slots and waiters left behind by crashed workers expire
+            conn.execute('DELETE FROM admission_slots WHERE started_at < ?', (now - self.slot_ttl,))
+            conn.execute(
+                'DELETE FROM admission_waiters WHERE enqueued_at < ?',
+                (now - self.max_queue_seconds - self.slot_ttl,)
+            )
+            in_flight = conn.execute('SELECT COUNT(*) FROM admission_slots').fetchone()[0]
+            ahead = conn.execute(
+                'SELECT COUNT(*) FROM admission_waiters WHERE enqueued_at < ? OR (enqueued_at = ? AND id < ?)',
+                (enqueued_at, enqueued_at, waiter_id)
+            ).fetchone()[0]
+            if in_flight < self.max_in_flight and ahead < self.max_in_flight - in_flight:
+                conn.execute('DELETE FROM admission_waiters WHERE id = ?', (waiter_id,))
+                conn.execute('INSERT INTO admission_slots (id, started_at) VALUES (?, ?)', (waiter_id, now))
+                return True
+        return False
+
+    def acquire(self):
+        """Wait for an in-flight slot and return its id, or raise AdmissionRejected.
+
+        Waiting only reads the store; the write lock is taken when a slot looks free. Between
+        checks a waiter backs off with jitter, and wakes early when this worker frees a slot.
+        """
+        waiter_id = str(uuid.uuid4())
+        enqueued_at = time.time()
+        deadline = enqueued_at + self.max_queue_seconds
+        self.store.execute(
+            'INSERT INTO admission_waiters (id, enqueued_at) VALUES (?, ?)', (waiter_id, enqueued_at)
+        )
+
+        delay = self.poll_interval
+        while True:
+            now = time.time()
+            in_flight, ahead = self._position(now, waiter_id, enqueued_at)
+            if in_flight < self.max_in_flight and ahead < self.max_in_flight - in_flight:
+                if self._try_claim(now, waiter_id, enqueued_at):
+                    return waiter_id
+
+            # Each full round of in-flight generations lets max_in_flight waiters through
+            rounds = (ahead // self.max_in_flight) + 1
+            expected_wait = rounds * self._average_duration()
+            if now + expected_wait > deadline:
+                self._reject(waiter_id, 'Generation queue is full', expected_wait)
+
+            with self._released:
+                self._released.wait(random.uniform(delay / 2, delay))
+            delay = min(delay * 2, self.max_poll_interval)
+
+    def release(self, slot_id, duration=None):
+        self.store.execute('DELETE FROM admission_slots WHERE id = ?', (slot_id,))
+        if duration is not None:
+            average = self._average_duration()
+            self.store.set(self.AVG_DURATION_KEY, 0.8 * average + 0.2 * duration)
+        with self._released:
+            self._released.notify_all()
+
+    def get_state(self):
+        in_flight = self.store.execute('SELECT COUNT(*) FROM admission_slots').fetchone()[0]
+        waiting = self.store.execute('SELECT COUNT(*) FROM admission_waiters').fetchone()[0]
+        return {
+            'max_in_flight': self.max_in_flight,
+            'in_flight': in_flight,
+            'waiting': waiting,
+            'max_queue_seconds': self.max_queue_seconds,
+            'average_generation_seconds': round(self._average_duration(), 2),
+            'shed_by_this_worker': self._shed
+        }
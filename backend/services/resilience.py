@@ -0,0 +1,280 @@
+import random
+import socket
+import sys
+import threading
+import time
+import urllib.error
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker rejects a call without trying the provider"""
+
+
+class CallNotAttempted(Exception):
+    """Raised by a call wrapper that gave up before contacting the provider (says nothing about its health)"""
+
+
+class CallCancelled(CallNotAttempted):
+    """Raised when the caller stopped wanting the result, e.g. a hedged request that lost"""
+
+
+class CircuitBreaker:
+    """Track recent provider failures and fail fast while the provider is unhealthy"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0, half_open_max_calls=1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._half_open_calls = 0
+        self._total_failures = 0
+        self._total_rejections = 0
+
+    def allow_request(self):
+        """Return True if a call may go to the provider right now"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at >= self.recovery_timeout:
+                    self._state = self.HALF_OPEN
+                    self._half_open_calls = 0
+                else:
+                    self._total_rejections += 1
+                    return False
+
+            if self._state == self.HALF_OPEN:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    self._total_rejections += 1
+                    return False
+                self._half_open_calls += 1
+
+            return True
+
+    def can_attempt(self):
+        """Whether allow_request() would let a call through now, without changing state.
+
+        An open breaker whose recovery_timeout has passed counts as available: the next
+        allow_request() moves it to half-open and lets the probe call through.
+        """
+        with self._lock:
+            if self._state == self.OPEN:
+                return time.monotonic() - self._opened_at >= self.recovery_timeout
+            if self._state == self.HALF_OPEN:
+                return self._half_open_calls < self.half_open_max_calls
+            return True
+
+    def cancel_request(self):
+        """Give back a slot taken by allow_request() for a call that never reached the provider"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._half_open_calls = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            self._total_failures += 1
+            if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def get_state(self):
+        with self._lock:
+            retry_in = None
+            if self._state == self.OPEN:
+                retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+            return {
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'total_failures': self._total_failures,
+                'total_rejections': self._total_rejections,
+                'retry_in_seconds': round(retry_in, 2) if retry_in is not None else None
+            }
+
+
+class RetryBudget:
+    """Cap retries to a fraction of recent requests so retries cannot amplify an outage"""
+
+    def __init__(self, ratio=0.2, min_retries=3, window_seconds=60.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._requests = deque()
+        self._retries = deque()
+        self._denied = 0
+
+    def _prune(self, now):
+        cutoff = now - self.window_seconds
+        while self._requests and self._requests[0] < cutoff:
+            self._requests.popleft()
+        while self._retries and self._retries[0] < cutoff:
+            self._retries.popleft()
+
+    def _allowed(self):
+        return max(self.min_retries, int(len(self._requests) * self.ratio))
+
+    def record_request(self):
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            self._requests.append(now)
+
+    def try_acquire_retry(self):
+        """Reserve one retry from the budget, returning False if it is spent"""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            if len(self._retries) >= self._allowed():
+                self._denied += 1
+                return False
+            self._retries.append(now)
+            return True
+
+    def get_state(self):
+        with self._lock:
+            self._prune(time.monotonic())
+            return {
+                'window_seconds': self.window_seconds,
+                'requests_in_window': len(self._requests),
+                'retries_in_window': len(self._retries),
+                'retries_allowed': self._allowed(),
+                'retries_denied': self._denied
+            }
+
+
+def _transport_errors():
+    """Exception types meaning the provider could not be reached or did not answer in time"""
+    errors = [TimeoutError, ConnectionError, socket.timeout, urllib.error.URLError]
+    # SDK errors only once the SDK is loaded (nothing else raises them); importing it here
+    # would pull httpx into workers that never call Groq
+    groq = sys.modules.get('groq')
+    if groq is not None:
+        errors.append(groq.APIConnectionError)  # APITimeoutError included
+    httpx = sys.modules.get('httpx')
+    if httpx is not None:
+        errors.append(httpx.TransportError)
+    return tuple(errors)
+
+
+def error_status_code(error):
+    """HTTP status of a provider error response, or None when there was no response"""
+    status_code = getattr(error, 'status_code', None)
+    if status_code is None:
+        status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status_code
+
+
+def is_transport_error(error):
+    """The provider was unreachable or timed out; wrapped errors are judged by their cause"""
+    errors = _transport_errors()
+    return isinstance(error, errors) or isinstance(error.__cause__, errors)
+
+
+def is_retryable_error(error):
+    """Timeouts, connection errors, rate limits and 5xx responses are worth retrying"""
+    status_code = error_status_code(error)
+    if status_code is None:
+        return is_transport_error(error)
+    return status_code == 429 or status_code >= 500
+
+
+def retry_after_seconds(error):
+    """Seconds the provider asked us to wait, from a Retry-After header on the error response"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class ResilientCaller:
+    """Run provider calls with a per-call timeout, jittered retries and a circuit breaker"""
+
+    def __init__(self, breaker, retry_budget, timeout=30.0, max_retries=2,
+                 base_delay=0.5, max_delay=4.0):
+        self.breaker = breaker
+        self.retry_budget = retry_budget
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def call(self, func, *args, cancelled=None, **kwargs):
+        """Call func(*args, timeout=..., **kwargs), raising CircuitOpenError when failing fast.
+
+        Once the optional `cancelled` event is set no further attempt is made.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError('Groq circuit breaker is open')
+
+        self.retry_budget.record_request()
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+
+        while True:
+            try:
+                result = func(*args, **kwargs)
+                self.breaker.record_success()
+                return result
+            except CallNotAttempted:
+                self.breaker.cancel_request()
+                raise
+            except Exception as e:
+                if not is_retryable_error(e):
+                    if error_status_code(e) is not None:
+                        # The provider answered; client errors say nothing about its health
+                        self.breaker.record_success()
+                    else:
+                        # A bug on our side, not a provider failure: no retry, no breaker trip
+                        self.breaker.cancel_request()
+                    raise
+
+                self.breaker.record_failure()
+
+                if attempt >= self.max_retries or not self.retry_budget.try_acquire_retry():
+                    raise
+
+                if cancelled is not None and cancelled.is_set():
+                    raise CallCancelled('Call cancelled before retrying') from e
+
+                if not self.breaker.allow_request():
+                    raise CircuitOpenError('Groq circuit breaker opened during retries') from e
+
+                # Full jitter keeps many workers from retrying in lockstep
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                retry_after = retry_after_seconds(e)
+                if retry_after is not None:
+                    if retry_after > self.max_delay:
+                        raise
+                    delay = max(delay, retry_after)
+                attempt += 1
+                print(f"🔁 Groq call failed ({e}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                if cancelled is not None:
+                    cancelled.wait(delay)
+                else:
+                    time.sleep(delay)
+
+    def get_state(self):
+        return {
+            'timeout_seconds': self.timeout,
+            'max_retries': self.max_retries,
+            'circuit_breaker': self.breaker.get_state(),
+            'retry_budget': self.retry_budget.get_state()
+        }
@@ -0,0 +1,146 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _gevent_patched():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+class SharedStore:
+    """SQLite-backed store shared by every gunicorn worker on the same machine.
+
+    Under gevent, SQLite's busy handler would sleep inside the C call and stall every
+    greenlet in the worker, so a locked database is retried with a cooperative sleep
+    instead. Connections are kept per OS thread, not per greenlet, and a greenlet-aware
+    lock keeps each one used by a single greenlet at a time.
+    """
+
+    BUSY_TIMEOUT = 10
+
+    def __init__(self, path):
+        self.path = path
+        self.cooperative = _gevent_patched()
+        if self.cooperative:
+            from gevent import monkey
+            self._local = monkey.get_original('threading', 'local')()
+        else:
+            self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ensure_schema("""
+            CREATE TABLE IF NOT EXISTS kv (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL
+            )
+        """)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode so transaction() controls locking explicitly; under gevent a
+            # locked database fails fast and _run_busy waits cooperatively
+            timeout = 0 if self.cooperative else self.BUSY_TIMEOUT
+            conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+            self._local.conn = conn
+            self._local.lock = threading.RLock()
+            self._run_busy(self._local.lock, lambda: conn.execute('PRAGMA journal_mode=WAL'))
+            conn.execute('PRAGMA synchronous=NORMAL')
+        return conn, self._local.lock
+
+    def _run_busy(self, lock, operation):
+        """Run operation under lock, retrying with a cooperative sleep while the database is locked"""
+        if not self.cooperative:
+            with lock:
+                return operation()
+        deadline = time.monotonic() + self.BUSY_TIMEOUT
+        delay = 0.005
+        while True:
+            with lock:
+                try:
+                    return operation()
+                except sqlite3.OperationalError as e:
+                    if 'locked' not in str(e) or time.monotonic() >= deadline:
+                        raise
+            # Patched by gevent, so other greenlets run while the writer finishes
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    @contextmanager
+    def transaction(self):
+        """Exclusive write transaction, atomic across processes"""
+        conn, lock = self._connection()
+        with lock:
+            self._run_busy(lock, lambda: conn.execute('BEGIN IMMEDIATE'))
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def execute(self, sql, params=()):
+        conn, lock = self._connection()
+        return self._run_busy(lock, lambda: conn.execute(sql, params))
+
+    def ensure_schema(self, *statements):
+        conn, lock = self._connection()
+        for statement in statements:
+            self._run_busy(lock, lambda: conn.execute(statement))
+
+    def get(self, key, default=None):
+        row = self.execute('SELECT value, expires_at FROM kv WHERE key = ?', (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return default
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        self.execute(
+            'INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, json.dumps(value), expires_at)
+        )
+
+    def add(self, key, value, ttl=None):
+        """Set key only if it is absent or expired; returns True if this call set it"""
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self.transaction() as conn:
+            row = conn.execute('SELECT expires_at FROM kv WHERE key = ?', (key,)).fetchone()
+            if row is not None and (row[0] is None or row[0] >= now):
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), expires_at)
+            )
+            return True
+
+    def delete(self, key):
+        self.execute('DELETE FROM kv WHERE key = ?', (key,))
+
+    def purge_expired(self):
+        self.execute('DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at < ?', (time.time(),))
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_shared_store(path=None):
+    """Return the process-wide SharedStore for path (defaults to Config.SHARED_STORE_PATH)"""
+    if path is None:
+        from config import Config
+        path = Config.SHARED_STORE_PATH
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = SharedStore(path)
+        return _stores[path]
@@ -0,0 +1,220 @@
+import re
+import time
+import uuid
+
+from services.resilience import CallCancelled, CallNotAttempted
+
+
+class TokenBudgetExceeded(CallNotAttempted):
+    """Raised when a call would have to wait longer than the scheduler allows"""
+
+
+def parse_reset_duration(value):
+    """Parse Groq reset headers such as '7.66s', '2m59.56s' or '120ms' into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', str(value)):
+        matched = True
+        amount = float(amount)
+        total += {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}[unit] * amount
+    return total if matched else None
+
+
+class TokenScheduler:
+    """Keep calls to one model under its requests-per-minute and tokens-per-minute limits.
+
+    Reservations are stored in the shared store so every gunicorn worker draws from
+    the same rolling one-minute budget. Estimates are replaced with real usage once a
+    response arrives, and the provider's rate-limit headers override our own view
+    when they report less headroom than we think we have.
+    """
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, store, name, tokens_per_minute, requests_per_minute,
+                 headroom=0.9, max_wait=20.0, chars_per_token=4.0, poll_interval=0.25):
+        self.store = store
+        self.name = name
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.headroom = headroom
+        self.max_wait = max_wait
+        self.chars_per_token = chars_per_token
+        self.poll_interval = poll_interval
+        self._headers_key = f"tokensched:{name}:headers"
+        self._completion_key = f"tokensched:{name}:completion_tokens"
+        self._delayed = 0
+        self._rejected = 0
+        store.ensure_schema(
+            """
+            CREATE TABLE IF NOT EXISTS llm_token_usage (
+                id TEXT PRIMARY KEY,
+                scheduler TEXT NOT NULL,
+                at REAL NOT NULL,
+                tokens INTEGER NOT NULL
+            )
+            """,
+            'CREATE INDEX IF NOT EXISTS idx_llm_token_usage_scheduler_at ON llm_token_usage (scheduler, at)'
+        )
+
+    def estimate_tokens(self, messages, max_tokens=None):
+        """Prompt tokens from message length plus the completion size we usually see"""
+        prompt_chars = sum(len(m.get('content') or '') for m in messages)
+        prompt_tokens = int(prompt_chars / self.chars_per_token) + 4 * len(messages)
+        typical_completion = self.store.get(self._completion_key)
+        if typical_completion is None:
+            completion_tokens = max_tokens or 1024
+        else:
+            completion_tokens = int(typical_completion * 1.2)
+            if max_tokens:
+                completion_tokens = min(max_tokens, completion_tokens)
+        return prompt_tokens + completion_tokens
+
+    def _wait_for(self, conn, now, estimated_tokens):
+        """Seconds until the request fits in the window, or 0 if it fits now"""
+        rows = conn.execute(
+            'SELECT at, tokens FROM llm_token_usage WHERE scheduler = ? AND at > ? ORDER BY at',
+            (self.name, now - self.WINDOW_SECONDS)
+        ).fetchall()
+        token_limit = self.tokens_per_minute * self.headroom
+        request_limit = max(1, int(self.requests_per_minute * self.headroom))
+
+        used_tokens = sum(tokens for _, tokens in rows)
+        wait = 0.0
+        if used_tokens + estimated_tokens > token_limit:
+            freed = 0
+            for at, tokens in rows:
+                freed += tokens
+                if used_tokens - freed + estimated_tokens <= token_limit:
+                    wait = at + self.WINDOW_SECONDS - now
+                    break
+            else:
+                wait = self.WINDOW_SECONDS
+
+        if len(rows) >= request_limit:
+            wait = max(wait, rows[len(rows) - request_limit][0] + self.WINDOW_SECONDS - now)
+
+        # Provider headers are authoritative when they report less headroom
+        snapshot = self.store.get(self._headers_key)
+        if snapshot:
+            tokens_reset_at = snapshot.get('tokens_reset_at')
+            if tokens_reset_at and now < tokens_reset_at and \
+                    snapshot.get('remaining_tokens') is not None and snapshot['remaining_tokens'] < estimated_tokens:
+                wait = max(wait, tokens_reset_at - now)
+            requests_reset_at = snapshot.get('requests_reset_at')
+            if requests_reset_at and now < requests_reset_at and snapshot.get('remaining_requests') == 0:
+                wait = max(wait, requests_reset_at - now)
+
+        return max(0.0, wait)
+
+    def acquire(self, estimated_tokens, cancelled=None):
+        """Block until estimated_tokens fit under the limits and return a reservation id.
+
+        Setting the optional `cancelled` event ends the wait with CallCancelled.
+        """
+        reservation_id = str(uuid.uuid4())
+        deadline = time.time() + self.max_wait
+        delayed = False
+
+        while True:
+            now = time.time()
+            with self.store.transaction() as conn:
+                conn.execute(
+                    'DELETE FROM llm_token_usage WHERE scheduler = ? AND at < ?',
+                    (self.name, now - self.WINDOW_SECONDS)
+                )
+                wait = self._wait_for(conn, now, estimated_tokens)
+                if wait <= 0:
+                    conn.execute(
+                        'INSERT INTO llm_token_usage (id, scheduler, at, tokens) VALUES (?, ?, ?, ?)',
+                        (reservation_id, self.name, now, estimated_tokens)
+                    )
+                    if delayed:
+                        self._delayed += 1
+                    return reservation_id
+
+            if now + wait > deadline:
+                self._rejected += 1
+                raise TokenBudgetExceeded(
+                    f"{self.name} token budget exhausted, next slot in {wait:.1f}s"
+                )
+
+            if not delayed:
+                print(f"⏳ Delaying {self.name} call by up to {wait:.1f}s to stay under rate limits")
+            delayed = True
+            pause = min(max(wait, self.poll_interval), 1.0)
+            if cancelled is None:
+                time.sleep(pause)
+            elif cancelled.wait(pause):
+                raise CallCancelled(f"{self.name} call cancelled while waiting for capacity")
+
+    def settle(self, reservation_id, usage=None, headers=None):
+        """Replace a reservation's estimate with real usage and record rate-limit headers"""
+        if usage is not None:
+            total_tokens = getattr(usage, 'total_tokens', None)
+            completion_tokens = getattr(usage, 'completion_tokens', None)
+            if total_tokens is not None:
+                self.store.execute(
+                    'UPDATE llm_token_usage SET tokens = ? WHERE id = ?', (int(total_tokens), reservation_id)
+                )
+            if completion_tokens is not None:
+                previous = self.store.get(self._completion_key)
+                average = completion_tokens if previous is None else 0.8 * previous + 0.2 * completion_tokens
+                self.store.set(self._completion_key, average)
+        elif headers is not None:
+            # Failed call: keep the request count but release the tokens
+            self.store.execute('UPDATE llm_token_usage SET tokens = 0 WHERE id = ?', (reservation_id,))
+
+        if headers is not None:
+            self._record_headers(headers)
+
+    def _record_headers(self, headers):
+        def header_int(name):
+            value = headers.get(name)
+            try:
+                return int(float(value)) if value is not None else None
+            except (TypeError, ValueError):
+                return None
+
+        now = time.time()
+        remaining_tokens = header_int('x-ratelimit-remaining-tokens')
+        remaining_requests = header_int('x-ratelimit-remaining-requests')
+        if remaining_tokens is None and remaining_requests is None and headers.get('retry-after') is None:
+            return
+
+        tokens_reset = parse_reset_duration(headers.get('x-ratelimit-reset-tokens'))
+        requests_reset = parse_reset_duration(headers.get('x-ratelimit-reset-requests'))
+        retry_after = parse_reset_duration(headers.get('retry-after'))
+        if retry_after is not None:
+            # A 429 means the provider wants nothing from us until retry-after
+            remaining_tokens, tokens_reset = 0, max(tokens_reset or 0, retry_after)
+
+        self.store.set(self._headers_key, {
+            'remaining_tokens': remaining_tokens,
+            'tokens_reset_at': now + tokens_reset if tokens_reset is not None else None,
+            'remaining_requests': remaining_requests,
+            'requests_reset_at': now + requests_reset if requests_reset is not None else None
+        }, ttl=self.WINDOW_SECONDS)
+
+    def get_state(self):
+        now = time.time()
+        row = self.store.execute(
+            'SELECT COUNT(*), COALESCE(SUM(tokens), 0) FROM llm_token_usage WHERE scheduler = ? AND at > ?',
+            (self.name, now - self.WINDOW_SECONDS)
+        ).fetchone()
+        return {
+            'tokens_per_minute': self.tokens_per_minute,
+            'requests_per_minute': self.requests_per_minute,
+            'tokens_in_window': row[1],
+            'requests_in_window': row[0],
+            'provider_headers': self.store.get(self._headers_key),
+            'delayed_by_this_worker': self._delayed,
+            'rejected_by_this_worker': self._rejected
+        }
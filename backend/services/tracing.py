@@ -0,0 +1,331 @@
+import atexit
+import functools
+import json
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# The span currently open in this request/thread; child spans attach to it
+current_span = ContextVar('current_span', default=None)
+
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+
+class Span:
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_ms': round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+class FileSpanExporter:
+    """Append finished spans as JSON lines to a local file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def export(self, spans):
+        lines = ''.join(json.dumps(s.to_dict(), default=str) + '\n' for s in spans)
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class OTLPHttpExporter:
+    """Ship spans to an OTLP/HTTP JSON collector (POST {endpoint}/v1/traces) from a background thread"""
+
+    def __init__(self, endpoint, service_name='ai-itinerary-backend', batch_size=100, flush_interval=1.0,
+                 max_queue=2048, timeout=2.0):
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='otlp-exporter', daemon=True)
+        self._thread.start()
+
+    def export(self, spans):
+        for span in spans:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                # Never block a request on telemetry
+                self.dropped += 1
+
+    def _payload(self, spans):
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]},
+                'scopeSpans': [{
+                    'scope': {'name': 'services.tracing'},
+                    'spans': [{
+                        'traceId': s.trace_id,
+                        'spanId': s.span_id,
+                        'parentSpanId': s.parent_id or '',
+                        'name': s.name,
+                        'kind': 2 if s.parent_id is None else 1,  # SERVER for request roots, else INTERNAL
+                        'startTimeUnixNano': str(s.start_ns),
+                        'endTimeUnixNano': str(s.end_ns),
+                        'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in s.attributes.items()],
+                        'status': {'code': 2, 'message': s.error} if s.error else {'code': 1}
+                    } for s in spans]
+                }]
+            }]
+        }
+
+    def _send(self, spans):
+        req = urllib.request.Request(
+            self.url,
+            data=json.dumps(self._payload(spans)).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                resp.read()
+        except (urllib.error.URLError, OSError) as e:
+            self.dropped += len(spans)
+            print(f"⚠️ Could not export {len(spans)} spans to {self.url}: {e}")
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            batch = self._drain()
+            while batch:
+                self._send(batch)
+                batch = self._drain()
+
+    def shutdown(self):
+        self._stop.set()
+        batch = self._drain()
+        while batch:
+            self._send(batch)
+            batch = self._drain()
+
+
+class Tracer:
+    def __init__(self, exporter, sample_rate=1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def start_trace(self, name, traceparent=None, attributes=None):
+        """Open a request root span, continuing the caller's W3C traceparent when one is sent"""
+        match = TRACEPARENT.match(traceparent or '')
+        if match:
+            trace_id, parent_id = match.groups()
+        else:
+            if self.sample_rate < 1 and random.random() >= self.sample_rate:
+                return None
+            trace_id, parent_id = os.urandom(16).hex(), None
+        return Span(name, trace_id, parent_id, attributes)
+
+    def start_span(self, name, attributes=None):
+        parent = current_span.get()
+        if parent is None:
+            return None
+        return Span(name, parent.trace_id, parent.span_id, attributes)
+
+    def finish(self, span, error=None):
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        try:
+            self.exporter.export([span])
+        except Exception as e:
+            print(f"⚠️ Span export failed: {str(e)}")
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Process-wide tracer, or None when Config.TRACING_ENABLED is off"""
+    global _tracer
+    if _tracer is not None:
+        return _tracer
+    from config import Config
+    if not Config.TRACING_ENABLED:
+        return None
+    with _tracer_lock:
+        if _tracer is None:
+            if Config.TRACING_EXPORTER == 'otlp':
+                exporter = OTLPHttpExporter(Config.TRACING_OTLP_ENDPOINT)
+            else:
+                exporter = FileSpanExporter(Config.TRACING_FILE_PATH)
+            atexit.register(exporter.shutdown)
+            _tracer = Tracer(exporter, Config.TRACING_SAMPLE_RATE)
+            if Config.TRACING_LOG_PREFIX and not isinstance(sys.stdout, TraceIdStream):
+                sys.stdout = TraceIdStream(sys.stdout)
+        return _tracer
+
+
+@contextmanager
+def span(name, **attributes):
+    """Child span of the current span; a no-op outside a traced request"""
+    tracer = get_tracer()
+    child = tracer.start_span(name, attributes) if tracer else None
+    if child is None:
+        yield None
+        return
+    token = current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        tracer.finish(child, error=e)
+        raise
+    else:
+        tracer.finish(child)
+    finally:
+        current_span.reset(token)
+
+
+def traced(name):
+    """Decorator form of span() for whole methods"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace_id():
+    active = current_span.get()
+    return active.trace_id if active else None
+
+
+class TraceIdStream:
+    """Wrap stdout so every line printed inside a traced request starts with its trace id"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._state = threading.local()
+
+    def write(self, text):
+        trace_id = current_trace_id()
+        if trace_id and text:
+            at_line_start = getattr(self._state, 'at_line_start', True)
+            lines = text.split('\n')
+            prefix = f"[trace={trace_id}] "
+            text = '\n'.join(
+                (prefix + line) if line and (i > 0 or at_line_start) else line
+                for i, line in enumerate(lines)
+            )
+            self._state.at_line_start = text.endswith('\n')
+        elif text:
+            self._state.at_line_start = text.endswith('\n')
+        return self._stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class TracedQuery:
+    """Proxy for a postgrest query builder that wraps execute() in a span"""
+
+    OPERATIONS = ('select', 'insert', 'upsert', 'update', 'delete')
+
+    def __init__(self, builder, table, operation='select'):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            operation = name if name in self.OPERATIONS else self._operation
+            # Builder methods return the next builder in the chain; keep wrapping it
+            return TracedQuery(result, self._table, operation) if result is not None else result
+        return call
+
+    def execute(self):
+        with span(f"supabase.{self._operation} {self._table}", **{
+            'db.system': 'postgrest', 'db.table': self._table, 'db.operation': self._operation
+        }) as active:
+            result = self._builder.execute()
+            if active is not None:
+                active.set_attribute('db.rows', len(getattr(result, 'data', None) or []))
+            return result
+
+
+class TracedClient:
+    """Supabase client whose table queries and function calls are traced per execute()"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return TracedQuery(self._client.table(name), name)
+
+    def rpc(self, name, params=None):
+        return TracedQuery(self._client.rpc(name, params or {}), name, 'rpc')
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+
+# Request fields that identify a person and must never reach a capture file as-is
+IDENTITY_FIELDS = ('user_id', 'id', 'email', 'google_id')
+IDENTITY_HEADERS = ('X-User-ID', 'Authorization')
+
+# Set per request, so completions are captured only for sampled requests
+capture_enabled = ContextVar('capture_enabled', default=False)
+
+
+def prompt_fingerprint(messages):
+    """Stable hash of a chat request, used to pair replayed prompts with recorded completions"""
+    body = json.dumps([[m.get('role'), m.get('content')] for m in messages], ensure_ascii=False)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+class TrafficRecorder:
+    """Append anonymized API requests and LLM completions to a JSONL capture file"""
+
+    def __init__(self, path, sample_rate=1.0, salt=''):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.salt = salt
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def anonymize(self, value):
+        """Map an identifier to a stable pseudonymous UUID, so replays still pass validation"""
+        if value is None:
+            return None
+        digest = hashlib.sha256(f"{self.salt}:{value}".encode('utf-8')).digest()
+        return str(uuid.UUID(bytes=digest[:16], version=4))
+
+    def _anonymize_payload(self, payload):
+        if not isinstance(payload, dict):
+            return payload
+        cleaned = dict(payload)
+        for field in IDENTITY_FIELDS:
+            if cleaned.get(field) is not None:
+                cleaned[field] = self.anonymize(cleaned[field])
+        return cleaned
+
+    def should_sample(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def _write(self, event):
+        line = json.dumps(event, ensure_ascii=False, default=str) + '\n'
+        # One write per line on an O_APPEND file keeps lines intact across workers
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+    def record_request(self, method, path, query, headers, payload, status, latency, generation_source=None):
+        self._write({
+            'type': 'request',
+            'ts': time.time(),
+            'method': method,
+            'path': path,
+            'query': self._anonymize_payload(query),
+            'headers': {h: self.anonymize(headers[h]) for h in IDENTITY_HEADERS if headers.get(h)},
+            'payload': self._anonymize_payload(payload),
+            'status': status,
+            'latency': round(latency, 4),
+            'generation_source': generation_source
+        })
+
+    def record_completion(self, model, messages, content, latency, finish_reason=None, usage=None):
+        self._write({
+            'type': 'completion',
+            'ts': time.time(),
+            'model': model,
+            'prompt_sha256': prompt_fingerprint(messages),
+            'latency': round(latency, 4),
+            'finish_reason': finish_reason,
+            'usage': {
+                'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+                'completion_tokens': getattr(usage, 'completion_tokens', None),
+                'total_tokens': getattr(usage, 'total_tokens', None)
+            } if usage is not None else None,
+            'content': content
+        })
+
+
+def load_capture(path):
+    """Read a capture file into (requests, completions) lists"""
+    requests, completions = [], []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            (requests if event.get('type') == 'request' else completions).append(event)
+    return requests, completions
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_traffic_recorder():
+    """The process-wide recorder, or None when Config.TRAFFIC_CAPTURE_PATH is unset"""
+    global _recorder
+    from config import Config
+    if not Config.TRAFFIC_CAPTURE_PATH:
+        return None
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = TrafficRecorder(
+                Config.TRAFFIC_CAPTURE_PATH,
+                sample_rate=Config.TRAFFIC_CAPTURE_SAMPLE_RATE,
+                salt=Config.TRAFFIC_CAPTURE_SALT
+            )
+        return _recorder
@@ -0,0 +1,38 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.run_benchmarks import BACKEND_DIR, compare
+
+
+def _results(**medians):
+    return {'results': {name: {'5': {'median_ms': median}} for name, median in medians.items()}}
+
+
+def test_suite_runs_and_saves_results(tmp_path):
+    path = tmp_path / 'results.json'
+    env = {k: v for k, v in os.environ.items() if k != 'SHARED_STORE_PATH'}
+    subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run_benchmarks', '--days', '2', '--repeat', '1',
+         '--list-size', '2', '--compare', '', '--save', str(path)],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True, timeout=300
+    )
+    saved = json.loads(path.read_text())
+    assert saved['meta']['machine']
+    assert set(saved['results']) == {
+        'prompt_build', 'parse_validate', 'upsert_itinerary', 'get_user_itineraries',
+        'route_generate', 'route_get_itinerary'
+    }
+    assert all(stats['median_ms'] > 0 for by_days in saved['results'].values() for stats in by_days.values())
+
+
+def test_compare_flags_slowdowns_beyond_tolerance():
+    regressions = compare(_results(slow=20.0, steady=10.5), _results(slow=10.0, steady=10.0), 0.25)
+    assert [(name, days) for name, days, *_ in regressions] == [('slow', '5')]
+
+
+def test_compare_ignores_noise_below_min_ms():
+    # 0.015 -> 0.028 ms is nearly 2x, and 1.5 -> 2.4 ms only 0.9 ms; both are timer noise
+    regressions = compare(_results(tiny=0.028, small=2.4), _results(tiny=0.015, small=1.5), 0.25, min_ms=1.0)
+    assert regressions == []